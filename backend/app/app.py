@@ -1,6 +1,7 @@
 import os
 import time
 import logging
+import tracemalloc
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Depends
@@ -11,11 +12,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
-from app.config import settings
-from app.utils import create_db_and_tables, set_sec_headers
+from app.config import engine, settings
+from app.logs import setup_logging
+from app.metrics import MetricsMiddleware, instrument_engine, metrics_response
+from app.utils import (
+    QueryStatsMiddleware,
+    create_db_and_tables,
+    set_sec_headers,
+)
 
 from app.core.routers import (
-    seeder_router,
     simulation_router,
     twinworld_router,
     costmodel_router,
@@ -34,6 +40,7 @@ def create_app() -> FastAPI:
         - Enable CORS
         - Setup Logging
         - Startup Events
+        - Collect Metrics
         - Include Routers
     """
 
@@ -53,6 +60,7 @@ These endpoints need to be called in a specific order:
 | 1     | GET    | `/load-data` (optional)  | Get all the options for Algorithm, CostModel, and TwinWorld.                                                                          |
 | 2     | POST   | `/start`                 | Start the simulation based on the body parameters sent. (options are in the response of /load-data)                                   |
 | 3     | POST   | `/plan`                  | Call plan with offsets of +7 repeatedly until the simulation is done, to get weekly planned data by the selected algorithm of /start  |
+| 4     | GET    | `/{{simulation_id}}/results`, `/{{simulation_id}}/schedules` (optional) | Export the planned days of a simulation as CSV or NDJSON, when the `simulation_id` of /start was sent to /plan |
     """  # noqa: E501
 
     tags_metadata = [
@@ -111,9 +119,7 @@ These endpoints need to be called in a specific order:
         os.makedirs(folder)
 
     if settings.development:
-        logging.basicConfig(
-            filename=f"{folder}/FastAPI.log", level=logging.DEBUG
-        )
+        setup_logging(folder, logging.DEBUG)
 
         @app.on_event("startup")
         def on_startup():
@@ -129,9 +135,12 @@ These endpoints need to be called in a specific order:
             return response
 
     else:
-        logging.basicConfig(
-            filename=f"{folder}/FastAPI.log", level=logging.WARNING
-        )
+        setup_logging(folder, logging.WARNING)
+
+        @app.on_event("startup")
+        def on_startup():
+            "Create the tables and indexes missing in an existing database"
+            create_db_and_tables()
 
     # TODO: CORS
     # app.add_middleware(HTTPSRedirectMiddleware)
@@ -151,6 +160,22 @@ These endpoints need to be called in a specific order:
         ],
         expose_headers=[],
     )
+    app.add_middleware(QueryStatsMiddleware)
+    # Outermost, so the latency includes the other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    instrument_engine(engine)
+    # Traces every allocation, which makes the application a lot slower
+    if settings.memory_tracing and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    app.add_api_route(
+        "/metrics",
+        metrics_response,
+        methods=["GET"],
+        include_in_schema=False,
+        tags=["Metrics"],
+    )
 
     app.include_router(
         simulation_router.router,
@@ -195,6 +220,9 @@ These endpoints need to be called in a specific order:
     )
 
     if settings.development:
+        # Only imported in development mode, as it imports pandas and scipy
+        from app.core.routers import seeder_router
+
         app.include_router(
             seeder_router.router,
             prefix=f"{settings.api_prefix}/seed",
@@ -1,4 +1,7 @@
-from sqlmodel import Session, select
+from typing import Any
+
+from sqlmodel import Session, func, select
+from sqlalchemy.orm import selectinload
 
 from app.core.crud.base import CRUDBase
 from app.core.models.appliance_model import (
@@ -12,10 +15,14 @@ from app.core.models.appliance_model import (
     ApplianceTimeDailyCreate,
     ApplianceTimeDailyUpdate,
 )
+from app.core.models.household_model import Household
 
 
 class CRUDAppliance(CRUDBase[Appliance, ApplianceCreate, ApplianceUpdate]):
-    pass
+    def _options(self) -> list[Any]:
+        "Load the time windows with every Appliance"
+
+        return [selectinload(Appliance.appliance_windows)]  # type: ignore
 
 
 class CRUDApplianceTimeDaily(
@@ -23,13 +30,35 @@ class CRUDApplianceTimeDaily(
         ApplianceTimeDaily, ApplianceTimeDailyCreate, ApplianceTimeDailyUpdate
     ]
 ):
+    def get_chunk(
+        self, *, session: Session, twinworld_id: int, start_day: int, days: int
+    ):
+        """Get the ApplianceTimeDaily of the appliances of a twinworld on the
+        days of a chunk
+        """
+
+        appliance_ids = select(Appliance.id).where(
+            Appliance.household_id.in_(  # type: ignore
+                select(Household.id).where(
+                    Household.twinworld_id == twinworld_id
+                )
+            )
+        )
+
+        return session.exec(
+            select(ApplianceTimeDaily).where(
+                ApplianceTimeDaily.appliance_id.in_(  # type: ignore
+                    appliance_ids
+                ),
+                ApplianceTimeDaily.day.between(  # type: ignore
+                    start_day, start_day + days - 1
+                ),
+            )
+        ).all()
+
     def get_max_appliance_day(self, *, session: Session):
         "Get the maximum day in the ApplianceTimeDaily table"
-        return session.exec(
-            select(ApplianceTimeDaily.day)
-            .order_by(ApplianceTimeDaily.day.desc())  # type: ignore
-            .limit(1)
-        ).first()
+        return session.exec(select(func.max(ApplianceTimeDaily.day))).first()
 
 
 class CRUDApplianceTimeWindow(
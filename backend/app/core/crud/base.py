@@ -1,13 +1,28 @@
-from typing import Any, Generic, Optional, Type, TypeVar, Sequence
+from typing import (
+    Any,
+    Generic,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Type,
+    TypeVar,
+    Sequence,
+)
 
 from fastapi.encoders import jsonable_encoder
 
+from sqlalchemy import Table, func, insert
 from sqlmodel import SQLModel, Session, select
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=SQLModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=SQLModel)
 
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+STREAM_BATCH_SIZE = 1000
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """CRUD object with default methods to Create, Read, Update, Delete
@@ -32,7 +47,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             The id to get
         """
 
-        return session.get(self.model, id)
+        return session.get(self.model, id, options=self._options())
 
     def get_multi(
         self, *, session: Session, offset: int = 0, limit: int = 1000000
@@ -48,9 +63,94 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
 
         return session.exec(
-            select(self.model).offset(offset).limit(limit)
+            select(self.model)
+            .options(*self._options())
+            .offset(offset)
+            .limit(limit)
         ).all()
 
+    def get_page(
+        self,
+        *,
+        session: Session,
+        after: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Sequence[ModelType]:
+        """Get a page of objects ordered by id, using keyset pagination
+
+        The next page is requested with the id of the last object as `after`,
+        so every page is a range scan on the primary key instead of skipping
+        all the objects of the previous pages like an offset does.
+
+        :param session:
+            A SQLModel session
+        :param after:
+            The id after which the page starts, or None for the first page
+        :param limit:
+            The number of objects in the page
+        """
+
+        return session.exec(self._after(after).limit(limit)).all()
+
+    def stream(
+        self,
+        *,
+        session: Session,
+        after: Optional[int] = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> Iterator[ModelType]:
+        """Iterate over all objects ordered by id with a server-side cursor
+
+        Only `batch_size` rows are fetched from the cursor at a time, so the
+        memory usage does not depend on the size of the table.
+
+        :param session:
+            A SQLModel session
+        :param after:
+            The id after which to start, or None to start at the beginning
+        :param batch_size:
+            The number of rows fetched from the cursor at a time
+        """
+
+        yield from session.exec(
+            self._after(after).execution_options(yield_per=batch_size)
+        )
+
+    def _after(self, after: Optional[int]):
+        "Internal function that selects the objects ordered by id after an id"
+
+        statement = (
+            select(self.model)
+            .options(*self._options())
+            .order_by(self.model.id)  # type: ignore
+        )
+
+        if after is not None:
+            statement = statement.where(self.model.id > after)  # type: ignore
+
+        return statement
+
+    def _options(self) -> list[Any]:
+        """Internal function that returns the loader options for the queries
+        of this object.
+
+        Override this to eagerly load the relationships that are read with
+        every object, instead of lazy loading them one object at a time.
+        """
+
+        return []
+
+    def get_max_id(self, *, session: Session) -> Optional[int]:
+        """Get the highest id in the table, or None if the table is empty
+
+        :param session:
+            A SQLModel session
+        """
+
+        return session.exec(
+            select(func.max(self.model.id))  # type: ignore
+        ).one()
+
     def create(
         self, *, session: Session, obj_in: CreateSchemaType
     ) -> ModelType:
@@ -71,12 +171,106 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         return db_obj
 
+    def create_multi(
+        self, *, session: Session, objs_in: Sequence[dict[str, Any]]
+    ) -> None:
+        """Create multiple objects with a single executemany statement
+
+        The rows are inserted into the table directly, skipping the ORM
+        bookkeeping of a bulk insert. On PostgreSQL with psycopg the rows are
+        copied with COPY FROM STDIN instead. The objects are not committed,
+        so multiple calls can share a single transaction. The caller is
+        responsible for committing the session.
+
+        :param session:
+            A SQLModel session
+        :param objs_in:
+            The values of the new database objects
+        """
+
+        if not objs_in:
+            return
+
+        table = self.model.__table__  # type: ignore
+
+        if session.get_bind().dialect.driver == "psycopg":
+            columns = list(objs_in[0])
+            _copy(
+                session=session,
+                table=table,
+                columns=columns,
+                rows=([row[column] for column in columns] for row in objs_in),
+            )
+        else:
+            session.execute(insert(table), objs_in)
+
+    def create_columns(
+        self, *, session: Session, columns: Mapping[str, Sequence[Any]]
+    ) -> None:
+        """Create multiple objects from the values per column with a single
+        executemany statement
+
+        Like create_multi, but without a dictionary per object: the rows are
+        sent to the driver as tuples, which skips the processing of the
+        parameters of every row by SQLAlchemy. On PostgreSQL with psycopg the
+        rows are copied with COPY FROM STDIN instead. The caller is
+        responsible for committing the session.
+
+        :param session:
+            A SQLModel session
+        :param columns:
+            The values of the new database objects per column, every column
+            with a value for every object
+        """
+
+        if not columns or not len(next(iter(columns.values()))):
+            return
+
+        table = self.model.__table__  # type: ignore
+        dialect = session.get_bind().dialect
+
+        if dialect.driver == "psycopg":
+            _copy(
+                session=session,
+                table=table,
+                columns=list(columns),
+                rows=zip(*columns.values()),
+            )
+            return
+
+        statement = insert(table).compile(
+            dialect=dialect, column_keys=list(columns)
+        )
+
+        # Named parameters, or defaults of the columns that are not given,
+        # need the parameters of every row as a dictionary
+        order = statement.positiontup or []
+        if not dialect.positional or set(order) != set(columns):
+            session.execute(
+                insert(table),
+                [dict(zip(columns, row)) for row in zip(*columns.values())],
+            )
+            return
+
+        values = []
+        for column in order:
+            process = table.c[column].type.bind_processor(dialect)
+            values.append(
+                columns[column]
+                if process is None
+                else [process(value) for value in columns[column]]
+            )
+
+        session.connection().exec_driver_sql(
+            str(statement), list(zip(*values))
+        )
+
     def update(
         self,
         *,
         session: Session,
         db_obj: ModelType,
-        obj_in: UpdateSchemaType | dict[str, Any]
+        obj_in: UpdateSchemaType | dict[str, Any],
     ) -> ModelType:
         """Update a single object
 
@@ -116,3 +310,49 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         session.delete(obj)
         session.commit()
+
+
+def _copy(
+    *,
+    session: Session,
+    table: Table,
+    columns: list[str],
+    rows: Iterable[Sequence[Any]],
+) -> None:
+    """Internal function that copies rows into a PostgreSQL table with
+    COPY FROM STDIN, in the transaction of the session.
+
+    The values are converted by the types of the columns like an insert
+    does, for example enums are stored by their name. COPY does not advance
+    the sequence of the id column, so when the ids are set explicitly the
+    sequence is moved past the highest id afterwards.
+    """
+
+    from psycopg import sql
+
+    dialect = session.get_bind().dialect
+    processors = [
+        table.c[column].type.bind_processor(dialect) or (lambda value: value)
+        for column in columns
+    ]
+    connection = session.connection().connection.driver_connection
+    statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table.name),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+    )
+
+    with connection.cursor() as cursor:  # type: ignore
+        with cursor.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(
+                    [process(value) for value, process in zip(row, processors)]
+                )
+
+        if "id" in columns:
+            cursor.execute(
+                sql.SQL(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "(SELECT max(id) FROM {}))"
+                ).format(sql.Identifier(table.name)),
+                [table.name],
+            )
@@ -1,14 +1,27 @@
+from typing import Optional, Sequence
+
 from sqlmodel import Session, select
-from sqlalchemy import func
+from sqlalchemy import delete, exists, func, update
+from sqlalchemy.exc import IntegrityError
+
+from app.metrics import record_cache
+from app.utils import SECONDS_IN_DAY
 
 from app.core.crud.base import CRUDBase
 from app.core.models.energyflow_model import (
     EnergyFlow,
+    EnergyFlowDayTotal,
+    EnergyFlowSummary,
+    EnergyFlowSummaryBase,
     EnergyFlowCreate,
     EnergyFlowUpdate,
     EnergyFlowUpload,
     EnergyFlowUploadCreate,
     EnergyFlowUploadUpdate,
+    EnergyFlowIngestJob,
+    EnergyFlowIngestJobCreate,
+    EnergyFlowIngestJobUpdate,
+    EnergyFlowIngestJobStatus,
 )
 
 
@@ -20,19 +33,6 @@ class CRUDEnergyFlow(CRUDBase[EnergyFlow, EnergyFlowCreate, EnergyFlowUpdate]):
             select(EnergyFlow).where(EnergyFlow.timestamp == timestamp)
         ).first()
 
-    def get_by_solar_produced(
-        self, *, session: Session, limit: int = 10000, offset: int = 0
-    ):
-        "Get all EnergyFlow by solar_produced"
-
-        return session.exec(
-            select(EnergyFlow)
-            .where(EnergyFlow.solar_produced > 0)
-            .where(EnergyFlow.id >= offset)
-            .where(EnergyFlow.id < offset + limit)
-            .order_by(EnergyFlow.solar_produced.desc())  # type: ignore
-        ).all()
-
     def get_all_sorted_by_timestamp(
         self, *, session: Session, id: int, limit: int = 10000, offset: int = 0
     ):
@@ -46,35 +46,71 @@ class CRUDEnergyFlow(CRUDBase[EnergyFlow, EnergyFlowCreate, EnergyFlowUpdate]):
             .offset(offset)
         ).all()
 
-    def get_start_end_date(self, *, session: Session, id: int):
-        "Get the start and end date of the EnergyFlow table"
+    def remove_by_upload(self, *, session: Session, id: int) -> None:
+        "Delete all EnergyFlow of an EnergyFlowUpload in a single statement"
 
-        min_timestamp_query = select(EnergyFlow).filter(
-            EnergyFlow.timestamp  # type: ignore
-            == session.execute(
-                select(func.min(EnergyFlow.timestamp)).where(
-                    EnergyFlow.energyflow_upload_id == id
-                )
-            ).scalar()
+        session.execute(
+            delete(EnergyFlow).where(
+                EnergyFlow.energyflow_upload_id == id  # type: ignore
+            )
         )
 
-        max_timestamp_query = select(EnergyFlow).filter(
-            EnergyFlow.timestamp  # type: ignore
-            == session.execute(
-                select(func.max(EnergyFlow.timestamp)).where(
-                    EnergyFlow.energyflow_upload_id == id
-                )
-            ).scalar()
-        )
 
-        results_min_timestamp = session.exec(min_timestamp_query).first()
-        results_max_timestamp = session.exec(max_timestamp_query).first()
-        return results_min_timestamp, results_max_timestamp
+def _is_ingested():
+    """Internal function that returns the condition for an EnergyFlowUpload
+    whose energyflows are completely ingested.
+
+    Uploads without an ingest job, like the seeded one, are always complete.
+    """
+
+    return ~exists().where(
+        EnergyFlowIngestJob.energyflow_upload_id == EnergyFlowUpload.id,
+        EnergyFlowIngestJob.status  # type: ignore
+        != EnergyFlowIngestJobStatus.COMPLETED,
+    )
 
 
 class EnergyFlowUploadCRUD(
     CRUDBase[EnergyFlowUpload, EnergyFlowUploadCreate, EnergyFlowUploadUpdate]
 ):
+    def get(self, *, session: Session, id: int) -> Optional[EnergyFlowUpload]:
+        "Get a single EnergyFlowUpload by id, if it is completely ingested"
+
+        return session.exec(
+            select(EnergyFlowUpload)
+            .where(EnergyFlowUpload.id == id)
+            .where(_is_ingested())
+        ).first()
+
+    def get_multi(
+        self, *, session: Session, offset: int = 0, limit: int = 1000000
+    ) -> Sequence[EnergyFlowUpload]:
+        "Get multiple EnergyFlowUpload that are completely ingested"
+
+        return session.exec(
+            select(EnergyFlowUpload)
+            .where(_is_ingested())
+            .offset(offset)
+            .limit(limit)
+        ).all()
+
+    def remove(self, *, session: Session, id: int) -> None:
+        """Delete a single EnergyFlowUpload, keeping its ingest jobs
+
+        The jobs are unlinked from the upload first, as their foreign key
+        would otherwise prevent the delete on databases that enforce it.
+        """
+
+        session.execute(
+            update(EnergyFlowIngestJob)
+            .where(
+                EnergyFlowIngestJob.energyflow_upload_id == id  # type: ignore
+            )
+            .values(energyflow_upload_id=None)
+        )
+
+        super().remove(session=session, id=id)
+
     def get_by_name(self, *, session: Session, name: str):
         "Get a single EnergyFlowUpload by name"
 
@@ -83,5 +119,154 @@ class EnergyFlowUploadCRUD(
         ).first()
 
 
+class EnergyFlowIngestJobCRUD(
+    CRUDBase[
+        EnergyFlowIngestJob,
+        EnergyFlowIngestJobCreate,
+        EnergyFlowIngestJobUpdate,
+    ]
+):
+    def get_unfinished(
+        self, *, session: Session
+    ) -> Sequence[EnergyFlowIngestJob]:
+        "Get all EnergyFlowIngestJob that are pending or running"
+
+        return session.exec(
+            select(EnergyFlowIngestJob).where(
+                EnergyFlowIngestJob.status.in_(  # type: ignore
+                    (
+                        EnergyFlowIngestJobStatus.PENDING,
+                        EnergyFlowIngestJobStatus.RUNNING,
+                    )
+                )
+            )
+        ).all()
+
+
+class EnergyFlowSummaryCRUD(
+    CRUDBase[EnergyFlowSummary, EnergyFlowSummaryBase, EnergyFlowSummaryBase]
+):
+    def get_day_totals(
+        self,
+        *,
+        session: Session,
+        id: int,
+        start_day: int = 1,
+        days: Optional[int] = None,
+    ) -> Sequence[EnergyFlowDayTotal]:
+        """Get the EnergyFlowDayTotal of an EnergyFlowUpload from a day on,
+        for all days or for the given amount of days
+        """
+
+        statement = (
+            select(EnergyFlowDayTotal)
+            .where(EnergyFlowDayTotal.energyflow_upload_id == id)
+            .where(EnergyFlowDayTotal.day >= start_day)
+            .order_by(EnergyFlowDayTotal.day)  # type: ignore
+        )
+
+        if days is not None:
+            statement = statement.where(
+                EnergyFlowDayTotal.day < start_day + days
+            )
+
+        return session.exec(statement).all()
+
+    def summarize(
+        self, *, session: Session, id: int
+    ) -> Optional[EnergyFlowSummary]:
+        """Compute the EnergyFlowSummary and EnergyFlowDayTotal of an
+        EnergyFlowUpload, replacing the previous ones.
+
+        Returns None if the upload has no energyflows. The summary is not
+        committed, so it can be part of the transaction of the ingest. The
+        caller is responsible for committing the session.
+        """
+
+        first, last, rows = session.exec(
+            select(
+                func.min(EnergyFlow.timestamp),
+                func.max(EnergyFlow.timestamp),
+                func.count(),
+            ).where(EnergyFlow.energyflow_upload_id == id)
+        ).one()
+
+        if not rows:
+            return None
+
+        day = (EnergyFlow.timestamp - first) // SECONDS_IN_DAY + 1
+        day_totals = session.exec(
+            select(
+                day,
+                func.sum(EnergyFlow.energy_used),
+                func.sum(EnergyFlow.solar_produced),
+            )
+            .where(EnergyFlow.energyflow_upload_id == id)
+            .group_by(day)  # type: ignore
+        ).all()
+
+        for model in (EnergyFlowSummary, EnergyFlowDayTotal):
+            session.execute(
+                delete(model).where(
+                    model.energyflow_upload_id == id  # type: ignore
+                )
+            )
+
+        summary = EnergyFlowSummary(
+            energyflow_upload_id=id,
+            first_timestamp=first,
+            last_timestamp=last,
+            rows=rows,
+        )
+        session.add(summary)
+        energyflow_day_total_crud.create_multi(
+            session=session,
+            objs_in=[
+                {
+                    "energyflow_upload_id": id,
+                    "day": day,
+                    "energy_used": energy_used,
+                    "solar_produced": solar_produced,
+                }
+                for day, energy_used, solar_produced in day_totals
+            ],
+        )
+        session.flush()
+
+        return summary
+
+    def get_or_summarize(
+        self, *, session: Session, id: int
+    ) -> Optional[EnergyFlowSummary]:
+        """Get the EnergyFlowSummary of an EnergyFlowUpload, and compute it
+        first for an upload that was ingested before summaries existed.
+        """
+
+        summary = self.get(session=session, id=id)
+        record_cache("energyflow_summary", hit=summary is not None)
+
+        if summary:
+            return summary
+
+        try:
+            summary = self.summarize(session=session, id=id)
+            session.commit()
+        except IntegrityError:
+            # Another request computed the summary at the same time
+            session.rollback()
+            summary = self.get(session=session, id=id)
+
+        return summary
+
+
+class EnergyFlowDayTotalCRUD(
+    CRUDBase[EnergyFlowDayTotal, EnergyFlowDayTotal, EnergyFlowDayTotal]
+):
+    pass
+
+
 energyflow_crud = CRUDEnergyFlow(EnergyFlow)
 energyflow_upload_crud = EnergyFlowUploadCRUD(EnergyFlowUpload)
+energyflow_ingest_job_crud = EnergyFlowIngestJobCRUD(EnergyFlowIngestJob)
+energyflow_summary_crud = EnergyFlowSummaryCRUD(EnergyFlowSummary)
+energyflow_day_total_crud = EnergyFlowDayTotalCRUD(EnergyFlowDayTotal)
@@ -1,7 +1,11 @@
+from typing import Any
+
 from sqlmodel import Session, select
 from sqlalchemy import desc
+from sqlalchemy.orm import selectinload
 
 from app.core.crud.base import CRUDBase
+from app.core.models.appliance_model import Appliance
 from app.core.models.household_model import (
     Household,
     HouseholdCreate,
@@ -10,22 +14,36 @@ from app.core.models.household_model import (
 
 
 class CRUDHousehold(CRUDBase[Household, HouseholdCreate, HouseholdUpdate]):
+    def _options(self) -> list[Any]:
+        "Load the appliances and their time windows with every Household"
+
+        return [
+            selectinload(Household.appliances).selectinload(  # type: ignore
+                Appliance.appliance_windows  # type: ignore
+            )
+        ]
+
     def get_by_twinworld(self, *, session: Session, id: int):
         "Get a single Household by twinworld_id"
 
         return session.exec(
-            select(Household).where(Household.twinworld_id == id)
+            select(Household)
+            .options(*self._options())
+            .where(Household.twinworld_id == id)
         ).all()
 
     def get_by_twinworld_sorted_solar_panels(
         self, *, session: Session, id: int
     ):
-        "Get all Household by twinworld_id sorted by solar_panels"
+        "Get all Household by twinworld_id sorted by solar_panels, then id"
 
         return session.exec(
             select(Household)
+            .options(*self._options())
             .where(Household.twinworld_id == id)
-            .order_by(desc(Household.solar_panels))  # type: ignore
+            .order_by(
+                desc(Household.solar_panels), Household.id  # type: ignore
+            )
         ).all()
 
     def get_by_name(self, *, session: Session, name: str):
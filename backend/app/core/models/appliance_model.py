@@ -7,6 +7,7 @@ in a household. The appliances are planned in by the algorithms.
 from typing import TYPE_CHECKING, Any
 from enum import Enum
 
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import field_validator
 
@@ -84,7 +85,7 @@ class Appliance(ApplianceBase, table=True):
     id: int = Field(primary_key=True)
 
     household: "Household" = Relationship(back_populates="appliances")
-    household_id: int = Field(foreign_key="household.id")
+    household_id: int = Field(foreign_key="household.id", index=True)
 
     appliance_windows: list["ApplianceTimeWindow"] = Relationship(
         back_populates="appliance",
@@ -114,7 +115,7 @@ class ApplianceTimeWindow(ApplianceTimeWindowBase, table=True):
     )  # id number of the appliance whose availability is created, example=0
 
     appliance: "Appliance" = Relationship(back_populates="appliance_windows")
-    appliance_id: int = Field(foreign_key="appliance.id")
+    appliance_id: int = Field(foreign_key="appliance.id", index=True)
 
 
 class ApplianceTimeDailyBase(SQLModel):
@@ -157,6 +158,13 @@ class ApplianceTimeDailyBase(SQLModel):
 
 
 class ApplianceTimeDaily(ApplianceTimeDailyBase, table=True):
+    # The daily plans are looked up by appliance and day, and the last day
+    # is the length of the planning
+    __table_args__ = (
+        Index("ix_appliancetimedaily_appliance_id_day", "appliance_id", "day"),
+        Index("ix_appliancetimedaily_day", "day"),
+    )
+
     id: int = Field(
         primary_key=True
     )  # id number of the appliance that is being planned in, example=0
@@ -4,6 +4,10 @@ The Energyflow table is used to store all the energy usage and the
 internal yield of green energy that is available to be used in the simulation.
 """
 
+from typing import Optional
+from enum import Enum
+
+from sqlalchemy import BigInteger, Index, PrimaryKeyConstraint
 from sqlmodel import SQLModel, Field, Relationship
 
 from pydantic import field_validator
@@ -12,12 +16,23 @@ from pydantic import field_validator
 class EnergyFlowBase(SQLModel):
     "Energyflow model that saves the energyflow in the database"
 
-    timestamp: int = Field(nullable=False, index=True)  # in unix
+    timestamp: int = Field(
+        sa_type=BigInteger, nullable=False, index=True
+    )  # in unix
     energy_used: float = Field(nullable=False)  # in kWh
     solar_produced: float = Field(nullable=False)  # in kWh
 
 
 class EnergyFlow(EnergyFlowBase, table=True):
+    # The energyflows of an upload are read in order of their timestamp
+    __table_args__ = (
+        Index(
+            "ix_energyflow_energyflow_upload_id_timestamp",
+            "energyflow_upload_id",
+            "timestamp",
+        ),
+    )
+
     id: int = Field(primary_key=True)
 
     energyflow_upload: "EnergyFlowUpload" = Relationship(
@@ -27,7 +42,8 @@ class EnergyFlow(EnergyFlowBase, table=True):
 
 
 class EnergyFlowRead(EnergyFlowBase):
-    pass
+    id: int
+    energyflow_upload_id: int
 
 
 class EnergyFlowCreate(EnergyFlowBase):
@@ -85,6 +101,12 @@ class EnergyFlowUpload(EnergyFlowUploadBase, table=True):
         back_populates="energyflow_upload",
         sa_relationship_kwargs={"cascade": "delete"},
     )
+    summary: Optional["EnergyFlowSummary"] = Relationship(
+        sa_relationship_kwargs={"cascade": "delete", "uselist": False},
+    )
+    day_totals: list["EnergyFlowDayTotal"] = Relationship(
+        sa_relationship_kwargs={"cascade": "delete"},
+    )
 
 
 class EnergyFlowUploadRead(EnergyFlowUploadBase):
@@ -97,3 +119,97 @@ class EnergyFlowUploadCreate(EnergyFlowUploadBase):
 
 class EnergyFlowUploadUpdate(EnergyFlowUploadBase):
     pass
+
+
+class EnergyFlowSummaryBase(SQLModel):
+    """Summary of the energyflows of an upload.
+
+    The summary is computed once, when the upload is ingested, so the
+    planning does not have to query the energyflows for it.
+    """
+
+    first_timestamp: int = Field(sa_type=BigInteger, nullable=False)  # unix
+    last_timestamp: int = Field(sa_type=BigInteger, nullable=False)  # unix
+    rows: int = Field(nullable=False)
+
+
+class EnergyFlowSummary(EnergyFlowSummaryBase, table=True):
+    energyflow_upload_id: int = Field(
+        primary_key=True, foreign_key="energyflowupload.id"
+    )
+
+
+class EnergyFlowDayTotalBase(SQLModel):
+    """Totals of the energyflows of an upload on a day of the planning.
+
+    The first day of the planning is the day of the first timestamp.
+    """
+
+    day: int = Field(nullable=False)
+    energy_used: float = Field(nullable=False)  # in kWh
+    solar_produced: float = Field(nullable=False)  # in kWh
+
+
+class EnergyFlowDayTotal(EnergyFlowDayTotalBase, table=True):
+    # The days of an upload are read in order
+    __table_args__ = (PrimaryKeyConstraint("energyflow_upload_id", "day"),)
+
+    energyflow_upload_id: int = Field(foreign_key="energyflowupload.id")
+
+
+class EnergyFlowDayTotalRead(EnergyFlowDayTotalBase):
+    pass
+
+
+class EnergyFlowSummaryRead(EnergyFlowSummaryBase):
+    energyflow_upload_id: int
+    day_totals: list[EnergyFlowDayTotalRead]
+
+
+class EnergyFlowIngestJobStatus(str, Enum):
+    "Contains the states an ingest job of an upload can be in"
+
+    PENDING = "Pending"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+
+    def __str__(self):
+        return str(self.value)
+
+
+class EnergyFlowIngestJobBase(SQLModel):
+    """Background job that inserts the energyflows of an upload.
+
+    The EnergyFlowUpload is only visible once its job is completed. If the job
+    fails, the upload and its energyflows are removed again.
+    """
+
+    status: EnergyFlowIngestJobStatus = Field(
+        default=EnergyFlowIngestJobStatus.PENDING, nullable=False
+    )
+    rows_processed: int = Field(default=0, nullable=False)
+    bytes_processed: int = Field(default=0, nullable=False)
+    bytes_total: int = Field(default=0, nullable=False)
+    error: Optional[str] = Field(default=None, nullable=True)
+
+
+class EnergyFlowIngestJob(EnergyFlowIngestJobBase, table=True):
+    id: int = Field(primary_key=True)
+
+    energyflow_upload_id: Optional[int] = Field(
+        default=None, foreign_key="energyflowupload.id", nullable=True
+    )
+
+
+class EnergyFlowIngestJobRead(EnergyFlowIngestJobBase):
+    id: int
+    energyflow_upload_id: Optional[int]
+
+
+class EnergyFlowIngestJobCreate(EnergyFlowIngestJobBase):
+    energyflow_upload_id: int
+
+
+class EnergyFlowIngestJobUpdate(EnergyFlowIngestJobBase):
+    pass
@@ -7,6 +7,7 @@ in using the selected algorithm.
 
 from typing import TYPE_CHECKING, Any
 
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import field_validator
 
@@ -48,6 +49,18 @@ class HouseholdBase(SQLModel):
 
 
 class Household(HouseholdBase, table=True):
+    # The households of a twinworld are read from the most solar panels down,
+    # and by id for the same amount of panels, which the index reads in that
+    # order without sorting
+    __table_args__ = (
+        Index(
+            "ix_household_twinworld_id_solar_panels_id",
+            "twinworld_id",
+            text("solar_panels DESC"),
+            "id",
+        ),
+    )
+
     id: int = Field(primary_key=True)
 
     twinworld_id: int = Field(foreign_key="twinworld.id", ge=1)
@@ -1,8 +1,3 @@
-import pandas
-import numpy
-import math
-import random
-import scipy
 import ast
 
 from typing import Sequence
@@ -11,6 +6,7 @@ from fastapi import APIRouter, Depends, status
 
 from sqlmodel import Session
 
+from app.sandbox import RESEARCHER_LIBRARIES
 from app.utils import Logger, get_session
 
 from app.core.models import algorithm_model
@@ -58,15 +54,6 @@ async def post_algorithm(
             detail=f"Algorithm with name {form_data.name} already exists",
         )
 
-    # Create a restricted globals dictionary
-    restricted_globals = {
-        "pandas": pandas,
-        "numpy": numpy,
-        "scipy": scipy,
-        "math": math,
-        "random": random,
-    }
-
     # Simple check if the code is valid Python syntax, it is bypassable.
     # TODO: make this more comprehensive.
     try:
@@ -88,8 +75,10 @@ async def post_algorithm(
             # TODO: check mypy error
             imports.add(node.module)  # type: ignore
 
-    # Check if any imported module is not in restricted_globals
-    invalid_imports = [imp for imp in imports if imp not in restricted_globals]
+    # Check if any imported module is not a library of the researchers
+    invalid_imports = [
+        imp for imp in imports if imp not in RESEARCHER_LIBRARIES
+    ]
 
     if invalid_imports:
         Logger.exception(
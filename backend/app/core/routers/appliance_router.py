@@ -1,13 +1,15 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
 
 from sqlmodel import Session
 
-from app.utils import MAX_DAYS_IN_YEAR, Logger, get_session
+from app.utils import MAX_DAYS_IN_YEAR, Logger, get_session, stream_ndjson
 
 from app.core.models import appliance_model
 
+from app.core.crud.base import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.crud.appliance_crud import (
     appliance_crud,
     appliance_time_daily_crud,
@@ -19,9 +21,28 @@ router = APIRouter()
 
 @router.get("/", response_model=list[appliance_model.ApplianceRead])
 async def get_appliances(
-    *, session: Session = Depends(get_session)
+    *,
+    after: Optional[int] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: Session = Depends(get_session),
 ) -> Sequence[appliance_model.Appliance]:
-    return appliance_crud.get_multi(session=session)
+    """Get a page of appliances ordered by id.
+
+    The next page starts after the id of the last appliance of a page.
+    """
+    return appliance_crud.get_page(session=session, after=after, limit=limit)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_appliances(
+    *, after: Optional[int] = None
+) -> StreamingResponse:
+    "Stream all appliances ordered by id as newline delimited JSON."
+    return stream_ndjson(
+        crud=appliance_crud,
+        read_model=appliance_model.ApplianceRead,
+        after=after,
+    )
 
 
 @router.get("/{id}", response_model=appliance_model.ApplianceRead)
@@ -122,9 +143,30 @@ async def delete_appliance(
     response_model=list[appliance_model.ApplianceTimeWindowRead],
 )
 async def get_appliance_timewindows(
-    *, session: Session = Depends(get_session)
+    *,
+    after: Optional[int] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: Session = Depends(get_session),
 ) -> Sequence[appliance_model.ApplianceTimeWindow]:
-    return appliance_time_window_crud.get_multi(session=session)
+    """Get a page of appliance timewindows ordered by id.
+
+    The next page starts after the id of the last timewindow of a page.
+    """
+    return appliance_time_window_crud.get_page(
+        session=session, after=after, limit=limit
+    )
+
+
+@router.get("/timewindow/stream", response_class=StreamingResponse)
+async def stream_appliance_timewindows(
+    *, after: Optional[int] = None
+) -> StreamingResponse:
+    "Stream all appliance timewindows ordered by id as newline delimited JSON."
+    return stream_ndjson(
+        crud=appliance_time_window_crud,
+        read_model=appliance_model.ApplianceTimeWindowRead,
+        after=after,
+    )
 
 
 @router.get(
@@ -1,16 +1,29 @@
-from typing import Sequence
-from csv import DictReader
-from io import StringIO
-
-from fastapi import APIRouter, Depends, UploadFile, Form, status
+from typing import Optional, Sequence
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    UploadFile,
+    Form,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
 from sqlmodel import Session
 
-from app.utils import Logger, get_session
+from app.utils import Logger, get_session, stream_ndjson
+from app.ingest import create_ingest_job, ingest_job_task
+from app.profiling import profile_headers, profile_name
 
+from app.core.crud.base import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.crud.energyflow_crud import (
     energyflow_crud,
     energyflow_upload_crud,
+    energyflow_ingest_job_crud,
+    energyflow_summary_crud,
 )
 
 from app.core.models import energyflow_model
@@ -20,9 +33,28 @@ router = APIRouter()
 
 @router.get("/", response_model=list[energyflow_model.EnergyFlowRead])
 async def get_energyflows(
-    *, session: Session = Depends(get_session)
+    *,
+    after: Optional[int] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: Session = Depends(get_session),
 ) -> Sequence[energyflow_model.EnergyFlow]:
-    return energyflow_crud.get_multi(session=session)
+    """Get a page of energyflows ordered by id.
+
+    The next page starts after the id of the last energyflow of a page.
+    """
+    return energyflow_crud.get_page(session=session, after=after, limit=limit)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_energyflows(
+    *, after: Optional[int] = None
+) -> StreamingResponse:
+    "Stream all energyflows ordered by id as newline delimited JSON."
+    return stream_ndjson(
+        crud=energyflow_crud,
+        read_model=energyflow_model.EnergyFlowRead,
+        after=after,
+    )
 
 
 @router.get("/{id}", response_model=energyflow_model.EnergyFlowRead)
@@ -109,7 +141,65 @@ async def get_energyflow_upload(
     return energyflow_upload
 
 
-@router.post("/upload", status_code=status.HTTP_201_CREATED)
+@router.get(
+    "/upload/{id}/summary",
+    response_model=energyflow_model.EnergyFlowSummaryRead,
+)
+async def get_energyflow_upload_summary(
+    *, id: int, session: Session = Depends(get_session)
+) -> energyflow_model.EnergyFlowSummaryRead:
+    """Get the first and last timestamp, the amount of energyflows and the
+    daily totals of an EnergyflowUpload, without reading its energyflows.
+    """
+    energyflow_upload = energyflow_upload_crud.get(session=session, id=id)
+
+    if not energyflow_upload:
+        Logger.exception(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"EnergyflowUpload with id {id} not found",
+        )
+
+    summary = energyflow_summary_crud.get_or_summarize(session=session, id=id)
+
+    if not summary:
+        Logger.exception(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"EnergyflowUpload with id {id} has no energyflows",
+        )
+
+    return energyflow_model.EnergyFlowSummaryRead.model_validate(
+        summary,
+        update={
+            "day_totals": energyflow_summary_crud.get_day_totals(
+                session=session, id=id
+            )
+        },
+    )
+
+
+@router.get(
+    "/upload/job/{id}",
+    response_model=energyflow_model.EnergyFlowIngestJobRead,
+)
+async def get_energyflow_ingest_job(
+    *, id: int, session: Session = Depends(get_session)
+) -> energyflow_model.EnergyFlowIngestJob:
+    job = energyflow_ingest_job_crud.get(session=session, id=id)
+
+    if not job:
+        Logger.exception(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ingest job with id {id} not found",
+        )
+
+    return job
+
+
+@router.post(
+    "/upload",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=energyflow_model.EnergyFlowIngestJobRead,
+)
 async def upload_energyflow(
     *,
     name: str = Form(...),
@@ -117,8 +207,18 @@ async def upload_energyflow(
     solar_panels_factor: float = Form(...),
     energy_usage_factor: float = Form(...),
     file: UploadFile,
+    background_tasks: BackgroundTasks,
+    response: Response,
     session: Session = Depends(get_session),
-) -> None:
+    profile: Optional[str] = Depends(profile_name),
+) -> energyflow_model.EnergyFlowIngestJob:
+    """Store the uploaded file and ingest it in the background.
+
+    The returned ingest job can be polled through /upload/job/{id}. The
+    EnergyflowUpload becomes available once the job is completed. When the
+    request asks to be profiled, the profile of the ingest is saved when the
+    job is completed.
+    """
     check_energyflow_upload = energyflow_upload_crud.get_by_name(
         session=session, name=name
     )
@@ -129,47 +229,31 @@ async def upload_energyflow(
             detail=f"EnergyflowUpload with name {name} already exists",
         )
 
-    get_energyflow_upload = energyflow_upload_crud.get_multi(session=session)
-
-    id_to_set = 1
-
-    if len(get_energyflow_upload) > 0:
-        id_to_set = get_energyflow_upload[-1].id + 1
-
     try:
-        contents = file.file.read().decode("utf-8-sig")
-        with StringIO(contents) as f:
-            reader = DictReader(f, delimiter=";", skipinitialspace=True)
-            for row in reader:
-                energy_used = float(row["energy_used"].replace(",", "."))
-                solar_produced = float(row["solar_produced"].replace(",", "."))
-
-                energyflow_crud.create(
-                    session=session,
-                    obj_in=energyflow_model.EnergyFlowCreate(
-                        timestamp=int(row["timestamp"]),
-                        energy_used=energy_used,
-                        solar_produced=solar_produced,
-                        energyflow_upload_id=id_to_set,
-                    ),
-                )
+        job, path = create_ingest_job(
+            session=session,
+            file=file.file,
+            upload_in=energyflow_model.EnergyFlowUploadCreate(
+                name=name,
+                description=description,
+                energy_usage_factor=energy_usage_factor,
+                solar_panels_factor=solar_panels_factor,
+            ),
+        )
     except Exception as e:
         Logger.exception(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing CSV file: {str(e)}",
+            detail=f"Error processing energyflow file: {str(e)}",
         )
     finally:
         file.file.close()
 
-    energyflow_upload_crud.create(
-        session=session,
-        obj_in=energyflow_model.EnergyFlowUploadCreate(
-            name=name,
-            description=description,
-            energy_usage_factor=energy_usage_factor,
-            solar_panels_factor=solar_panels_factor,
-        ),
+    background_tasks.add_task(
+        ingest_job_task, job_id=job.id, path=path, profile=profile
     )
+    response.headers.update(profile_headers(profile))
+
+    return job
 
 
 @router.delete("/upload/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,13 +1,15 @@
-from typing import Sequence
+from typing import Optional, Sequence
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
 
 from sqlmodel import Session
 
-from app.utils import Logger, get_session
+from app.utils import Logger, get_session, stream_ndjson
 
 from app.core.models import household_model
 
+from app.core.crud.base import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.core.crud.household_crud import household_crud
 
 router = APIRouter()
@@ -15,9 +17,28 @@ router = APIRouter()
 
 @router.get("/", response_model=list[household_model.HouseholdRead])
 async def get_households(
-    *, session: Session = Depends(get_session)
+    *,
+    after: Optional[int] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: Session = Depends(get_session),
 ) -> Sequence[household_model.Household]:
-    return household_crud.get_multi(session=session)
+    """Get a page of households ordered by id.
+
+    The next page starts after the id of the last household of a page.
+    """
+    return household_crud.get_page(session=session, after=after, limit=limit)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_households(
+    *, after: Optional[int] = None
+) -> StreamingResponse:
+    "Stream all households ordered by id as newline delimited JSON."
+    return stream_ndjson(
+        crud=household_crud,
+        read_model=household_model.HouseholdRead,
+        after=after,
+    )
 
 
 @router.get("/{id}", response_model=household_model.HouseholdRead)
@@ -10,20 +10,20 @@ The seed data contains the following:
     - TwinWorlds
     - CostModels
     - Algorithms
+
+Besides the seed, it can generate a twinworld of any size from the same
+distributions, to test the simulation with large twinworlds.
 """
 
 import random
-import pandas
+import numpy
 
-from typing import Optional, Dict
-from math import ceil
+from typing import Any
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Body, Depends, status
 
 from sqlmodel import Session
 
-from scipy.stats import norm
-
 from app.utils import (
     MAX_DAYS_IN_YEAR,
     Logger,
@@ -35,8 +35,6 @@ from app.utils import (
 
 from app.core.models import (
     costmodel_model,
-    appliance_model,
-    household_model,
     twinworld_model,
     algorithm_model,
     energyflow_model,
@@ -44,408 +42,509 @@ from app.core.models import (
 
 # Easier to use the type this way instead of writing: appliance_model.ApplianceDays for example.  # noqa: E501
 from app.core.models.appliance_model import (
-    Appliance,
     ApplianceType,
     ApplianceDays,
 )
 
-router = APIRouter()
+from app.core.crud.energyflow_crud import (
+    energyflow_crud,
+    energyflow_summary_crud,
+)
+from app.core.crud.household_crud import household_crud
+from app.core.crud.twinworld_crud import twinworld_crud
+from app.core.crud.appliance_crud import (
+    appliance_crud,
+    appliance_time_daily_crud,
+    appliance_time_window_crud,
+)
 
+router = APIRouter()
 
-def create_energyflow():
+# The distributions of the appliances. The availability and frequency
+# are indexed by household size - 1. The energy pattern is either the one of
+# the household (None), or drawn uniformly from the (start, end) range.
+DISHWASHER: dict[str, Any] = {
+    "name": ApplianceType.DISHWASHER,
+    "availability": [0.47, 0.76, 0.81, 0.89, 0.83],
+    "frequency": [0.51, 0.7, 0.84, 0.96, 1.1],
+    "duration": (1, 2),
+    "energy_pattern": None,
+    "usage_multi": 0.3,
+    "usage_addition": 0.8,
+}
+
+WASHING_MACHINE: dict[str, Any] = {
+    "name": ApplianceType.WASHING_MACHINE,
+    "availability": [0.94, 1, 1, 1, 0.97],
+    "frequency": [0.52, 0.68, 0.93, 1.24, 1.4],
+    "duration": (2, 3),
+    "energy_pattern": None,
+    "usage_multi": 0.7,
+    "usage_addition": 0.9,
+}
+
+TUMBLE_DRYER: dict[str, Any] = {
+    "name": ApplianceType.TUMBLE_DRYER,
+    "availability": [0.63, 0.63, 0.63, 0.63, 0.63],
+    "frequency": [0.52, 0.68, 0.93, 1.24, 1.4],
+    "duration": (1, 2),
+    "energy_pattern": None,
+    "usage_multi": 2,
+    "usage_addition": 1,
+}
+
+ELECTRIC_VEHICLE: dict[str, Any] = {
+    "name": ApplianceType.ELECTRIC_VEHICLE,
+    "availability": [0.2, 0.2, 0.2, 0.2, 0.2],
+    "frequency": [1.0, 1.0, 1.0, 1.0, 1.0],
+    "duration": (4, 5),
+    "energy_pattern": (0.2, 1.0),
+    "usage_multi": 10,
+    "usage_addition": 50,
+}
+
+STOVE: dict[str, Any] = {
+    "name": ApplianceType.STOVE,
+    "availability": [0.49, 0.49, 0.49, 0.49, 0.49],
+    "frequency": [1.0, 1.0, 1.0, 1.0, 1.0],
+    "duration": (1, 2),
+    "energy_pattern": (0.85, 1.0),
+    "usage_multi": 0.5,
+    "usage_addition": 0.5,
+}
+
+# Map for household size - 1 to energy usage
+DEFAULT_ENERGY_USAGE = [1600, 2500, 3400, 4300, 5000]
+
+# Upper bounds of a draw from 1 to 100 for household sizes 1 to 4
+HOUSEHOLD_SIZE_BOUNDS = [43, 67, 81, 95]
+
+# Amount of appliances whose daily planning is inserted per statement
+SEED_BATCH_APPLIANCES = 100
+
+# Amount of households that are generated at a time for a generated twinworld
+GENERATE_BATCH_HOUSEHOLDS = 5000
+# Amount of households a request can generate in its single transaction, a
+# batch takes about 40 seconds on SQLite. Larger twinworlds are generated with
+# generate_twinworld directly, like the benchmarks do.
+SEED_TWINWORLD_MAX_HOUSEHOLDS = GENERATE_BATCH_HOUSEHOLDS
+
+GENERATED_DESCRIPTION = "A generated twinworld for testing the simulation at scale. The households, appliances and time windows are drawn from the same distributions as the default twinworlds."  # noqa: E501
+
+
+def create_rng(seed: float) -> numpy.random.Generator:
+    "Creates the random generator used for seeding from any float seed"
+
+    return numpy.random.default_rng(random.Random(seed).getrandbits(64))
+
+
+def create_energyflow() -> list[dict[str, Any]]:
     "Creates the energyflow data from the csv file"
 
+    # Imported here, as pandas takes long to import
+    import pandas
+
     energy_flow_hour = pandas.read_csv("energyflow.csv", sep=";")
-    hourly_data = []  # Create an empty list to store EnergyFlow objects
     first_time = unix_to_timestamp(energy_flow_hour["timestamp"].iloc[0])
     offset = round((round(first_time) - first_time) * 86400)
 
-    for _, row in energy_flow_hour.iterrows():
-        # Assuming EnergyFlow is a class where you store your data
-        energy_flow = energyflow_model.EnergyFlow(
-            timestamp=row["timestamp"] + offset,
-            energy_used=row["energy_used"],
-            solar_produced=row["solar_produced"],
-            energyflow_upload_id=1,
-        )
-        hourly_data.append(energy_flow)  # Append each object to the list
-
-    return hourly_data
-
+    return energy_flow_hour.assign(
+        timestamp=energy_flow_hour["timestamp"] + offset,
+        energyflow_upload_id=1,
+    ).to_dict("records")
 
-def add_appliance_to_session(session: Session, appliance: Appliance):
-    "Abstraction for adding an appliance to a session"
 
-    session.add(appliance)
-    session.flush()
-
-    for day in ApplianceDays:
-        timewindow = create_timewindow(day, appliance.id)
-        session.add(timewindow)
+def create_timewindows(
+    rng: numpy.random.Generator, amount: int
+) -> numpy.ndarray:
+    """Creates random time window bitmaps.
 
-    for day_number in range(1, MAX_DAYS_IN_YEAR + 1):
-        daily_planning = create_initial_daily_planning(
-            session, day_number, appliance.id
-        )
-        session.add(daily_planning)
-        session.flush()
+    The bitmap is a 24 bit integer where each bit represents an hour of the
+    day. Each bitmap consists of 1 to 3 windows.
 
-
-def create_timewindow(
-    day: ApplianceDays, appliance_id: int
-) -> appliance_model.ApplianceTimeWindow:
-    """Creates a time window for an appliance on a given day.
-
-    The bitmap is a 24 bit integer where each bit represents an hour of the day
-
-    :param day:
-        Day of the week
-    :param appliance_id:
-        Id of the appliance the time window belongs to
+    :param rng:
+        The random generator
+    :param amount:
+        The amount of bitmaps to create
     """
 
-    bitmap = 0
+    bitmap: numpy.ndarray = numpy.zeros(amount, dtype=numpy.int64)
 
-    if ApplianceType.STOVE.value == appliance_id:
-        # Set time window from 5-8 for the stove
-        timewindow = appliance_model.ApplianceTimeWindow(
-            day=day,
-            bitmap_window=0b000000000000000011110000,
-            appliance_id=appliance_id,
-        )
-        return timewindow
-
-    if ApplianceType.ELECTRIC_VEHICLE.value == appliance_id and day not in [
-        ApplianceDays.SATURDAY,
-        ApplianceDays.SUNDAY,
-    ]:
-        # Restrict hours 8-17 (8 am to 5 pm) for electric vehicle on weekdays
-        restricted_hours = 0b111111111111111111111111 & ~(0b111111111111 << 8)
-        bitmap |= restricted_hours
-
-    # Random time window generation
-    num_windows = random.randint(1, 100)
-    amount = 1 if num_windows < 90 else 2 if num_windows < 99 else 3
-
-    for _ in range(amount):
-        start_hour = random.randint(0, 23)
-        end_hour = random.randint(
-            start_hour + 1, 24
-        )  # Ensuring end is after start
+    draw = rng.integers(1, 101, amount)
+    windows = numpy.where(draw < 90, 1, numpy.where(draw < 99, 2, 3))
+
+    for window in range(3):
+        start_hour = rng.integers(0, 24, amount)
+        # Ensuring end is after start
+        end_hour = rng.integers(start_hour + 1, 25)
 
         # Check if there is already a window in the given range
         existing_bits = bitmap & ((1 << end_hour) - 1)
-        if existing_bits & ((1 << start_hour) - 1) != 0:
-            start_hour = (existing_bits.bit_length() - 1) % 24
+        bit_length = numpy.where(
+            existing_bits > 0,
+            numpy.floor(numpy.log2(numpy.maximum(existing_bits, 1))) + 1,
+            0,
+        ).astype(numpy.int64)
+        start_hour = numpy.where(
+            existing_bits & ((1 << start_hour) - 1) != 0,
+            (bit_length - 1) % 24,
+            start_hour,
+        )
 
         # Set the bits in the range to 1
         window_mask = ((1 << (end_hour - start_hour)) - 1) << start_hour
-        bitmap |= window_mask
+        bitmap = numpy.where(windows > window, bitmap | window_mask, bitmap)
 
-    timewindow = appliance_model.ApplianceTimeWindow(
-        day=day,
-        bitmap_window=bitmap,
-        appliance_id=appliance_id,
-    )
+    return bitmap
 
-    return timewindow
 
+def create_appliances(
+    rng: numpy.random.Generator,
+    appliance: dict[str, Any],
+    sizes: numpy.ndarray,
+    inv_norm: numpy.ndarray,
+) -> dict[str, numpy.ndarray]:
+    """Creates an appliance for each of the given households.
 
-def create_initial_daily_planning(
-    session: Session, day: int, appliance_id: int
-) -> appliance_model.ApplianceTimeDaily:
-    empty_day = appliance_model.ApplianceTimeDaily(
-        day=day,
-        bitmap_plan_energy=0,
-        bitmap_plan_no_energy=0,
-        appliance_id=appliance_id,
-    )
-    return empty_day
-
-
-def create_appliance(
-    name: ApplianceType,
-    household_id: int,
-    household_size: int,
-    duration: int,
-    availability: Dict[str, float],
-    frequency: Dict[str, float],
-    energy_pattern: float,
-    usage_random: float,
-    usage_multi: float,
-    usage_addition: float,
-) -> Optional[appliance_model.Appliance]:
-    """Creates an appliance with the given parameters.
+    Returns the columns of the appliances, where available tells if the
+    household has the appliance at all.
 
     daily_usage: Amount of times the appliance is used per day
-    energy_usage: Amount of energy used per usage
-
-    :param name:
-        Name of the appliance
-    :param household_id:
-        Id of the household the appliance belongs to
-    :param household_size:
-        Size of the household the appliance belongs to
-    :param duration:
-        Duration of the appliance being used
-    :param availability:
-        Probability of the appliance being available in the household
-    :param frequency:
-        Frequency of the appliance being used per day
-    :param energy_pattern:
-        Energy pattern of the household
-    :param usage_random:
-        Random factor for energy usage
-    :param usage_multi:
-        Multiplier for random factor
-    :param usage_addition:
-        Addition to random factor
+    power: Amount of energy used per usage
+
+    :param rng:
+        The random generator
+    :param appliance:
+        The distribution of the appliance, for example DISHWASHER
+    :param sizes:
+        Sizes of the households the appliances belong to
+    :param inv_norm:
+        Energy patterns of the households the appliances belong to
     """
 
-    daily_usage = 0.0
-    energy_usage = 0.0
+    amount = len(sizes)
+    usage_random = rng.random(amount)
 
-    if random.random() < availability.get(str(household_size), 0):
-        daily_usage = round(
-            frequency.get(str(household_size), 0) * energy_pattern, 3
-        )
-        energy_usage = round(usage_random * usage_multi + usage_addition, 1)
-
-        appliance = appliance_model.Appliance(
-            name=name,
-            power=energy_usage,
-            duration=duration,
-            daily_usage=daily_usage,
-            household_id=household_id,
-        )
+    if appliance["energy_pattern"] is None:
+        energy_pattern = inv_norm
+    else:
+        start, end = appliance["energy_pattern"]
+        energy_pattern = rng.random(amount) * (end - start) + start
 
-        return appliance
+    available = rng.random(amount) < numpy.take(
+        appliance["availability"], sizes - 1
+    )
 
-    return None
+    return {
+        "available": available,
+        "daily_usage": numpy.round(
+            numpy.take(appliance["frequency"], sizes - 1) * energy_pattern, 3
+        ),
+        "power": numpy.round(
+            usage_random * appliance["usage_multi"]
+            + appliance["usage_addition"],
+            1,
+        ),
+        "duration": numpy.where(
+            usage_random < 0.5,
+            appliance["duration"][0],
+            appliance["duration"][1],
+        ),
+    }
 
 
-def create_dishwasher(
-    size: int, inv_norm: float, household_id: int
-) -> Optional[appliance_model.Appliance]:
-    available = {
-        "1": 0.47,
-        "2": 0.76,
-        "3": 0.81,
-        "4": 0.89,
-        "5": 0.83,
-    }
+def create_households(
+    rng: numpy.random.Generator, amount: int, solar_avg: int
+) -> dict[str, numpy.ndarray]:
+    """Creates the columns of the given amount of households.
 
-    frequency = {
-        "1": 0.51,
-        "2": 0.7,
-        "3": 0.84,
-        "4": 0.96,
-        "5": 1.1,
-    }
+    Besides the household columns, the energy pattern of each household is
+    returned as inv_norm, which is used for the appliances.
+
+    :param rng:
+        The random generator
+    :param amount:
+        The amount of households to create
+    :param solar_avg:
+        The yearly solar yield of a single solar panel
+    """
+
+    # Imported here, as scipy takes long to import
+    from scipy.stats import norm
 
-    rand = random.random()
-
-    return create_appliance(
-        ApplianceType.DISHWASHER,
-        household_id,
-        size,
-        1 if rand < 0.5 else 2,
-        available,
-        frequency,
-        inv_norm,
-        rand,
-        0.3,
-        0.8,
+    # Min inv cap is 0.3
+    inv_norm = numpy.maximum(
+        norm.ppf(rng.random(amount), loc=1, scale=0.2), 0.3
     )
 
+    # Calculate household size
+    sizes = (
+        numpy.searchsorted(
+            HOUSEHOLD_SIZE_BOUNDS, rng.integers(1, 101, amount)
+        ).astype(numpy.int64)
+        + 1
+    )
 
-def create_washingmachine(
-    size: int, inv_norm: float, household_id: int
-) -> Optional[appliance_model.Appliance]:
-    available = {
-        "1": 0.94,
-        "2": 1,
-        "3": 1,
-        "4": 1,
-        "5": 0.97,
-    }
+    # Calculate energy usage
+    energy_usage = numpy.round(
+        inv_norm * numpy.take(DEFAULT_ENERGY_USAGE, sizes - 1)
+    ).astype(numpy.int64)
 
-    frequency = {
-        "1": 0.52,
-        "2": 0.68,
-        "3": 0.93,
-        "4": 1.24,
-        "5": 1.4,
+    # Calculate solar panels
+    inv_norm_solar = norm.ppf(rng.random(amount), loc=1, scale=0.1)
+    solar_panels = numpy.where(
+        rng.random(amount) < 0.38,
+        numpy.ceil(3 + 2 * sizes * inv_norm_solar),
+        0,
+    ).astype(numpy.int64)
+
+    return {
+        "size": sizes,
+        "energy_usage": energy_usage,
+        "solar_panels": solar_panels,
+        "solar_yield_yearly": solar_panels * solar_avg,
+        "inv_norm": inv_norm,
     }
 
-    rand = random.random()
-
-    return create_appliance(
-        ApplianceType.WASHING_MACHINE,
-        household_id,
-        size,
-        2 if rand < 0.5 else 3,
-        available,
-        frequency,
-        inv_norm,
-        rand,
-        0.7,
-        0.9,
-    )
 
+def create_household_appliances(
+    rng: numpy.random.Generator,
+    sizes: numpy.ndarray,
+    inv_norm: numpy.ndarray,
+) -> list[tuple[dict[str, Any], dict[str, numpy.ndarray]]]:
+    """Creates the appliances of the given households.
 
-def create_tumbledryer(
-    size: int, inv_norm: float, household_id: int
-) -> Optional[appliance_model.Appliance]:
-    available = {
-        "1": 0.63,
-        "2": 0.63,
-        "3": 0.63,
-        "4": 0.63,
-        "5": 0.63,
-    }
+    Every household gets at least one appliance, and a tumble dryer is only
+    possible when the household has a washing machine.
 
-    frequency = {
-        "1": 0.52,
-        "2": 0.68,
-        "3": 0.93,
-        "4": 1.24,
-        "5": 1.4,
-    }
+    Returns the appliance distribution with its columns, in the order the
+    appliances are added to a household.
 
-    rand = random.random()
-
-    return create_appliance(
-        ApplianceType.TUMBLE_DRYER,
-        household_id,
-        size,
-        1 if rand < 0.5 else 2,
-        available,
-        frequency,
-        inv_norm,
-        rand,
-        2,
-        1,
-    )
+    :param rng:
+        The random generator
+    :param sizes:
+        Sizes of the households
+    :param inv_norm:
+        Energy patterns of the households
+    """
 
+    appliances = [ELECTRIC_VEHICLE, DISHWASHER, STOVE, WASHING_MACHINE]
+    columns = [
+        create_appliances(rng, appliance, sizes, inv_norm)
+        for appliance in appliances
+    ]
 
-def create_electricvehicle(
-    size: int, household_id: int
-) -> Optional[appliance_model.Appliance]:
-    available = {
-        "1": 0.2,
-        "2": 0.2,
-        "3": 0.2,
-        "4": 0.2,
-        "5": 0.2,
-    }
+    # Simple trick to make sure at least one appliance is created
+    missing = ~numpy.any([column["available"] for column in columns], axis=0)
 
-    frequency = {
-        "1": 1.0,
-        "2": 1.0,
-        "3": 1.0,
-        "4": 1.0,
-        "5": 1.0,
-    }
+    while missing.any():
+        for appliance, column in zip(appliances, columns):
+            retry = create_appliances(
+                rng, appliance, sizes[missing], inv_norm[missing]
+            )
+            for key, value in retry.items():
+                column[key][missing] = value
 
-    rand = random.random()
-
-    return create_appliance(
-        ApplianceType.ELECTRIC_VEHICLE,
-        household_id,
-        size,
-        4 if rand < 0.5 else 5,
-        available,
-        frequency,
-        random.random() * 0.8 + 0.2,
-        rand,
-        10,
-        50,
-    )
+        missing = ~numpy.any(
+            [column["available"] for column in columns], axis=0
+        )
 
+    tumble_dryer = create_appliances(rng, TUMBLE_DRYER, sizes, inv_norm)
+    tumble_dryer["available"] &= columns[-1]["available"]
+
+    return list(zip(appliances, columns)) + [(TUMBLE_DRYER, tumble_dryer)]
+
+
+def add_households_to_session(
+    session: Session,
+    rng: numpy.random.Generator,
+    households: dict[str, Any],
+    first_household_id: int = 1,
+    first_appliance_id: int = 1,
+) -> int:
+    """Bulk inserts the households with their appliances, time windows and
+    initial daily planning.
+
+    The ids are set explicitly, so the daily planning of every appliance is
+    stored in a consecutive block that is ordered by day.
+
+    Returns the amount of created appliances.
+
+    :param session:
+        A SQLModel session
+    :param rng:
+        The random generator
+    :param households:
+        The household columns of create_households, with name and
+        twinworld_id columns added
+    :param first_household_id:
+        The id of the first household
+    :param first_appliance_id:
+        The id of the first appliance
+    """
 
-def create_stove(
-    size: int, household_id: int
-) -> Optional[appliance_model.Appliance]:
-    available = {
-        "1": 0.49,
-        "2": 0.49,
-        "3": 0.49,
-        "4": 0.49,
-        "5": 0.49,
-    }
+    # Imported here, as pandas takes long to import
+    import pandas
 
-    frequency = {
-        "1": 1.0,
-        "2": 1.0,
-        "3": 1.0,
-        "4": 1.0,
-        "5": 1.0,
-    }
+    amount = len(households["size"])
+    household_ids = numpy.arange(
+        first_household_id, first_household_id + amount
+    )
 
-    rand = random.random()
-
-    return create_appliance(
-        ApplianceType.STOVE,
-        household_id,
-        size,
-        1 if rand < 0.5 else 2,
-        available,
-        frequency,
-        random.random() * 0.15 + 0.85,
-        rand,
-        0.5,
-        0.5,
+    household_crud.create_multi(
+        session=session,
+        objs_in=pandas.DataFrame(
+            {
+                "id": household_ids,
+                "name": households["name"],
+                "size": households["size"],
+                "energy_usage": households["energy_usage"],
+                "solar_panels": households["solar_panels"],
+                "solar_yield_yearly": households["solar_yield_yearly"],
+                "twinworld_id": households["twinworld_id"],
+            }
+        ).to_dict("records"),
     )
 
+    appliances = create_household_appliances(
+        rng, households["size"], households["inv_norm"]
+    )
 
-def create_household(
-    name: str, twinworld_id: int, solar_avg: int, inv_norm: float
-) -> household_model.Household:
-    # Map for household size to energy usage
-    default_energy_usage = {
-        "1": 1600,
-        "2": 2500,
-        "3": 3400,
-        "4": 4300,
-        "5": 5000,
-    }
+    # Appliances are ordered by household, then in the order of appliances
+    available = numpy.stack(
+        [column["available"] for _, column in appliances], axis=1
+    )
+    household_index, appliance_index = numpy.nonzero(available)
+    amount_appliances = len(household_index)
+    appliance_ids = numpy.arange(
+        first_appliance_id, first_appliance_id + amount_appliances
+    )
 
-    # Calculate household size
-    randint = random.randint(1, 100)
-    household_size = 5
-    if randint <= 43:
-        household_size = 1
-    elif randint <= 67:
-        household_size = 2
-    elif randint <= 81:
-        household_size = 3
-    elif randint <= 95:
-        household_size = 4
+    def appliance_column(key: str) -> numpy.ndarray:
+        return numpy.stack([column[key] for _, column in appliances], axis=1)[
+            household_index, appliance_index
+        ]
+
+    appliance_crud.create_multi(
+        session=session,
+        objs_in=pandas.DataFrame(
+            {
+                "id": appliance_ids,
+                "name": numpy.array(
+                    [appliance["name"] for appliance, _ in appliances],
+                    dtype=object,
+                )[appliance_index],
+                "power": appliance_column("power"),
+                "duration": appliance_column("duration"),
+                "daily_usage": appliance_column("daily_usage"),
+                "household_id": household_ids[household_index],
+            }
+        ).to_dict("records"),
+    )
 
-    # Calculate energy usage
-    total_energy_usage = int(
-        round(inv_norm * default_energy_usage[str(household_size)], 0)
+    days = list(ApplianceDays)
+    bitmaps = create_timewindows(rng, amount_appliances * len(days)).tolist()
+
+    appliance_time_window_crud.create_multi(
+        session=session,
+        objs_in=[
+            {
+                "day": day,
+                "bitmap_window": bitmap,
+                "appliance_id": appliance_id,
+            }
+            for appliance_id, day, bitmap in zip(
+                numpy.repeat(appliance_ids, len(days)).tolist(),
+                days * amount_appliances,
+                bitmaps,
+            )
+        ],
     )
 
-    # Calculate solar panels
-    solar_panels = 0
-    if random.random() < 0.38:
-        inv_norm_solar = norm.ppf(random.random(), loc=1, scale=0.1)
-        solar_panels = ceil(3 + 2 * household_size * inv_norm_solar)
+    # Insert the daily planning in batches, as it is a row per day per
+    # appliance
+    for start in range(0, amount_appliances, SEED_BATCH_APPLIANCES):
+        end = start + SEED_BATCH_APPLIANCES
+        appliance_time_daily_crud.create_multi(
+            session=session,
+            objs_in=[
+                {
+                    "day": day,
+                    "bitmap_plan_energy": 0,
+                    "bitmap_plan_no_energy": 0,
+                    "appliance_id": appliance_id,
+                }
+                for appliance_id in appliance_ids[start:end].tolist()
+                for day in range(1, MAX_DAYS_IN_YEAR + 1)
+            ],
+        )
+
+    return amount_appliances
+
 
-    solar_yield = solar_panels * solar_avg
+def generate_twinworld(
+    session: Session,
+    *,
+    name: str,
+    households: int,
+    seed: float,
+    description: str = GENERATED_DESCRIPTION,
+    solar_panel_capacity: int = 340,
+) -> twinworld_model.TwinWorld:
+    """Generates a twinworld with the given amount of households.
 
-    household = household_model.Household(
+    The households and appliances are drawn from the same distributions as
+    the seeded twinworlds. They are created in batches of
+    GENERATE_BATCH_HOUSEHOLDS households, so large twinworlds can be generated
+    without holding all rows in memory. Everything is added in one
+    transaction, which the caller has to commit.
+
+    :param session:
+        A SQLModel session
+    :param name:
+        Name of the twinworld
+    :param households:
+        The amount of households in the twinworld
+    :param seed:
+        The seed for the random generator
+    :param description:
+        Description of the twinworld
+    :param solar_panel_capacity:
+        The yearly solar yield of a single solar panel
+    """
+
+    rng = create_rng(seed)
+
+    twinworld = twinworld_model.TwinWorld(
         name=name,
-        size=household_size,
-        energy_usage=total_energy_usage,
-        solar_panels=solar_panels,
-        solar_yield_yearly=solar_yield,
-        twinworld_id=twinworld_id,
+        description=description,
+        solar_panel_capacity=solar_panel_capacity,
     )
 
-    return household
+    session.add(twinworld)
+    session.flush()
+
+    household_id = (household_crud.get_max_id(session=session) or 0) + 1
+    appliance_id = (appliance_crud.get_max_id(session=session) or 0) + 1
+
+    for start in range(0, households, GENERATE_BATCH_HOUSEHOLDS):
+        amount = min(GENERATE_BATCH_HOUSEHOLDS, households - start)
+
+        batch = create_households(rng, amount, solar_panel_capacity)
+        batch["name"] = numpy.array(
+            [
+                f"TW{twinworld.id} H{i}"
+                for i in range(start + 1, start + amount + 1)
+            ]
+        )
+        batch["twinworld_id"] = numpy.full(amount, twinworld.id)
+
+        appliance_id += add_households_to_session(
+            session, rng, batch, household_id, appliance_id
+        )
+        household_id += amount
+
+    return twinworld
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model="None")
@@ -457,7 +556,7 @@ def seed(
     delete_db_and_tables()
     create_db_and_tables()
 
-    random.seed(seed)
+    rng = create_rng(seed)
 
     energyflow_upload = energyflow_model.EnergyFlowUpload(
         name="Energyflow Zoetermeer",
@@ -469,9 +568,8 @@ def seed(
     session.add(energyflow_upload)
     session.flush()
 
-    energyflow = create_energyflow()
-    for x in energyflow:
-        session.add(x)
+    energyflow_crud.create_multi(session=session, objs_in=create_energyflow())
+    energyflow_summary_crud.summarize(session=session, id=energyflow_upload.id)
 
     greedy = algorithm_model.Algorithm(
         name="Greedy planning",
@@ -532,72 +630,58 @@ def seed(
 
     session.flush()
 
-    for i in range(1, 101):
-        inv_norm = norm.ppf(random.random(), loc=1, scale=0.2)
-
-        # Min inv cap is 0.3
-        if inv_norm < 0.3:
-            inv_norm = 0.3
+    households = create_households(rng, 100, twinworld_1.solar_panel_capacity)
+    households["name"] = numpy.array([f"Household {i}" for i in range(1, 101)])
+    households["twinworld_id"] = numpy.where(
+        rng.random(100) > 0.75, twinworld_1.id, twinworld_2.id
+    )
 
-        if random.random() > 0.75:
-            household = create_household(
-                f"Household {i}", 1, twinworld_1.solar_panel_capacity, inv_norm
-            )
-        else:
-            household = create_household(
-                f"Household {i}", 2, twinworld_2.solar_panel_capacity, inv_norm
-            )
+    add_households_to_session(session, rng, households)
 
-        session.add(household)
-        session.flush()
+    try:
+        session.commit()
+    except Exception:
+        session.rollback()
 
-        dishwasher = create_dishwasher(household.size, inv_norm, household.id)
-        vehicle = create_electricvehicle(household.size, household.id)
-        stove = create_stove(household.size, household.id)
-        washingmachine = create_washingmachine(
-            household.size, inv_norm, household.id
+        Logger.exception(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not add seed data",
         )
 
-        # Simple trick to make sure at least one appliance is created
-        while (
-            dishwasher is None
-            and vehicle is None
-            and stove is None
-            and washingmachine is None
-        ):
-            dishwasher = create_dishwasher(
-                household.size, inv_norm, household.id
-            )
-            vehicle = create_electricvehicle(household.size, household.id)
-            stove = create_stove(household.size, household.id)
-            washingmachine = create_washingmachine(
-                household.size, inv_norm, household.id
-            )
-
-        session.flush()
 
-        if vehicle is not None:
-            add_appliance_to_session(session, vehicle)
-        if dishwasher is not None:
-            add_appliance_to_session(session, dishwasher)
-        if stove is not None:
-            add_appliance_to_session(session, stove)
-        if washingmachine is not None:
-            add_appliance_to_session(session, washingmachine)
-
-        if washingmachine is not None:
-            tumbledryer = create_tumbledryer(
-                household.size, inv_norm, household.id
-            )
-            if tumbledryer is not None:
-                add_appliance_to_session(session, tumbledryer)
+@router.post(
+    "/twinworld",
+    status_code=status.HTTP_201_CREATED,
+    response_model=twinworld_model.TwinWorldRead,
+)
+def seed_twinworld(
+    *,
+    name: str = Body(...),
+    households: int = Body(..., ge=1, le=SEED_TWINWORLD_MAX_HOUSEHOLDS),
+    seed: float = Body(default_factory=random.random),
+    session: Session = Depends(get_session),
+) -> twinworld_model.TwinWorld:
+    "Generates a twinworld with the given amount of households, without deleting the current data in the database"  # noqa: E501
+
+    if twinworld_crud.get_by_name(session=session, name=name):
+        Logger.exception(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Twinworld with name {name} already exists",
+        )
 
     try:
+        twinworld = generate_twinworld(
+            session, name=name, households=households, seed=seed
+        )
         session.commit()
     except Exception:
         session.rollback()
 
         Logger.exception(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Could not add seed data",
+            detail="Could not generate twinworld",
         )
+
+    session.refresh(twinworld)
+
+    return twinworld
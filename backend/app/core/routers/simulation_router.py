@@ -7,22 +7,29 @@ all the possible options for the simulation. Then once the user has selected
 the options through the stepper, the frontend would call the /start endpoint to
 start the simulation.
 
+The /start endpoint returns the id of the simulation. When it is sent along to
+/plan, every planned day is kept in the plan store, and the schedules and
+results of the simulation can be exported through /{simulation_id}/schedules
+and /{simulation_id}/results.
+
 Once the simulation is done because the algorithm isn't finding any more
 improvements, or the user has stopped the simulation, the frontend stops
 calling the /plan endpoint, and ends the simulation.
 """
 
-# Import libraries for exec() by the researcher
-import pandas  # noqa: F401
-import numpy  # noqa: F401
-import scipy  # noqa: F401
-import math  # noqa: F401
-import random  # noqa: F401
+from typing import Iterator, Optional
 
-from fastapi import APIRouter, Depends, Body, status
+from fastapi import APIRouter, Depends, Body, Header, Response, status
+from fastapi.responses import StreamingResponse
 
 from sqlmodel import Session
 
+from app import plan_store
+from app.metrics import record_stages, track_simulation
+from app.plan_format import PLAN_MEDIA_TYPE, encode_plan
+from app.profiling import profile_headers, profile_request
+from app.sandbox import compile_algorithm, researcher_libraries
+from app.timing import SERVER_TIMING, StageTimer
 from app.utils import Logger, get_session, SECONDS_IN_DAY
 
 from app.core.crud.costmodel_crud import costmodel_crud
@@ -122,13 +129,24 @@ async def start(
         algorithm=algorithm,
         households=households,
         energyflow=energyflow_upload,
+        simulation_id=plan_store.create_simulation(),
     )
 
 
-@router.post("/plan", response_model=SelectedModelsOutput)
+@router.post(
+    "/plan",
+    response_model=SelectedModelsOutput,
+    responses={200: {"content": {PLAN_MEDIA_TYPE: {}}}},
+    dependencies=[Depends(track_simulation)],
+)
 async def plan(
-    *, planning: SelectedModelsInput, session: Session = Depends(get_session)
-) -> SelectedModelsOutput:
+    *,
+    planning: SelectedModelsInput,
+    response: Response,
+    accept: Optional[str] = Header(default=None),
+    session: Session = Depends(get_session),
+    profile: Optional[str] = Depends(profile_request),
+) -> SelectedModelsOutput | Response:
     """The plan function executing all the different subfunctions.
 
     The plan function is done in the following 8 steps:
@@ -146,20 +164,47 @@ async def plan(
     The reason for performing write_results twice is in case the random nature
     of simulated annealing causes a worse result during simulated annealing.
     While this is unlikely, it technically is possible.
+
+    If a simulation_id is given, the planned days are also written to the plan
+    store for the exports.
+
+    If the Accept header contains application/octet-stream, the output is sent
+    in the compact binary format of app.plan_format instead of JSON.
+
+    The time spent in every step is sent in the Server-Timing header.
+
+    With delta, the JSON timedaily only contains the entries that differ from
+    what the client has: the days of the acknowledged version of the
+    simulation, and empty plans for the other days. The client acknowledges
+    the version of the response it applied by sending it along with the next
+    call.
     """
-    (
-        days_in_chunk,
-        days_in_planning,
-        length_planning,
-        start_date,
-        end_date,
-        total_start_date,
-        energyflow_data_sim,
-        energyflow_data,
-        appliance_time,
-        household_planning,
-        results,
-    ) = setup_planning(session=session, planning=planning)
+    timer = StageTimer()
+
+    if (
+        planning.simulation_id is not None
+        and not plan_store.simulation_exists(planning.simulation_id)
+    ):
+        Logger.exception(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Simulation with id {planning.simulation_id} not found",
+        )
+
+    with timer.stage("setup_planning"):
+        (
+            days_in_chunk,
+            days_in_planning,
+            length_planning,
+            start_date,
+            end_date,
+            total_start_date,
+            energyflow_data_sim,
+            energyflow_data,
+            appliance_time,
+            household_planning,
+            results,
+            solar_produced_days,
+        ) = setup_planning(session=session, planning=planning)
 
     local_vars = locals()
     global_vars = globals()
@@ -176,27 +221,29 @@ async def plan(
             "appliance_time": appliance_time,
             "household_planning": household_planning,
             "results": results,
+            "solar_produced_days": solar_produced_days,
         }
     )
     global_vars.update(local_vars)
 
     for day_iterator in range(1, days_in_chunk + 1):
-        (
-            date,
-            energyflow_day,
-            household_energy,
-            total_available_energy,
-            day_number_in_planning,
-        ) = loop_helpers(
-            start_date=start_date,
-            total_start_date=total_start_date,
-            day_iterator=day_iterator,
-            length_planning=length_planning,
-            household_planning=household_planning,
-            energyflow_data=energyflow_data,
-            energyflow=planning.energyflow,
-            twinworld=planning.twinworld,
-        )
+        with timer.stage("loop_helpers"):
+            (
+                date,
+                energyflow_day,
+                household_energy,
+                total_available_energy,
+                day_number_in_planning,
+            ) = loop_helpers(
+                start_date=start_date,
+                total_start_date=total_start_date,
+                day_iterator=day_iterator,
+                length_planning=length_planning,
+                household_planning=household_planning,
+                energyflow_data=energyflow_data,
+                energyflow=planning.energyflow,
+                twinworld=planning.twinworld,
+            )
 
         local_vars.update(
             {
@@ -213,67 +260,39 @@ async def plan(
             planning.algorithm.name == "Greedy planning"
             or planning.algorithm.name == "Simulated Annealing"
         ):
-            for household_idx, household in enumerate(household_planning):
-                for appliance in household.appliances:
-                    (
-                        appliance_time,
-                        total_available_energy,
-                        household_energy,
-                    ) = plan_greedy(
-                        household_idx=household_idx,
-                        days_in_planning=days_in_planning,
-                        day_number_in_planning=day_number_in_planning,
-                        total_available_energy=total_available_energy,
-                        household_energy=household_energy,
-                        appliance=appliance,
-                        appliance_time=appliance_time,
-                        energyflow_day=energyflow_day,
-                        total_start_date=total_start_date,
-                    )
-
-        (
-            solar_produced,
-            current_used,
-            current_available,
-            energyflow_day_sim,
-        ) = create_results(
-            total_start_date=total_start_date,
-            day_number_in_planning=day_number_in_planning,
-            energyflow_data_sim=energyflow_data_sim,
-            household_planning=household_planning,
-            energyflow=planning.energyflow,
-        )
-
-        results = write_results(
-            date=date,
-            day_iterator=day_iterator,
-            day_number_in_planning=day_number_in_planning,
-            results=results,
-            energyflow=planning.energyflow,
-            twinworld=planning.twinworld,
-            costmodel=planning.costmodel,
-            appliance_time=appliance_time,
-            energyflow_day_sim=energyflow_day_sim,
-            household_planning=household_planning,
-        )
-
-        if total_available_energy <= 0:
-            continue
-
-        if planning.algorithm.name == "Simulated Annealing":
-            plan_simulated_annealing(
-                date=date,
-                days_in_planning=days_in_planning,
+            with timer.stage("plan_greedy"):
+                for household_idx, household in enumerate(household_planning):
+                    for appliance in household.appliances:
+                        (
+                            appliance_time,
+                            total_available_energy,
+                            household_energy,
+                        ) = plan_greedy(
+                            household_idx=household_idx,
+                            day_number_in_planning=day_number_in_planning,
+                            total_available_energy=total_available_energy,
+                            household_energy=household_energy,
+                            appliance=appliance,
+                            appliance_time=appliance_time,
+                            energyflow_day=energyflow_day,
+                            total_start_date=total_start_date,
+                        )
+
+        with timer.stage("create_results"):
+            (
+                solar_produced,
+                current_used,
+                current_available,
+                energyflow_day_sim,
+            ) = create_results(
+                total_start_date=total_start_date,
                 day_number_in_planning=day_number_in_planning,
-                length_planning=length_planning,
-                current_available=current_available,
-                solar_produced=solar_produced,
-                current_used=current_used,
-                algorithm=planning.algorithm,
+                energyflow_data_sim=energyflow_data_sim,
                 household_planning=household_planning,
-                appliance_time=appliance_time,
+                energyflow=planning.energyflow,
             )
 
+        with timer.stage("write_results"):
             results = write_results(
                 date=date,
                 day_iterator=day_iterator,
@@ -285,8 +304,45 @@ async def plan(
                 appliance_time=appliance_time,
                 energyflow_day_sim=energyflow_day_sim,
                 household_planning=household_planning,
+                solar_produced_day=solar_produced_days.get(
+                    day_number_in_planning, 0.0
+                ),
             )
 
+        if total_available_energy <= 0:
+            continue
+
+        if planning.algorithm.name == "Simulated Annealing":
+            with timer.stage("simulated_annealing"):
+                plan_simulated_annealing(
+                    date=date,
+                    day_number_in_planning=day_number_in_planning,
+                    length_planning=length_planning,
+                    current_available=current_available,
+                    solar_produced=solar_produced,
+                    current_used=current_used,
+                    algorithm=planning.algorithm,
+                    household_planning=household_planning,
+                    appliance_time=appliance_time,
+                )
+
+            with timer.stage("write_results"):
+                results = write_results(
+                    date=date,
+                    day_iterator=day_iterator,
+                    day_number_in_planning=day_number_in_planning,
+                    results=results,
+                    energyflow=planning.energyflow,
+                    twinworld=planning.twinworld,
+                    costmodel=planning.costmodel,
+                    appliance_time=appliance_time,
+                    energyflow_day_sim=energyflow_day_sim,
+                    household_planning=household_planning,
+                    solar_produced_day=solar_produced_days.get(
+                        day_number_in_planning, 0.0
+                    ),
+                )
+
         # If the researcher didn't select the greedy or simulated
         # annealing algorithm, evaluate the algorithm of the researcher
         if (
@@ -294,23 +350,86 @@ async def plan(
             and planning.algorithm.name != "Simulated Annealing"
         ):
             algo = planning.algorithm.algorithm
-            try:
-                exec(algo, global_vars, local_vars)
-                run = local_vars.get("run", None)
-                run()
-            except Exception as e:
-                Logger.exception(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Error in algorithm: {e}",
-                )
+            with timer.stage("algorithm"):
+                global_vars.update(researcher_libraries())
+                try:
+                    exec(compile_algorithm(algo), global_vars, local_vars)
+                    run = local_vars.get("run", None)
+                    run()
+                except Exception as e:
+                    Logger.exception(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Error in algorithm: {e}",
+                    )
 
     start_day = (start_date - total_start_date) // SECONDS_IN_DAY + 1
 
-    time_daily = [
-        el
-        for el in appliance_time
-        if el.day >= start_day and el.day < start_day + days_in_chunk
-    ]
+    time_daily = list(appliance_time.values())
+
+    appliance_ids = {
+        appliance.id
+        for household in household_planning
+        for appliance in household.appliances
+    }
+    version = None
+    acknowledged: dict[tuple[int, int], tuple[int, int]] = {}
+    rewritten: set[int] = set()
+
+    with timer.stage("plan_store"):
+        if planning.simulation_id is not None:
+            acknowledged, rewritten = plan_store.read_acknowledged(
+                simulation_id=planning.simulation_id,
+                start_day=start_day,
+                days=days_in_chunk,
+                version=planning.version,
+            )
+            version = plan_store.write_chunk(
+                simulation_id=planning.simulation_id,
+                start_day=start_day,
+                total_start_date=total_start_date,
+                results=results,
+                appliance_time=time_daily,
+                appliance_ids=appliance_ids,
+            )
+
+    if accept is not None and PLAN_MEDIA_TYPE in accept:
+        with timer.stage("encode_plan"):
+            content = encode_plan(
+                time_daily=time_daily,
+                results=results,
+                days_in_planning=days_in_planning,
+                start_day=start_day,
+                start_date=total_start_date,
+                end_date=end_date,
+            )
+
+        record_stages(timer)
+        # The headers set on the response of the route, like the security
+        # headers, are only sent when the returned response has them too
+        return Response(
+            content=content,
+            media_type=PLAN_MEDIA_TYPE,
+            headers={
+                **response.headers,
+                SERVER_TIMING: timer.server_timing(),
+                **profile_headers(profile),
+            },
+        )
+
+    # Only send what the client doesn't have yet, which is empty for the days
+    # it has not received
+    if planning.delta:
+        time_daily = [
+            el
+            for el in time_daily
+            if (el.day in rewritten and el.appliance_id in appliance_ids)
+            or (el.bitmap_plan_energy, el.bitmap_plan_no_energy)
+            != acknowledged.get((el.appliance_id, el.day), (0, 0))
+        ]
+
+    record_stages(timer)
+    response.headers[SERVER_TIMING] = timer.server_timing()
+    response.headers.update(profile_headers(profile))
 
     return SelectedModelsOutput(
         results=results,
@@ -318,4 +437,67 @@ async def plan(
         days_in_planning=days_in_planning,
         start_date=total_start_date,
         end_date=end_date,
+        version=version,
+    )
+
+
+def _export(
+    export: Optional[Iterator[str]],
+    *,
+    response: Response,
+    simulation_id: str,
+    name: str,
+    format: plan_store.ExportFormat,
+) -> StreamingResponse:
+    "Internal function that streams an export of the plan store"
+
+    if export is None:
+        Logger.exception(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Simulation with id {simulation_id} not found",
+        )
+
+    # The security headers are set on the response of the route
+    return StreamingResponse(
+        export,
+        media_type=plan_store.EXPORT_MEDIA_TYPES[format],
+        headers={
+            **response.headers,
+            "Content-Disposition": "attachment; "
+            f'filename="{simulation_id}-{name}.{format.value}"',
+        },
+    )
+
+
+@router.get("/{simulation_id}/schedules", response_class=StreamingResponse)
+async def export_schedules(
+    *,
+    simulation_id: str,
+    format: plan_store.ExportFormat = plan_store.ExportFormat.CSV,
+    response: Response,
+) -> StreamingResponse:
+    "Export the planned appliance schedules of a simulation per day"
+    return _export(
+        plan_store.export_schedules(simulation_id, format),
+        response=response,
+        simulation_id=simulation_id,
+        name="schedules",
+        format=format,
+    )
+
+
+@router.get("/{simulation_id}/results", response_class=StreamingResponse)
+async def export_results(
+    *,
+    simulation_id: str,
+    format: plan_store.ExportFormat = plan_store.ExportFormat.CSV,
+    response: Response,
+) -> StreamingResponse:
+    "Export the results of a simulation per day"
+    return _export(
+        plan_store.export_results(simulation_id, format),
+        response=response,
+        simulation_id=simulation_id,
+        name="results",
+        format=format,
     )
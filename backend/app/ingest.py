@@ -0,0 +1,500 @@
+"""Streaming ingest of uploaded energyflow files.
+
+Uploaded energyflow files can be large (a year of hourly data is 8760 rows,
+sub-hourly or multi-year data is a multiple of that), so they are never read
+into memory as a whole. The file is read in blocks, the rows are converted
+column by column in batches, and every batch is inserted with a single
+executemany statement. A batch is kept as its columns, so no dictionary is
+built per row.
+
+Besides semicolon delimited CSV files with comma decimals, Parquet and Arrow
+IPC files are supported. Those are read column wise in record batches through
+pyarrow, which avoids parsing text altogether.
+
+The upload request only stores the file and creates an ingest job. The
+energyflows are inserted by the job in the background, and the progress of the
+job can be polled until the EnergyFlowUpload is completed. A job that was cut
+off by a restart of the server is failed by recover_ingest_jobs() when the
+server starts again.
+"""
+
+import os
+import time
+from codecs import getincrementaldecoder
+from csv import reader
+from pathlib import Path
+from shutil import copyfileobj
+from tempfile import mkstemp
+from typing import Any, BinaryIO, Iterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from sqlmodel import Session
+
+from app.config import engine
+from app.metrics import INGEST_ROWS, INGEST_SECONDS, record_ingest_memory
+from app.profiling import profiled
+from app.timing import StageTimer
+from app.utils import Logger
+
+from app.core.crud.energyflow_crud import (
+    energyflow_crud,
+    energyflow_ingest_job_crud,
+    energyflow_summary_crud,
+)
+from app.core.models.energyflow_model import (
+    EnergyFlowUpload,
+    EnergyFlowUploadCreate,
+    EnergyFlowIngestJob,
+    EnergyFlowIngestJobStatus,
+)
+
+INGEST_BLOCK_SIZE = 64 * 1024  # bytes read from the upload at a time
+INGEST_BATCH_SIZE = 5000  # rows inserted per executemany statement
+
+ENERGYFLOW_COLUMNS = ("timestamp", "energy_used", "solar_produced")
+
+# The first bytes of the binary formats, used to detect the format of a file
+PARQUET_MAGIC = b"PAR1"
+ARROW_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+UPLOAD_FOLDER = os.path.join(Path().resolve(), "data/uploads")
+UPLOAD_SUFFIX = ".upload"
+
+
+def _iter_lines(file: BinaryIO, block_size: int) -> Iterator[str]:
+    """Internal function that yields the decoded lines of a file, reading it
+    in blocks of block_size bytes.
+
+    The file is decoded with utf-8-sig, so a byte order mark at the start of
+    the file is removed.
+    """
+
+    decoder = getincrementaldecoder("utf-8-sig")()
+    remainder = ""
+
+    while block := file.read(block_size):
+        lines = (remainder + decoder.decode(block)).splitlines(keepends=True)
+
+        # The last line is incomplete if the block ended halfway through it
+        remainder = (
+            lines.pop() if lines and lines[-1][-1] not in "\r\n" else ""
+        )
+
+        yield from lines
+
+    remainder += decoder.decode(b"", final=True)
+
+    if remainder:
+        yield remainder
+
+
+def _to_float(value: str) -> float:
+    "Internal function that parses a float that uses a comma as decimal mark"
+
+    return float(value.replace(",", "."))
+
+
+def _check_schema(names: list[str]) -> None:
+    "Internal function that checks if all energyflow columns are present"
+
+    missing = [column for column in ENERGYFLOW_COLUMNS if column not in names]
+
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+
+def iter_csv_batches(
+    file: BinaryIO,
+    *,
+    energyflow_upload_id: int,
+    block_size: int = INGEST_BLOCK_SIZE,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> Iterator[dict[str, list[Any]]]:
+    """Parses a semicolon delimited energyflow CSV file into batches of rows.
+
+    The rows are collected per column, and each column is converted in one go
+    once a batch is full. Every batch holds the values per column, including
+    energyflow_upload_id, and can be passed directly to
+    energyflow_crud.create_columns.
+
+    :param file:
+        The binary file object of the upload
+    :param energyflow_upload_id:
+        The id of the EnergyFlowUpload the rows belong to
+    :param block_size:
+        The number of bytes to read from the file at a time
+    :param batch_size:
+        The maximum number of rows in a batch
+    """
+
+    rows = reader(
+        _iter_lines(file, block_size), delimiter=";", skipinitialspace=True
+    )
+
+    header = [column.strip() for column in next(rows, [])]
+    _check_schema(header)
+
+    indices = [header.index(column) for column in ENERGYFLOW_COLUMNS]
+    columns: list[list[str]] = [[], [], []]
+
+    def convert() -> dict[str, list[Any]]:
+        batch: dict[str, list[Any]] = {
+            "timestamp": [int(value) for value in columns[0]],
+            "energy_used": [_to_float(value) for value in columns[1]],
+            "solar_produced": [_to_float(value) for value in columns[2]],
+            "energyflow_upload_id": [energyflow_upload_id] * len(columns[0]),
+        }
+
+        for column in columns:
+            column.clear()
+
+        return batch
+
+    for row in rows:
+        if not row:
+            continue
+
+        for column, index in zip(columns, indices):
+            column.append(row[index])
+
+        if len(columns[0]) >= batch_size:
+            yield convert()
+
+    if columns[0]:
+        yield convert()
+
+
+def _record_batch_to_columns(
+    batch: Any, energyflow_upload_id: int
+) -> dict[str, list[Any]]:
+    """Internal function that converts an Arrow record batch into the values
+    per column.
+
+    Every column is cast as a whole, timestamp columns are converted to unix
+    seconds.
+    """
+
+    import pyarrow
+
+    timestamp = batch.column(batch.schema.get_field_index("timestamp"))
+
+    if pyarrow.types.is_timestamp(timestamp.type):
+        timestamp = timestamp.cast(pyarrow.timestamp("s"))
+
+    columns = {"timestamp": timestamp.cast(pyarrow.int64()).to_pylist()}
+    for column in ENERGYFLOW_COLUMNS[1:]:
+        columns[column] = (
+            batch.column(batch.schema.get_field_index(column))
+            .cast(pyarrow.float64())
+            .to_pylist()
+        )
+    columns["energyflow_upload_id"] = [energyflow_upload_id] * batch.num_rows
+
+    return columns
+
+
+def iter_parquet_batches(
+    file: BinaryIO,
+    *,
+    energyflow_upload_id: int,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> Iterator[dict[str, list[Any]]]:
+    """Reads a Parquet energyflow file into batches of rows.
+
+    Only the energyflow columns are read, one record batch at a time.
+
+    :param file:
+        The binary file object of the upload
+    :param energyflow_upload_id:
+        The id of the EnergyFlowUpload the rows belong to
+    :param batch_size:
+        The maximum number of rows in a batch
+    """
+
+    import pyarrow.parquet
+
+    parquet_file = pyarrow.parquet.ParquetFile(file)
+    _check_schema(parquet_file.schema_arrow.names)
+
+    for batch in parquet_file.iter_batches(
+        batch_size=batch_size, columns=list(ENERGYFLOW_COLUMNS)
+    ):
+        yield _record_batch_to_columns(batch, energyflow_upload_id)
+
+
+def iter_arrow_batches(
+    file: BinaryIO,
+    *,
+    energyflow_upload_id: int,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> Iterator[dict[str, list[Any]]]:
+    """Reads an Arrow IPC energyflow file into batches of rows.
+
+    Both the IPC file format (also known as Feather version 2) and the IPC
+    stream format are supported. Record batches larger than batch_size are
+    sliced.
+
+    :param file:
+        The binary file object of the upload
+    :param energyflow_upload_id:
+        The id of the EnergyFlowUpload the rows belong to
+    :param batch_size:
+        The maximum number of rows in a batch
+    """
+
+    import pyarrow.ipc
+
+    if file.read(len(ARROW_MAGIC)) == ARROW_MAGIC:
+        file.seek(0)
+        file_reader = pyarrow.ipc.open_file(file)
+        batches = (
+            file_reader.get_batch(index)
+            for index in range(file_reader.num_record_batches)
+        )
+        schema = file_reader.schema
+    else:
+        file.seek(0)
+        stream_reader = pyarrow.ipc.open_stream(file)
+        batches = iter(stream_reader)
+        schema = stream_reader.schema
+
+    _check_schema(schema.names)
+
+    for batch in batches:
+        for offset in range(0, batch.num_rows, batch_size):
+            yield _record_batch_to_columns(
+                batch.slice(offset, batch_size), energyflow_upload_id
+            )
+
+
+def iter_energyflow_batches(
+    file: BinaryIO,
+    *,
+    energyflow_upload_id: int,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> Iterator[dict[str, list[Any]]]:
+    """Reads an energyflow file of any supported format into batches of rows.
+
+    The format is detected from the first bytes of the file. Parquet and
+    Arrow IPC files are read column wise through pyarrow, everything else is
+    parsed as a semicolon delimited CSV file.
+
+    :param file:
+        The binary file object of the upload
+    :param energyflow_upload_id:
+        The id of the EnergyFlowUpload the rows belong to
+    :param batch_size:
+        The maximum number of rows in a batch
+    """
+
+    magic = file.read(len(ARROW_MAGIC))
+    file.seek(0)
+
+    if magic.startswith(PARQUET_MAGIC):
+        iter_batches = iter_parquet_batches
+    elif magic == ARROW_MAGIC or magic.startswith(ARROW_STREAM_MAGIC):
+        iter_batches = iter_arrow_batches
+    else:
+        iter_batches = iter_csv_batches
+
+    return iter_batches(
+        file, energyflow_upload_id=energyflow_upload_id, batch_size=batch_size
+    )
+
+
+def create_ingest_job(
+    *, session: Session, file: BinaryIO, upload_in: EnergyFlowUploadCreate
+) -> tuple[EnergyFlowIngestJob, str]:
+    """Stores the uploaded file and creates the EnergyFlowUpload with its
+    ingest job.
+
+    The file is copied in blocks to the uploads folder, because the upload
+    itself is closed once the request is done. The upload and job are created
+    in the same transaction, so the upload is never visible without its job.
+
+    Returns the created job and the path of the stored file, which are passed
+    to run_ingest_job.
+
+    :param session:
+        A SQLModel session
+    :param file:
+        The binary file object of the upload
+    :param upload_in:
+        The EnergyFlowUpload to create
+    """
+
+    if not os.path.exists(UPLOAD_FOLDER):
+        os.makedirs(UPLOAD_FOLDER)
+
+    fd, path = mkstemp(dir=UPLOAD_FOLDER, suffix=UPLOAD_SUFFIX)
+
+    try:
+        with os.fdopen(fd, "wb") as stored_file:
+            copyfileobj(file, stored_file, INGEST_BLOCK_SIZE)
+
+        energyflow_upload = EnergyFlowUpload(**jsonable_encoder(upload_in))
+        session.add(energyflow_upload)
+        session.flush()
+
+        job = EnergyFlowIngestJob(
+            energyflow_upload_id=energyflow_upload.id,
+            bytes_total=os.path.getsize(path),
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+    except Exception:
+        session.rollback()
+        os.remove(path)
+        raise
+
+    return job, path
+
+
+def _fail_ingest_job(
+    *, session: Session, job: EnergyFlowIngestJob, error: str
+) -> None:
+    """Internal function that removes the energyflows and the EnergyFlowUpload
+    of a job, and marks the job as failed"""
+
+    if job.energyflow_upload_id is not None:
+        energyflow_crud.remove_by_upload(
+            session=session, id=job.energyflow_upload_id
+        )
+        energyflow_upload = session.get(
+            EnergyFlowUpload, job.energyflow_upload_id
+        )
+        if energyflow_upload:
+            session.delete(energyflow_upload)
+
+    job.status = EnergyFlowIngestJobStatus.FAILED
+    job.energyflow_upload_id = None
+    job.error = error
+    session.add(job)
+
+
+def run_ingest_job(
+    *,
+    session: Session,
+    job_id: int,
+    path: str,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> EnergyFlowIngestJob:
+    """Inserts all energyflows of a stored upload file for an ingest job.
+
+    Every batch is committed together with the progress of the job, so the
+    progress can be polled while the job is running. Once all energyflows are
+    inserted, the summary of the upload is computed. If anything fails, the
+    energyflows and the EnergyFlowUpload of the job are removed again and the
+    job is marked as failed. The stored file is always removed. When
+    tracemalloc is tracing, the memory of inserting and summarizing is
+    recorded in the metrics.
+
+    :param session:
+        A SQLModel session
+    :param job_id:
+        The id of the EnergyFlowIngestJob to run
+    :param path:
+        The path of the stored upload file
+    :param batch_size:
+        The maximum number of rows inserted per statement
+    """
+
+    job = energyflow_ingest_job_crud.get(session=session, id=job_id)
+
+    if not job or job.energyflow_upload_id is None:
+        raise ValueError(f"Ingest job with id {job_id} not found")
+
+    energyflow_upload_id = job.energyflow_upload_id
+
+    job.status = EnergyFlowIngestJobStatus.RUNNING
+    session.add(job)
+    session.commit()
+
+    timer = StageTimer()
+    try:
+        with timer.stage("insert"), open(path, "rb") as file:
+            start = time.perf_counter()
+            for batch in iter_energyflow_batches(
+                file,
+                energyflow_upload_id=energyflow_upload_id,
+                batch_size=batch_size,
+            ):
+                energyflow_crud.create_columns(session=session, columns=batch)
+
+                rows = len(batch["energyflow_upload_id"])
+                job.rows_processed += rows
+                job.bytes_processed = file.tell()
+                session.add(job)
+                session.commit()
+
+                INGEST_ROWS.inc(amount=rows)
+                INGEST_SECONDS.inc(amount=time.perf_counter() - start)
+                start = time.perf_counter()
+
+        # The summary is committed together with the completed job
+        with timer.stage("summarize"):
+            energyflow_summary_crud.summarize(
+                session=session, id=energyflow_upload_id
+            )
+
+        job.status = EnergyFlowIngestJobStatus.COMPLETED
+        job.bytes_processed = job.bytes_total
+    except Exception as e:
+        session.rollback()
+
+        _fail_ingest_job(
+            session=session,
+            job=job,
+            error=f"Error processing energyflow file: {str(e)}",
+        )
+
+        Logger.error(f"Ingest job {job_id} failed: {job.error}")
+    finally:
+        os.remove(path)
+        record_ingest_memory(timer)
+
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+
+    return job
+
+
+def ingest_job_task(
+    *, job_id: int, path: str, profile: Optional[str] = None
+) -> None:
+    """Runs an ingest job in the background with its own session, and
+    profiles it when a profile name is given"""
+
+    with profiled(profile), Session(engine) as session:
+        run_ingest_job(session=session, job_id=job_id, path=path)
+
+
+def recover_ingest_jobs() -> None:
+    """Fails the ingest jobs that were still pending or running when the
+    server stopped, as their background task is gone, and removes their
+    energyflows, EnergyFlowUpload and stored file.
+
+    Must only be called once when the server starts, before the workers start
+    any job.
+    """
+
+    with Session(engine) as session:
+        for job in energyflow_ingest_job_crud.get_unfinished(session=session):
+            _fail_ingest_job(
+                session=session,
+                job=job,
+                error="The server stopped while processing the file",
+            )
+            Logger.warning(f"Ingest job {job.id} was stopped by the server")
+
+        session.commit()
+
+    # Only the files of unfinished jobs are left, as a job removes its file
+    if os.path.exists(UPLOAD_FOLDER):
+        for name in os.listdir(UPLOAD_FOLDER):
+            if name.endswith(UPLOAD_SUFFIX):
+                os.remove(os.path.join(UPLOAD_FOLDER, name))
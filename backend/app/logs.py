@@ -0,0 +1,257 @@
+"""Logging of the application to data/logs/FastAPI.log.
+
+Writing to the log file takes a lock and a write to disk, so the handlers of
+the application don't write to the file themselves. The root logger puts the
+records in a queue, and a QueueListener thread formats the records and writes
+them to the file. A request only pays for putting a record in the queue.
+
+Every record is written as a line of JSON, with the time, the level, the
+logger, the message and the location of the log call. The route of the
+request is added when the record was logged during a request, and the status
+code for the errors of Logger.exception. The traceback is only added to
+records logged with exc_info, which Logger.exception only does for 5xx
+errors.
+
+The log file is rotated after log_max_bytes, and log_backup_count rotated
+files are kept. Only a single process may write to and rotate a log file:
+    - the workers forked by app.prefork send their records to the listener
+      of the parent, each through its own pipe of open_channel(), so a
+      worker that is killed while sending can't block the other workers
+    - the workers started by uvicorn each write to their own log file,
+      FastAPI-<pid>.log, as they don't share a parent that can listen
+
+example:
+```
+{"time": "2024-06-01T12:00:00.000000+00:00", "level": "WARNING", ...}
+```
+"""
+
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from multiprocessing.connection import Connection
+from queue import SimpleQueue
+from typing import Any, Optional
+
+from app.config import query_stats, settings
+
+LOG_FILE = "FastAPI.log"
+
+# The attributes of a record that are added to its line when they are set
+STRUCTURED_FIELDS = ("route", "status_code")
+# The time to wait for the records of the workers when the listener stops
+FORWARD_TIMEOUT = 1.0  # in seconds
+
+
+class _PipeQueue:
+    """Internal queue that sends the records of a forked worker to the parent
+    through the pipe of the worker, with the method the handler uses"""
+
+    def __init__(self, sender: Connection):
+        self._sender = sender
+        # Only the threads of this worker share the pipe
+        self._lock = threading.Lock()
+
+    def put_nowait(self, record: Any) -> None:
+        with self._lock:
+            self._sender.send(record)
+
+
+_queue: SimpleQueue = SimpleQueue()
+_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_running = False
+# The process of the listener, the only one that writes to the log file
+_listener_pid: Optional[int] = None
+# The threads of the listener that read the pipes of the workers
+_forwarders: list[threading.Thread] = []
+
+
+class JsonFormatter(logging.Formatter):
+    "Formats a record as a line of JSON"
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
+        }
+
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                line[field] = value
+
+        # exc_info is a tuple of None when there was no exception
+        if record.exc_info and record.exc_info[0] is not None:
+            line["traceback"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            line["traceback"] = record.exc_text
+
+        return json.dumps(line, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Internal handler that puts records in the queue without formatting
+    them, so the listener formats them instead of the request"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is merged now, as its arguments can change later
+        record.msg = record.getMessage()
+        record.args = None
+
+        # A traceback can't be sent to another process, so it is formatted
+        if record.exc_info and record.exc_info[0] is not None:
+            record.exc_text = JsonFormatter().formatException(record.exc_info)
+        record.exc_info = None
+
+        # The route is only known in the context of the request
+        stats = query_stats.get()
+        if stats is not None and not hasattr(record, "route"):
+            record.route = stats.route
+
+        return record
+
+
+def _log_file() -> str:
+    """Internal function that returns the name of the log file of this
+    process. A worker started by uvicorn in production writes to its own
+    file, the other processes to LOG_FILE.
+    """
+
+    # A spawned process is named before it imports the application, while
+    # parent_process() is only set after
+    spawned = multiprocessing.current_process().name != "MainProcess"
+    if not spawned or settings.development:
+        return LOG_FILE
+
+    name, extension = os.path.splitext(LOG_FILE)
+
+    return f"{name}-{os.getpid()}{extension}"
+
+
+def setup_logging(folder: str, level: int) -> None:
+    """Logs the records of level and above to the log file in folder, through
+    a queue. Only the first call sets up the logging.
+    """
+
+    global _handler, _listener, _listener_pid
+
+    if _listener is not None:
+        return
+
+    handler = RotatingFileHandler(
+        os.path.join(folder, _log_file()),
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8",
+    )
+    handler.setFormatter(JsonFormatter())
+
+    _listener = QueueListener(_queue, handler)
+    _listener_pid = os.getpid()
+    _start_listener()
+
+    _handler = _QueueHandler(_queue)
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    atexit.register(stop_logging)
+
+
+def open_channel() -> tuple[Connection, Connection]:
+    """Opens the pipe of a worker that is about to be forked. After the fork,
+    the parent calls listen_to() with the pipe, and the worker send_to().
+
+    Every worker has a pipe of its own, instead of a queue that all workers
+    share, as the lock of a shared queue stays taken when a worker is killed
+    while it sends a record.
+    """
+
+    return multiprocessing.Pipe(duplex=False)
+
+
+def listen_to(channel: tuple[Connection, Connection]) -> None:
+    """Writes the records the forked worker sends through the pipe of
+    channel, until the worker stops"""
+
+    receiver, sender = channel
+    # The pipe is closed once the worker, the only sender left, stops
+    sender.close()
+
+    if _listener is None or os.getpid() != _listener_pid:
+        receiver.close()
+        return
+
+    _forwarders[:] = [thread for thread in _forwarders if thread.is_alive()]
+    thread = threading.Thread(target=_forward, args=(receiver,), daemon=True)
+    thread.start()
+    _forwarders.append(thread)
+
+
+def send_to(channel: tuple[Connection, Connection]) -> None:
+    """Sends the records of this forked worker through the pipe of channel to
+    the listener of the parent, so the worker doesn't write to the log file
+    itself"""
+
+    receiver, sender = channel
+    receiver.close()
+
+    if _handler is None:
+        sender.close()
+        return
+
+    _handler.queue = _PipeQueue(sender)  # type: ignore
+
+
+def _forward(receiver: Connection) -> None:
+    """Internal function that puts the records of a worker in the queue of the
+    listener, until the pipe is closed. A record that a killed worker only
+    sent partly is dropped with the pipe."""
+
+    with receiver:
+        while True:
+            try:
+                record = receiver.recv()
+            except (EOFError, OSError):
+                return
+
+            _queue.put_nowait(record)
+
+
+def _start_listener() -> None:
+    "Internal function that starts the thread of the listener"
+
+    global _running
+
+    if _listener is not None:
+        _listener.start()
+        _running = True
+
+
+def stop_logging() -> None:
+    """Writes the records left in the queue and the pipes of the workers that
+    stopped, and stops the listener. In a forked process, which has no
+    listener, the records are already sent.
+    """
+
+    global _running
+
+    if _listener is None or not _running or os.getpid() != _listener_pid:
+        return
+
+    for thread in _forwarders:
+        thread.join(FORWARD_TIMEOUT)
+
+    _listener.stop()
+    _running = False
@@ -0,0 +1,381 @@
+"""Metrics of the application in the Prometheus text format.
+
+The metrics are collected in the process itself and served by /metrics, so
+Prometheus can scrape them and alert on regressions. Recording a value only
+takes a lock and a dict update, so the metrics are always on.
+
+Every worker process has its own metrics, so with multiple workers every
+worker is scraped as a separate instance.
+
+The metrics are:
+    - les_http_request_duration_seconds:
+        Histogram of the latency of the requests per method and route
+    - les_http_requests_total:
+        Counter of the responses per method, route and status code
+    - les_simulations_in_progress:
+        Gauge of the /plan requests that are being handled
+    - les_simulation_stage_duration_seconds:
+        Histogram of the time of the stages of /plan, see app.timing
+    - les_simulation_stage_peak_memory_bytes:
+        Histogram of the peak allocations of the stages of /plan, only when
+        tracemalloc is tracing
+    - les_cache_requests_total:
+        Counter of the hits and misses of the caches, the hit ratio is
+        `hit / (hit + miss)`
+    - les_db_queries_total:
+        Counter of the statements executed by the engine per operation
+    - les_energyflow_ingest_rows_total:
+        Counter of the energyflows inserted by ingest jobs
+    - les_energyflow_ingest_seconds_total:
+        Counter of the time spent by ingest jobs, the rows per second are
+        `rate(rows_total) / rate(seconds_total)`
+    - les_energyflow_ingest_peak_memory_bytes:
+        Histogram of the peak allocations of the stages of ingest jobs, only
+        when tracemalloc is tracing
+
+example:
+```
+REQUESTS.inc("GET", "/api/twinworld/", "200")
+```
+"""
+
+import abc
+import threading
+import time
+from bisect import bisect_left
+from typing import Iterator
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.timing import MEBIBYTE, StageTimer
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets of the histograms in seconds, a chunk of /plan can take seconds
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Buckets of the memory histograms in bytes, from 1 MiB to 4 GiB
+MEMORY_BUCKETS = tuple(float(MEBIBYTE * 4**power) for power in range(7))
+
+DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "COPY"}
+
+_REGISTRY: list["_Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    "Internal function that formats a value the way Prometheus parses it"
+
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    "Internal function that formats the labels of a sample"
+
+    if not names:
+        return ""
+
+    labels = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+
+    return f"{{{labels}}}"
+
+
+def _escape(value: str) -> str:
+    "Internal function that escapes a label value"
+
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(abc.ABC):
+    "Base class of the metrics, which registers itself for /metrics"
+
+    type = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        "Returns the sample lines of the metric"
+
+    def render(self) -> str:
+        "Returns the metric in the Prometheus text format"
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    "A value that only increases, like the number of requests"
+
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        # A metric without labels is shown from the start
+        self._values: dict[tuple[str, ...], float] = (
+            {} if labelnames else {(): 0.0}
+        )
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        "Increases the value of the labels by an amount"
+
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+
+        for labels, value in values:
+            yield (
+                f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+            )
+
+
+class Gauge(Counter):
+    "A value that can go up and down, like the requests in progress"
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        "Decreases the value of the labels by an amount"
+
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    "The distribution of observed values, like the latency of requests"
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*buckets, float("inf"))
+        # The count per bucket (not cumulative), the sum and the count
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        "Adds an observed value to the histogram of the labels"
+
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = (
+                    [0] * len(self.buckets),
+                    [0.0],
+                )
+            values[0][index] += 1
+            values[1][0] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._values.items()
+            ]
+
+        names = (*self.labelnames, "le")
+        for labels, counts, total in values:
+            cumulative = 0
+            for bucket, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = (*labels, _format_value(bucket))
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_format_labels(names, bucket_labels)} {cumulative}"
+                )
+
+            formatted = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{formatted} {_format_value(total)}"
+            yield f"{self.name}_count{formatted} {cumulative}"
+
+
+REQUEST_DURATION = Histogram(
+    "les_http_request_duration_seconds",
+    "Latency of the requests until the whole response is sent",
+    ("method", "route"),
+)
+REQUESTS = Counter(
+    "les_http_requests_total",
+    "Responses sent per status code",
+    ("method", "route", "status"),
+)
+SIMULATIONS_IN_PROGRESS = Gauge(
+    "les_simulations_in_progress",
+    "Chunks of simulations that are being planned",
+)
+SIMULATION_STAGE_DURATION = Histogram(
+    "les_simulation_stage_duration_seconds",
+    "Time of the stages of planning a chunk of a simulation",
+    ("stage",),
+)
+SIMULATION_STAGE_PEAK_MEMORY = Histogram(
+    "les_simulation_stage_peak_memory_bytes",
+    "Peak allocations of the stages of planning a chunk of a simulation",
+    ("stage",),
+    MEMORY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "les_cache_requests_total",
+    "Lookups in a cache per result, hit or miss",
+    ("cache", "result"),
+)
+DB_QUERIES = Counter(
+    "les_db_queries_total",
+    "Statements executed by the database engine",
+    ("operation",),
+)
+INGEST_ROWS = Counter(
+    "les_energyflow_ingest_rows_total",
+    "Energyflows inserted by ingest jobs",
+)
+INGEST_SECONDS = Counter(
+    "les_energyflow_ingest_seconds_total",
+    "Time spent inserting the energyflows of ingest jobs",
+)
+INGEST_PEAK_MEMORY = Histogram(
+    "les_energyflow_ingest_peak_memory_bytes",
+    "Peak allocations of the stages of ingest jobs",
+    ("stage",),
+    MEMORY_BUCKETS,
+)
+
+
+def render() -> str:
+    "Returns all metrics in the Prometheus text format"
+
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+def metrics_response() -> Response:
+    "Returns all metrics as a response for /metrics"
+
+    return Response(content=render(), media_type=METRICS_MEDIA_TYPE)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    "Records a lookup in a cache"
+
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def record_stages(timer: StageTimer) -> None:
+    "Records the time and the memory of the stages of a StageTimer of /plan"
+
+    for stage, seconds in timer.totals.items():
+        SIMULATION_STAGE_DURATION.observe(seconds, stage)
+
+    for stage, peak in timer.peaks.items():
+        SIMULATION_STAGE_PEAK_MEMORY.observe(peak, stage)
+
+
+def record_ingest_memory(timer: StageTimer) -> None:
+    "Records the memory of the stages of a StageTimer of an ingest job"
+
+    for stage, peak in timer.peaks.items():
+        INGEST_PEAK_MEMORY.observe(peak, stage)
+
+
+async def track_simulation():
+    "Dependency that counts the request as a simulation in progress"
+
+    SIMULATIONS_IN_PROGRESS.inc()
+    try:
+        yield
+    finally:
+        SIMULATIONS_IN_PROGRESS.dec()
+
+
+def _count_query(conn, cursor, statement: str, *args) -> None:
+    "Internal event listener that counts the statements of the engine"
+
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERIES.inc(operation if operation in DB_OPERATIONS else "OTHER")
+
+
+def instrument_engine(engine: Engine) -> None:
+    "Counts the statements executed by an engine"
+
+    if not event.contains(engine, "before_cursor_execute", _count_query):
+        event.listen(engine, "before_cursor_execute", _count_query)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records the latency and the status of every
+    request.
+
+    The latency is measured until the last part of the body is sent, so
+    streamed responses are measured as a whole. Requests are labeled with the
+    path of their route instead of their url, so the ids in the urls don't
+    create a label per resource.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_DURATION.observe(time.perf_counter() - start, method, path)
+            REQUESTS.inc(method, path, status)
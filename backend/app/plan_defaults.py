@@ -43,15 +43,16 @@ def cost_default(
 def plan_greedy(
     *,
     household_idx: int,
-    days_in_planning: int,
     day_number_in_planning: int,
     total_available_energy: float,
     household_energy: list[list[float]],
     appliance: ApplianceRead,
-    appliance_time: list[ApplianceTimeDaily],
+    appliance_time: dict[tuple[int, int], ApplianceTimeDaily],
     energyflow_day: list[EnergyFlowRead],
     total_start_date: int,
-) -> tuple[list[ApplianceTimeDaily], float, list[list[float]]]:
+) -> tuple[
+    dict[tuple[int, int], ApplianceTimeDaily], float, list[list[float]]
+]:
     """The plan greedy planning algorithm.
 
     The function tries to plan in an appliance on a given day.
@@ -83,9 +84,9 @@ def plan_greedy(
 
     usage = appliance.daily_usage
 
-    index = days_in_planning * (appliance.id - 1) + day_number_in_planning - 1
+    daily = appliance_time.get((appliance.id, day_number_in_planning))
 
-    if appliance_time[index].day != day_number_in_planning:
+    if daily is None:
         Logger.exception(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Day {day_number_in_planning} not found",
@@ -94,8 +95,8 @@ def plan_greedy(
     while usage > (1 - random()):
         plannedin = False
 
-        bitmap_energy = appliance_time[index].bitmap_plan_energy
-        bitmap_no_energy = appliance_time[index].bitmap_plan_no_energy
+        bitmap_energy = daily.bitmap_plan_energy
+        bitmap_no_energy = daily.bitmap_plan_no_energy
 
         if total_available_energy > 0:
             for energyflow_day_information in energyflow_day:
@@ -111,7 +112,7 @@ def plan_greedy(
                 ):
                     continue
 
-                appliance_time[index].bitmap_plan_energy = plan_energy(
+                daily.bitmap_plan_energy = plan_energy(
                     hour=hour,
                     appliance_duration=appliance.duration,
                     appliance_bitmap_plan=bitmap_energy,
@@ -143,7 +144,7 @@ def plan_greedy(
                 ):
                     continue
 
-                appliance_time[index].bitmap_plan_no_energy = plan_energy(
+                daily.bitmap_plan_no_energy = plan_energy(
                     hour=unix_to_hour(currenttime),
                     appliance_duration=appliance.duration,
                     appliance_bitmap_plan=bitmap_no_energy,
@@ -165,7 +166,6 @@ def plan_greedy(
 def plan_simulated_annealing(
     *,
     date: int,
-    days_in_planning: int,
     day_number_in_planning: int,
     length_planning: int,
     current_available: list[float],
@@ -173,7 +173,7 @@ def plan_simulated_annealing(
     current_used: list[float],
     algorithm: AlgorithmRead,
     household_planning: list[HouseholdRead],
-    appliance_time: list[ApplianceTimeDaily],
+    appliance_time: dict[tuple[int, int], ApplianceTimeDaily],
 ) -> None:
     """The simulated annealing planning algorithm.
 
@@ -218,13 +218,10 @@ def plan_simulated_annealing(
         has_energy = choice([True, False])
         gets_energy = choice([True, False])
 
-        index = (
-            days_in_planning * (selected_appliance.id - 1)
-            + day_number_in_planning
-        )
+        daily = appliance_time[(selected_appliance.id, day_number_in_planning)]
 
-        bitmap_energy = appliance_time[index].bitmap_plan_energy
-        bitmap_no_energy = appliance_time[index].bitmap_plan_no_energy
+        bitmap_energy = daily.bitmap_plan_energy
+        bitmap_no_energy = daily.bitmap_plan_no_energy
 
         # Calculate the current appliance schedule and frequency
         bitmap = "{0:024b}".format(
@@ -293,8 +290,8 @@ def plan_simulated_annealing(
             or exp(3 * improvement / effective_temperature) < random()
         ):
             (
-                appliance_time[index].bitmap_plan_energy,
-                appliance_time[index].bitmap_plan_no_energy,
+                daily.bitmap_plan_energy,
+                daily.bitmap_plan_no_energy,
             ) = update_energy(
                 old_hour=appliance_old_starttime,
                 new_hour=unix_to_hour(appliance_new_starttime),
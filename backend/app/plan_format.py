@@ -0,0 +1,150 @@
+"""Compact binary format for the output of /plan.
+
+When the client sends `Accept: application/octet-stream` to /plan, the output
+is sent in this format instead of JSON. Every value is little-endian, and the
+arrays follow each other directly without padding:
+
+| Part                  | Type                    | Description                                      |
+|-----------------------|-------------------------|--------------------------------------------------|
+| magic                 | 4 bytes                 | `LESP`                                           |
+| version               | uint32                  | The version of the format, currently 1           |
+| days_in_planning      | uint32                  | See SelectedModelsOutput                         |
+| start_day             | uint32                  | The day in the planning of the first day         |
+| days                  | uint32                  | The amount of days in the chunk                  |
+| appliances            | uint32                  | The amount of appliances                         |
+| result_columns        | uint32                  | The amount of results per day, currently 7       |
+| reserved              | uint32                  | Always 0                                         |
+| start_date            | int64                   | See SelectedModelsOutput                         |
+| end_date              | int64                   | See SelectedModelsOutput                         |
+| results               | float64[days][columns]  | The results of every day                         |
+| appliance_id          | uint32[appliances]      | The appliance ids, in ascending order            |
+| bitmap_plan_energy    | uint32[appliances][days]| The bitmaps of every appliance, in the order of  |
+| bitmap_plan_no_energy | uint32[appliances][days]| appliance_id                                     |
+
+The header is 48 bytes, so the results are aligned to 8 bytes and can be read
+as a Float64Array in the browser without a copy.
+"""  # noqa: E501
+
+import struct
+from typing import Any, Sequence
+
+import numpy
+
+from app.core.models.appliance_model import ApplianceTimeDaily
+
+PLAN_MEDIA_TYPE = "application/octet-stream"
+PLAN_MAGIC = b"LESP"
+PLAN_VERSION = 1
+RESULT_COLUMNS = 7
+
+_HEADER = struct.Struct("<4s7I2q")
+
+
+def encode_plan(
+    *,
+    time_daily: Sequence[ApplianceTimeDaily],
+    results: Sequence[Sequence[float]],
+    days_in_planning: int,
+    start_day: int,
+    start_date: int,
+    end_date: int,
+) -> bytes:
+    """Encode the output of /plan in the binary format.
+
+    The bitmaps are written straight from the ORM objects into the arrays, so
+    nothing is validated by pydantic on the way out.
+    """
+
+    days = len(results)
+    columns = numpy.fromiter(
+        (
+            value
+            for el in time_daily
+            for value in (
+                el.appliance_id,
+                el.day,
+                el.bitmap_plan_energy,
+                el.bitmap_plan_no_energy,
+            )
+        ),
+        dtype="<u4",
+        count=len(time_daily) * 4,
+    ).reshape(-1, 4)
+
+    appliance_ids, index = numpy.unique(columns[:, 0], return_inverse=True)
+    day = columns[:, 1] - start_day
+
+    energy = numpy.zeros((len(appliance_ids), days), dtype="<u4")
+    no_energy = numpy.zeros((len(appliance_ids), days), dtype="<u4")
+    energy[index, day] = columns[:, 2]
+    no_energy[index, day] = columns[:, 3]
+
+    header = _HEADER.pack(
+        PLAN_MAGIC,
+        PLAN_VERSION,
+        days_in_planning,
+        start_day,
+        days,
+        len(appliance_ids),
+        RESULT_COLUMNS,
+        0,
+        start_date,
+        end_date,
+    )
+
+    return b"".join(
+        (
+            header,
+            numpy.asarray(results, dtype="<f8")
+            .reshape(days, RESULT_COLUMNS)
+            .tobytes(),
+            appliance_ids.tobytes(),
+            energy.tobytes(),
+            no_energy.tobytes(),
+        )
+    )
+
+
+def decode_plan(contents: bytes) -> dict[str, Any]:
+    """Decode the binary format into a dictionary of its parts.
+
+    The arrays are numpy arrays that share the memory of the contents.
+    """
+
+    (
+        magic,
+        version,
+        days_in_planning,
+        start_day,
+        days,
+        appliances,
+        columns,
+        _,
+        start_date,
+        end_date,
+    ) = _HEADER.unpack_from(contents)
+
+    if magic != PLAN_MAGIC or version != PLAN_VERSION:
+        raise ValueError("Not a plan in a supported version of the format")
+
+    offset = _HEADER.size
+
+    def read(dtype: str, shape: tuple[int, ...]) -> numpy.ndarray:
+        nonlocal offset
+        count = int(numpy.prod(shape))
+        array = numpy.frombuffer(
+            contents, dtype=dtype, count=count, offset=offset
+        )
+        offset += array.nbytes
+        return array.reshape(shape)
+
+    return {
+        "days_in_planning": days_in_planning,
+        "start_day": start_day,
+        "start_date": start_date,
+        "end_date": end_date,
+        "results": read("<f8", (days, columns)),
+        "appliance_id": read("<u4", (appliances,)),
+        "bitmap_plan_energy": read("<u4", (appliances, days)),
+        "bitmap_plan_no_energy": read("<u4", (appliances, days)),
+    }
@@ -5,6 +5,7 @@ Contains the cost function, and the possible algorithms.
 
 from calendar import day_name
 from math import floor
+from typing import Optional
 
 from fastapi import status
 
@@ -29,7 +30,10 @@ from app.core.models.appliance_model import (
 )
 
 from app.core.crud.appliance_crud import appliance_time_daily_crud
-from app.core.crud.energyflow_crud import energyflow_crud
+from app.core.crud.energyflow_crud import (
+    energyflow_crud,
+    energyflow_summary_crud,
+)
 
 
 class SelectedOptions(SQLModel):
@@ -38,6 +42,7 @@ class SelectedOptions(SQLModel):
     algorithm: AlgorithmRead
     energyflow: EnergyFlowUploadRead
     households: list[HouseholdRead]
+    simulation_id: str
 
 
 class SimulationData(SQLModel):
@@ -54,6 +59,9 @@ class SelectedModelsInput(SQLModel):
     algorithm: AlgorithmRead
     twinworld: TwinWorldRead
     energyflow: EnergyFlowUploadRead
+    simulation_id: Optional[str] = None
+    delta: bool = False
+    version: Optional[int] = None
 
 
 class SelectedModelsOutput(SQLModel):
@@ -62,6 +70,7 @@ class SelectedModelsOutput(SQLModel):
     days_in_planning: int
     start_date: int
     end_date: int
+    version: Optional[int] = None
 
 
 def _calculate_appliance_duration_bit(duration: int, hour: int) -> int:
@@ -101,9 +110,10 @@ def _energy_efficiency_day(
     day: int,
     date: int,
     solar_panels_factor: int,
+    solar_produced_day: float,
     energy_flow: list[EnergyFlowRead],
     planning: list[HouseholdRead],
-    appliance_bitmap_plan: list[ApplianceTimeDaily],
+    appliance_bitmap_plan: dict[tuple[int, int], ApplianceTimeDaily],
     costmodel: CostModelRead,
 ) -> tuple[float, float, float, float, float]:
     """Internal function that calculates the energy efficiency of a day.
@@ -117,6 +127,9 @@ def _energy_efficiency_day(
 
     The total efficiency is how much energy all of the houses combined use of
     all the available generated solar power.
+
+    The solar power produced on the day is the total of the day in the
+    summary of the energyflow upload.
     """
 
     total_yield = sum(household.solar_yield_yearly for household in planning)
@@ -137,7 +150,8 @@ def _energy_efficiency_day(
         ]
 
         for appliance in household.appliances:
-            bitmap = f"{appliance_bitmap_plan[appliance.id - 1].bitmap_plan_energy:024b}"  # noqa: E501
+            daily = appliance_bitmap_plan[(appliance.id, day)]
+            bitmap = f"{daily.bitmap_plan_energy:024b}"
 
             for hour, bit in enumerate(bitmap):
                 if bit == "1":
@@ -162,7 +176,7 @@ def _energy_efficiency_day(
         )
     ]
 
-    sum_produced = sum(solar_energy_produced)
+    sum_produced = solar_produced_day * total_yield / solar_panels_factor
 
     previous_efficiency = (
         sum(previous_total_usage) / sum_produced if sum_produced > 0 else 0
@@ -317,9 +331,10 @@ def setup_planning(
     int,
     list[EnergyFlowRead],
     list[EnergyFlowRead],
-    list[ApplianceTimeDaily],
+    dict[tuple[int, int], ApplianceTimeDaily],
     list[HouseholdRead],
     list[list[float]],
+    dict[int, float],
 ]:
     """Retrieves all the data for starting the planning.
 
@@ -331,19 +346,24 @@ def setup_planning(
     end_date, the end date of this chunk
     total_start_date, the start date of the total planning
     energyflow_data_sim, all of the energyflows in this chunk
-    energyflow_data, the energyflows where the solar power is greater than 0
-    appliance_time, all of the appliance time windows
+    energyflow_data, the energyflows of this chunk where the solar power is
+    greater than 0, by solar power from high to low
+    appliance_time, the daily plans of the appliances of the twinworld in this
+    chunk, by appliance_id and day
     household_planning, all of the households available in this planning
     results, the results of this chunk
+    solar_produced_days, the total solar power produced on every day
+
+    The start of the total planning and the daily totals come from the
+    summary of the energyflow upload. The summary is read first, as it is
+    committed for an upload that was ingested before summaries existed.
     """
 
-    energyflow_data = energyflow_crud.get_by_solar_produced(
-        session=session,
-        limit=HOURS_IN_WEEK,
-        offset=planning.chunkoffset * 24,
+    summary = energyflow_summary_crud.get_or_summarize(
+        session=session, id=planning.energyflow.id
     )
 
-    if len(energyflow_data) == 0:
+    if summary is None:
         Logger.exception(
             status_code=status.HTTP_204_NO_CONTENT,
             detail="Energyflow data not found",
@@ -356,20 +376,48 @@ def setup_planning(
         id=planning.energyflow.id,
     )
 
-    appliance_time = appliance_time_daily_crud.get_multi(session=session)
+    if len(energyflow_data_sim) == 0:
+        Logger.exception(
+            status_code=status.HTTP_204_NO_CONTENT,
+            detail="Energyflow data not found",
+        )
 
-    total_start_date, total_end_date = energyflow_crud.get_start_end_date(
-        session=session,
-        id=planning.energyflow.id,
+    # The energyflows with solar power of this chunk, ranked from the most
+    # solar power to the least, so the greedy planning tries those first
+    energyflow_data = sorted(
+        (el for el in energyflow_data_sim if el.solar_produced > 0),
+        key=lambda el: el.solar_produced,
+        reverse=True,
     )
 
-    total_start_date = total_start_date.timestamp
-    total_end_date = total_end_date.timestamp
+    total_start_date = summary.first_timestamp
 
     start_date = energyflow_data_sim[0].timestamp
     end_date = energyflow_data_sim[-1].timestamp - SECONDS_IN_DAY + 3600
 
     days_in_chunk = (end_date - start_date) // SECONDS_IN_DAY + 1
+    start_day = (start_date - total_start_date) // SECONDS_IN_DAY + 1
+
+    # Only the days of this chunk are planned, so only those are loaded
+    appliance_time = {
+        (el.appliance_id, el.day): el
+        for el in appliance_time_daily_crud.get_chunk(
+            session=session,
+            twinworld_id=planning.twinworld.id,
+            start_day=start_day,
+            days=days_in_chunk,
+        )
+    }
+
+    solar_produced_days = {
+        day_total.day: day_total.solar_produced
+        for day_total in energyflow_summary_crud.get_day_totals(
+            session=session,
+            id=planning.energyflow.id,
+            start_day=start_day,
+            days=days_in_chunk,
+        )
+    }
 
     days_in_planning = appliance_time_daily_crud.get_max_appliance_day(
         session=session
@@ -392,6 +440,7 @@ def setup_planning(
         appliance_time,
         household_planning,
         results,
+        solar_produced_days,
     )
 
 
@@ -470,9 +519,10 @@ def write_results(
     energyflow: EnergyFlowUploadRead,
     twinworld: TwinWorldRead,
     costmodel: CostModelRead,
-    appliance_time: list[ApplianceTimeDaily],
+    appliance_time: dict[tuple[int, int], ApplianceTimeDaily],
     energyflow_day_sim: list[EnergyFlowRead],
     household_planning: list[HouseholdRead],
+    solar_produced_day: float,
 ) -> list[list[float]]:
     """Returns the results of a certain in the planning.
 
@@ -480,17 +530,14 @@ def write_results(
     efficiency, and then puts it into an array which is send back.
     """
 
-    current_day_appliance = [
-        el for el in appliance_time if el.day == day_number_in_planning
-    ]
-
     temp_result = _energy_efficiency_day(
         day=day_number_in_planning,
         date=date,
         solar_panels_factor=energyflow.solar_panels_factor,
+        solar_produced_day=solar_produced_day,
         energy_flow=energyflow_day_sim,
         planning=household_planning,
-        appliance_bitmap_plan=current_day_appliance,
+        appliance_bitmap_plan=appliance_time,
         costmodel=costmodel,
     )
 
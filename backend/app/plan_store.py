@@ -0,0 +1,356 @@
+"""Store for the plans of the simulations.
+
+Every simulation started through /start gets an id. For every planned day
+/plan writes the results and the appliance schedules of that day to a file in
+the folder of the simulation. The store is kept on disk, so it is shared by
+all workers, and the exports read it back one day at a time instead of
+building the whole year in memory.
+
+Every write of a chunk increases the version of the simulation, and every day
+remembers the first and the last version it was written in. A client that
+acknowledges a version has the schedules of all the days written up to that
+version, so /plan only needs to send the schedules that changed since then.
+
+The workers can write chunks of the same simulation at the same time, so a
+chunk is written while holding the lock file of the simulation. The version
+is increased and the days are written under that lock, and every chunk gets
+its own version.
+"""
+
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from enum import Enum
+from io import StringIO
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+from app.utils import SECONDS_IN_DAY
+
+from app.core.models.appliance_model import ApplianceTimeDaily
+
+PLAN_FOLDER = os.path.join(Path().resolve(), "data/plans")
+PLAN_RETENTION = 7 * SECONDS_IN_DAY  # in seconds
+LOCK_FILE = "lock"
+
+RESULT_COLUMNS = (
+    "day",
+    "date",
+    "solar_energy_individual",
+    "solar_energy_total",
+    "internal_bought_energy_price",
+    "total_amount_saved",
+    "solar_produced",
+    "solar_energy_individual_used",
+    "solar_energy_total_used",
+)
+SCHEDULE_COLUMNS = (
+    "day",
+    "date",
+    "appliance_id",
+    "bitmap_plan_energy",
+    "bitmap_plan_no_energy",
+)
+
+_SIMULATION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def _simulation_folder(simulation_id: str) -> Optional[str]:
+    """Internal function that returns the folder of a simulation, or None if
+    the simulation does not exist.
+
+    The id is checked first, as it comes straight from the request path.
+    """
+
+    if not _SIMULATION_ID.fullmatch(simulation_id):
+        return None
+
+    folder = os.path.join(PLAN_FOLDER, simulation_id)
+
+    return folder if os.path.isdir(folder) else None
+
+
+def _remove_expired() -> None:
+    "Internal function that removes the simulations past the retention"
+
+    expired = time.time() - PLAN_RETENTION
+
+    for entry in os.scandir(PLAN_FOLDER):
+        if entry.is_dir() and entry.stat().st_mtime < expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def create_simulation() -> str:
+    "Create an empty plan for a new simulation and return its id"
+
+    if not os.path.exists(PLAN_FOLDER):
+        os.makedirs(PLAN_FOLDER)
+
+    _remove_expired()
+
+    simulation_id = uuid.uuid4().hex
+    os.makedirs(os.path.join(PLAN_FOLDER, simulation_id))
+
+    return simulation_id
+
+
+def simulation_exists(simulation_id: str) -> bool:
+    "Check whether a simulation has a plan in the store"
+
+    return _simulation_folder(simulation_id) is not None
+
+
+@contextmanager
+def _locked(folder: str) -> Iterator[None]:
+    """Internal context manager that holds the lock of a simulation, which
+    every worker that writes to the simulation waits for.
+    """
+
+    with open(os.path.join(folder, LOCK_FILE), "a+b") as file:
+        if sys.platform == "win32":
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _next_version(folder: str) -> int:
+    """Internal function that increases the version of a simulation. Only
+    called while holding the lock of the simulation.
+    """
+
+    path = os.path.join(folder, "version")
+    version = 1
+
+    if os.path.exists(path):
+        with open(path) as file:
+            version = int(file.read()) + 1
+
+    with open(f"{path}.tmp", "w") as file:
+        file.write(str(version))
+    os.replace(f"{path}.tmp", path)
+
+    return version
+
+
+def _read_day(folder: str, day: int) -> Optional[dict]:
+    "Internal function that reads a planned day, or None if it is not planned"
+
+    path = os.path.join(folder, f"{day:04}.json")
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def read_acknowledged(
+    *, simulation_id: str, start_day: int, days: int, version: Optional[int]
+) -> tuple[dict[tuple[int, int], tuple[int, int]], set[int]]:
+    """Read the schedules of a chunk that a client has up to a version.
+
+    Returns the bitmaps by appliance_id and day of the days that were last
+    written up to the acknowledged version, and the days that were rewritten
+    after the client acknowledged them. The client has an older schedule of
+    those days that is not in the store anymore, so they have to be sent
+    completely. Days that were first written after the acknowledged version
+    are in neither, as the client has no schedules for them yet.
+    """
+
+    folder = _simulation_folder(simulation_id)
+    acknowledged: dict[tuple[int, int], tuple[int, int]] = {}
+    rewritten: set[int] = set()
+
+    if folder is None or version is None:
+        return acknowledged, rewritten
+
+    for day in range(start_day, start_day + days):
+        stored = _read_day(folder, day)
+
+        if stored is None or stored["first_version"] > version:
+            continue
+
+        if stored["version"] > version:
+            rewritten.add(day)
+            continue
+
+        for appliance_id, energy, no_energy in stored["schedule"]:
+            acknowledged[(appliance_id, day)] = (energy, no_energy)
+
+    return acknowledged, rewritten
+
+
+def write_chunk(
+    *,
+    simulation_id: str,
+    start_day: int,
+    total_start_date: int,
+    results: Sequence[Sequence[float]],
+    appliance_time: Iterable[ApplianceTimeDaily],
+    appliance_ids: set[int],
+) -> int:
+    """Write the results and schedules of the days of a planned chunk, and
+    return the new version of the simulation.
+
+    Every day is written to its own file, replacing the day when a chunk is
+    planned again. Only the schedules of the appliances in the simulation are
+    kept. The chunk is written while holding the lock of the simulation, so
+    chunks written at the same time each get their own version.
+    """
+
+    folder = _simulation_folder(simulation_id)
+
+    if folder is None:
+        raise ValueError(f"Simulation with id {simulation_id} not found")
+
+    schedules: list[list[list[int]]] = [[] for _ in results]
+
+    for el in appliance_time:
+        index = el.day - start_day
+        if 0 <= index < len(results) and el.appliance_id in appliance_ids:
+            schedules[index].append(
+                [
+                    el.appliance_id,
+                    el.bitmap_plan_energy,
+                    el.bitmap_plan_no_energy,
+                ]
+            )
+
+    with _locked(folder):
+        version = _next_version(folder)
+
+        for index, (result, schedule) in enumerate(zip(results, schedules)):
+            day = start_day + index
+            path = os.path.join(folder, f"{day:04}.json")
+            stored = _read_day(folder, day)
+
+            # Write to a temporary file first, so an export never reads a
+            # partially written day
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(
+                    {
+                        "day": day,
+                        "date": (
+                            total_start_date + (day - 1) * SECONDS_IN_DAY
+                        ),
+                        "result": list(result),
+                        "schedule": schedule,
+                        "first_version": (
+                            stored["first_version"] if stored else version
+                        ),
+                        "version": version,
+                    },
+                    file,
+                )
+            os.replace(f"{path}.tmp", path)
+
+    return version
+
+
+def _iter_days(folder: str) -> Iterator[dict]:
+    "Internal function that reads the planned days of a simulation in order"
+
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".json"):
+            with open(os.path.join(folder, name)) as file:
+                yield json.load(file)
+
+
+def _iter_result_rows(folder: str) -> Iterator[list[list]]:
+    "Internal function that yields the results of a simulation per day"
+
+    for day in _iter_days(folder):
+        yield [[day["day"], day["date"], *day["result"]]]
+
+
+def _iter_schedule_rows(folder: str) -> Iterator[list[list]]:
+    "Internal function that yields the schedules of a simulation per day"
+
+    for day in _iter_days(folder):
+        yield [[day["day"], day["date"], *row] for row in day["schedule"]]
+
+
+def _format_rows(
+    days: Iterator[list[list]],
+    columns: Sequence[str],
+    format: ExportFormat,
+) -> Iterator[str]:
+    "Internal function that formats the rows of every day as one chunk"
+
+    if format == ExportFormat.CSV:
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        for rows in days:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        for rows in days:
+            yield "".join(
+                json.dumps(dict(zip(columns, row))) + "\n" for row in rows
+            )
+
+
+def export_results(
+    simulation_id: str, format: ExportFormat
+) -> Optional[Iterator[str]]:
+    """Export the daily results of a simulation, or None if the simulation
+    does not exist.
+    """
+
+    folder = _simulation_folder(simulation_id)
+
+    if folder is None:
+        return None
+
+    return _format_rows(_iter_result_rows(folder), RESULT_COLUMNS, format)
+
+
+def export_schedules(
+    simulation_id: str, format: ExportFormat
+) -> Optional[Iterator[str]]:
+    """Export the daily appliance schedules of a simulation, or None if the
+    simulation does not exist.
+    """
+
+    folder = _simulation_folder(simulation_id)
+
+    if folder is None:
+        return None
+
+    return _format_rows(_iter_schedule_rows(folder), SCHEDULE_COLUMNS, format)
@@ -0,0 +1,210 @@
+"""Pre-fork server for production.
+
+Uvicorn starts every worker as a new process that imports the application
+and builds its caches on its own. With the prefork setting, run.py serves the
+application with serve() instead: the application is created and preloaded
+once in the parent process, and the workers are forked from it. The workers
+share the memory pages of the parent copy-on-write, so they start right away
+and use less memory together.
+
+Before forking, preload():
+    - creates the tables and indexes, so the workers don't race to do it
+    - fails the ingest jobs that the last server left unfinished, see
+      app.ingest
+    - imports the libraries of the researchers, see app.sandbox
+    - compiles the algorithms of the researchers in the database
+    - closes the connections of the engine, as a connection can't be shared
+      between processes
+    - freezes the objects of the parent, so the garbage collector of a worker
+      doesn't write to the shared pages
+
+The workers send their log records to the listener of the parent through a
+pipe per worker, as the parent is the only process that writes to the log
+file, see app.logs.
+
+The parent binds the socket, starts a new worker when one stops, and stops
+the workers on SIGINT or SIGTERM. Forking is only available on POSIX, on
+Windows run.py starts the workers with uvicorn as usual.
+
+A worker that stops within STARTUP_GRACE of starting failed to start. The
+worker that replaces it waits RESPAWN_DELAY first, doubled for every worker
+that failed in a row up to RESPAWN_MAX_DELAY, so a broken worker isn't
+restarted in a busy loop. When all the workers fail within STARTUP_GRACE of
+the preload, the application can't start at all, and the server stops with
+the exit code of uvicorn for a failed startup.
+
+example:
+```
+serve(create_app(), host="0.0.0.0", port=8000, workers=4)
+```
+"""
+
+import gc
+import os
+import signal
+import sys
+import time
+
+from fastapi import FastAPI
+from sqlmodel import Session
+from uvicorn import Config, Server
+from uvicorn.main import STARTUP_FAILURE
+
+from app.config import engine
+from app.ingest import recover_ingest_jobs
+from app.logs import listen_to, open_channel, send_to
+from app.sandbox import compile_algorithm, researcher_libraries
+from app.utils import Logger, create_db_and_tables
+
+from app.core.crud.algorithm_crud import algorithm_crud
+
+STARTUP_GRACE = 10.0  # in seconds
+RESPAWN_DELAY = 1.0  # in seconds
+RESPAWN_MAX_DELAY = 30.0  # in seconds
+
+
+def preload() -> None:
+    "Loads everything the workers share in the parent process"
+
+    create_db_and_tables()
+    recover_ingest_jobs()
+    researcher_libraries()
+
+    with Session(engine) as session:
+        for algorithm in algorithm_crud.get_multi(session=session):
+            try:
+                compile_algorithm(algorithm.algorithm)
+            except SyntaxError:
+                # Reported by /plan when the algorithm runs
+                pass
+
+    engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+
+
+def _start_worker(config: Config, sockets: list, delay: float = 0) -> int:
+    """Internal function that forks a worker that serves on the sockets,
+    after waiting delay seconds"""
+
+    channel = open_channel()
+
+    pid = os.fork()
+    if pid:
+        listen_to(channel)
+        return pid
+
+    # The worker handles the signals itself, with the handlers of uvicorn
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    send_to(channel)
+
+    status = STARTUP_FAILURE
+    try:
+        time.sleep(delay)
+
+        server = Server(config)
+        server.run(sockets=sockets)
+        if server.started:
+            status = 0
+    finally:
+        # The records of the worker are already sent to the listener of the
+        # parent, so nothing is lost by skipping atexit
+        os._exit(status)
+
+
+def _respawn_delay(failures: int) -> float:
+    "Internal function that returns the delay after failures in a row"
+
+    if not failures:
+        return 0
+
+    return min(RESPAWN_DELAY * 2 ** (failures - 1), RESPAWN_MAX_DELAY)
+
+
+def serve(
+    app: FastAPI,
+    *,
+    host: str,
+    port: int,
+    workers: int,
+    use_colors: bool = True,
+) -> None:
+    """Serves the application with workers forked from a preloaded parent,
+    until the parent receives SIGINT or SIGTERM, or all workers fail to
+    start.
+
+    :param app:
+        The application, created by create_app
+    :param host:
+        The host to bind to
+    :param port:
+        The port to bind to
+    :param workers:
+        The number of workers
+    :param use_colors:
+        Allows uvicorn to use colors in its logs
+    """
+
+    config = Config(app, host=host, port=port, use_colors=use_colors)
+    sockets = [config.bind_socket()]
+
+    preload()
+    preloaded = time.monotonic()
+
+    # The time every worker starts serving, after its delay
+    pids = {_start_worker(config, sockets): preloaded for _ in range(workers)}
+    failures = 0
+    stopping = False
+    failed = False
+
+    def stop(signum: int, frame) -> None:
+        nonlocal stopping
+
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    Logger.info(f"Started {workers} workers from parent {os.getpid()}")
+
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        now = time.monotonic()
+        if now - pids.pop(pid) < STARTUP_GRACE:
+            failures += 1
+        else:
+            failures = 0
+
+        if stopping:
+            continue
+
+        if failures >= workers and now - preloaded < STARTUP_GRACE:
+            Logger.error("All workers failed to start, stopping the server")
+            failed = True
+            stop(signal.SIGTERM, None)
+            continue
+
+        delay = _respawn_delay(failures)
+        code = os.waitstatus_to_exitcode(status)
+        Logger.warning(
+            f"Worker {pid} stopped with exit code {code}, "
+            f"starting a new worker in {delay:.0f} s"
+        )
+        pids[_start_worker(config, sockets, delay)] = now + delay
+
+    for sock in sockets:
+        sock.close()
+
+    if failed:
+        sys.exit(STARTUP_FAILURE)
@@ -0,0 +1,125 @@
+"""Profiling of single requests in production.
+
+When a twinworld or algorithm is only slow in production, a single /plan or
+energyflow upload can be profiled with cProfile by sending the profile_token
+of the settings in the X-Profile-Token header. Profiling is disabled when no
+profile_token is set, which is the default.
+
+The profile is saved in the pstats format in data/profiles, and its file name
+is sent back in the X-Profile header. The profile can be read with pstats,
+or viewed with snakeviz or speedscope.
+
+/plan runs on the event loop, so its profile is taken on the loop and
+contains everything that runs on the loop during the request. Only one of
+those profiles can be taken at a time. The ingest of an upload runs in the
+background after the response, so its profile is saved once the ingest job
+is done.
+
+example:
+```
+curl -H "X-Profile-Token: $PROFILE_TOKEN" -X POST .../api/simulate/plan
+```
+"""
+
+import cProfile
+import os
+import secrets
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+
+from fastapi import Depends, Header, Request, status
+
+from app.config import settings
+from app.utils import Logger
+
+PROFILE_FOLDER = os.path.join(Path().resolve(), "data/profiles")
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_HEADER = "X-Profile"
+
+# cProfile profiles a single thread, and two profiles of the same thread
+# replace each other
+_loop_profile = threading.Lock()
+
+
+def profile_name(
+    request: Request,
+    x_profile_token: Optional[str] = Header(default=None),
+) -> Optional[str]:
+    """Dependency that returns the file name of a new profile when the
+    request asks to be profiled, and None otherwise.
+
+    A request with a wrong token, or while profiling is disabled, is
+    forbidden, so a mistyped token doesn't go unnoticed.
+    """
+
+    if x_profile_token is None:
+        return None
+
+    if not settings.profile_token or not secrets.compare_digest(
+        x_profile_token.encode(), settings.profile_token.encode()
+    ):
+        Logger.exception(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid profile token",
+        )
+
+    route = request.scope["route"].name
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+
+    return f"{timestamp}-{route}-{uuid.uuid4().hex[:8]}.pstats"
+
+
+@contextmanager
+def profiled(name: Optional[str]) -> Iterator[None]:
+    """Profiles the code in the context of the current thread with cProfile,
+    and saves the profile as name in PROFILE_FOLDER. Without a name the code
+    runs as usual.
+    """
+
+    if name is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        profile.dump_stats(os.path.join(PROFILE_FOLDER, name))
+        Logger.warning(f"Saved profile {name}")
+
+
+async def profile_request(
+    name: Optional[str] = Depends(profile_name),
+) -> AsyncIterator[Optional[str]]:
+    """Dependency that profiles an async route on the event loop, when the
+    request asks to be profiled. Returns the file name of the profile.
+    """
+
+    if name is None:
+        yield None
+        return
+
+    if not _loop_profile.acquire(blocking=False):
+        Logger.exception(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another request is being profiled",
+        )
+
+    try:
+        with profiled(name):
+            yield name
+    finally:
+        _loop_profile.release()
+
+
+def profile_headers(name: Optional[str]) -> dict[str, str]:
+    "Returns the header that refers to the profile of a request"
+
+    return {PROFILE_HEADER: name} if name else {}
@@ -0,0 +1,38 @@
+"""The libraries available to the algorithms of researchers.
+
+The algorithm of a researcher is run with exec() in /plan, and can use the
+libraries below without importing them. Only these libraries may be imported
+by an algorithm, see the algorithm router.
+
+pandas and scipy take hundreds of milliseconds to import, so the libraries
+are imported the first time an algorithm of a researcher runs, instead of
+when a worker starts. An algorithm runs for every day of a chunk, so it is
+compiled once and the compiled code is reused.
+
+example:
+```
+global_vars.update(researcher_libraries())
+exec(compile_algorithm(algorithm), global_vars, local_vars)
+```
+"""
+
+from functools import cache, lru_cache
+from importlib import import_module
+from types import CodeType, ModuleType
+
+RESEARCHER_LIBRARIES = ("pandas", "numpy", "scipy", "math", "random")
+COMPILED_ALGORITHMS = 128
+
+
+@cache
+def researcher_libraries() -> dict[str, ModuleType]:
+    "Imports the libraries of the researchers once, and returns them by name"
+
+    return {name: import_module(name) for name in RESEARCHER_LIBRARIES}
+
+
+@lru_cache(maxsize=COMPILED_ALGORITHMS)
+def compile_algorithm(algorithm: str) -> CodeType:
+    "Compiles the code of an algorithm, once for the same code"
+
+    return compile(algorithm, "<algorithm>", "exec")
@@ -0,0 +1,119 @@
+"""Timers for the stages of a request.
+
+A StageTimer adds up the time spent in every stage of a request, like the
+stages of /plan, and formats the totals as a Server-Timing header. The
+browser shows the header in the timing of the request in its developer tools,
+so it is clear where the time of a request goes without a profiler.
+
+The timer only calls time.perf_counter twice per stage, so stages can be
+timed in production.
+
+When tracemalloc is tracing, for example with the memory_tracing setting or
+PYTHONTRACEMALLOC, the timer also records the memory of every stage: the peak
+of the allocations during the stage, and the net allocations that are left
+after it. tracemalloc traces the whole process, so concurrent requests are
+included in the memory of a stage, and stages should not be nested.
+
+example:
+```
+timer = StageTimer()
+
+with timer.stage("setup_planning"):
+    ...
+
+response.headers[SERVER_TIMING] = timer.server_timing()
+```
+"""
+
+import tracemalloc
+from time import perf_counter
+from typing import Optional
+
+SERVER_TIMING = "Server-Timing"
+MEBIBYTE = 1024 * 1024
+
+
+class _Stage:
+    """Context manager that adds the time spent in it to a stage of a timer,
+    and the memory allocated in it when tracemalloc is tracing"""
+
+    __slots__ = ("timer", "name", "start", "memory")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+        self.memory: Optional[int] = None
+
+    def __enter__(self) -> None:
+        if tracemalloc.is_tracing():
+            self.memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        self.start = perf_counter()
+
+    def __exit__(self, *args) -> None:
+        totals = self.timer.totals
+        totals[self.name] = (
+            totals.get(self.name, 0.0) + perf_counter() - self.start
+        )
+
+        if self.memory is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self.timer.add_memory(
+                self.name, peak - self.memory, current - self.memory
+            )
+
+
+class StageTimer:
+    "Adds up the time spent in the stages of a request"
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        self.totals: dict[str, float] = {}
+        # In bytes, only for the stages timed while tracemalloc is tracing
+        self.peaks: dict[str, int] = {}
+        self.net: dict[str, int] = {}
+
+    def stage(self, name: str) -> _Stage:
+        """Returns a context manager that times a stage.
+
+        A stage can be entered multiple times, the time of every time is
+        added to the total of the stage.
+        """
+
+        return _Stage(self, name)
+
+    def add_memory(self, name: str, peak: int, net: int) -> None:
+        """Adds the memory allocated in a stage. The peak is the highest peak
+        of every time the stage was entered, the net allocations are added.
+        """
+
+        self.peaks[name] = max(self.peaks.get(name, 0), peak)
+        self.net[name] = self.net.get(name, 0) + net
+
+    def server_timing(self) -> str:
+        """Returns the totals of the stages in milliseconds as the value of a
+        Server-Timing header, in the order the stages were first timed.
+
+        The time since the timer was created is added as the total. The
+        memory of a stage is added as its description, in MiB.
+        """
+
+        total = perf_counter() - self.start
+
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}{self._memory(name)}"
+            for name, seconds in (*self.totals.items(), ("total", total))
+        )
+
+    def _memory(self, name: str) -> str:
+        "Internal function that formats the memory of a stage"
+
+        if name not in self.peaks:
+            return ""
+
+        peak = self.peaks[name] / MEBIBYTE
+        net = self.net[name] / MEBIBYTE
+
+        return f';desc="peak {peak:.1f} MiB, net {net:+.1f} MiB"'
@@ -5,20 +5,29 @@ that are used throughout the application.
 """
 
 import logging
-import traceback
-from typing import Generator, NoReturn
+from typing import Any, Generator, NoReturn, Optional, Type
 
 from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from sqlmodel import SQLModel, Session
 
-from app.config import engine
+from app.config import QueryStats, engine, query_stats
+from app.core.crud.base import STREAM_BATCH_SIZE
 
 
 SECONDS_IN_DAY = 86400
 HOURS_IN_WEEK = 168
 MAX_DAYS_IN_YEAR = 366
 
+# Indexes that were replaced, and are dropped from existing databases
+DROPPED_INDEXES = (
+    "ix_household_twinworld_id_solar_panels",
+    "ix_household_twinworld_id_solar_panels_desc",
+)
+
 
 def timestamp_to_unix(timestamp: float) -> int:
     "Convert excel timestamp to unix timestamp"
@@ -52,10 +61,65 @@ def set_sec_headers(*, response: Response):
     return response
 
 
+class QueryStatsMiddleware:
+    """ASGI middleware that counts the statements and the database time of
+    every request.
+
+    The counts so far are sent in the X-DB-Query-Count and X-DB-Time headers
+    of the response, and the counts of the whole request, including the body
+    of streamed responses, are logged when the response is done.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = query_stats.set(stats)
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(stats.count)
+                headers["X-DB-Time"] = f"{stats.seconds * 1000:.1f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            query_stats.reset(token)
+            logging.info(
+                f"{stats.route}: {stats.count} queries in "
+                f"{stats.seconds * 1000:.1f} ms"
+            )
+
+
 def create_db_and_tables() -> None:
     "Create SQL DB and create tables and columns"
 
     SQLModel.metadata.create_all(engine)
+    create_indexes()
+
+
+def create_indexes() -> None:
+    """Create the indexes that are missing in an existing database
+
+    create_all only creates the indexes of the tables it creates, so indexes
+    added to an existing table are created here. The indexes they replaced
+    are dropped, as every write would keep updating them.
+    """
+
+    with engine.begin() as connection:
+        for name in DROPPED_INDEXES:
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 
 def delete_db_and_tables() -> None:
@@ -71,6 +135,39 @@ def get_session() -> Generator:
         yield session
 
 
+def stream_ndjson(
+    *,
+    crud: Any,
+    read_model: Type[SQLModel],
+    after: Optional[int] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> StreamingResponse:
+    """Stream all objects of a CRUD object as newline delimited JSON
+
+    The response opens its own session, as the session of the request is
+    already closed when the body is sent. Every chunk of the response holds
+    one batch of the server-side cursor.
+    """
+
+    def generate() -> Generator[str, None, None]:
+        with Session(engine) as session:
+            lines = []
+
+            for obj in crud.stream(
+                session=session, after=after, batch_size=batch_size
+            ):
+                lines.append(read_model.model_validate(obj).model_dump_json())
+
+                if len(lines) == batch_size:
+                    yield "\n".join(lines) + "\n"
+                    lines.clear()
+
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 class Logger(logging.Formatter):
     """Custom logger class that formats the log messages with colors.
 
@@ -80,7 +177,8 @@ class Logger(logging.Formatter):
     log levels.
 
     It also provides a static method to raise an HTTPException
-    from FastAPI and log the exception with the traceback.
+    from FastAPI and log the exception, with the traceback for server
+    errors.
     """
 
     grey = "\x1b[38;20m"
@@ -108,23 +206,41 @@ class Logger(logging.Formatter):
 
     @staticmethod
     def debug(value: str) -> None:
-        logging.debug(value)
+        logging.debug(value, stacklevel=2)
 
     @staticmethod
     def info(value: str) -> None:
-        logging.info(value)
+        logging.info(value, stacklevel=2)
 
     @staticmethod
     def warning(value: str) -> None:
-        logging.warning(value)
+        logging.warning(value, stacklevel=2)
 
     @staticmethod
     def error(value: str) -> None:
-        logging.error(value)
+        logging.error(value, stacklevel=2)
 
     @staticmethod
     def exception(*, status_code: int, detail: str, headers=None) -> NoReturn:
-        logging.error(detail + "\n" + traceback.format_exc())
+        """Logs the error and raises it as an HTTPException.
+
+        Only server errors are logged with the traceback of the exception
+        that is handled, client errors like a 404 are routine and only
+        logged as a warning.
+        """
+
+        if status_code >= 500:
+            logging.error(
+                detail,
+                exc_info=True,
+                extra={"status_code": status_code},
+                stacklevel=2,
+            )
+        else:
+            logging.warning(
+                detail, extra={"status_code": status_code}, stacklevel=2
+            )
+
         raise HTTPException(
             status_code=status_code, detail=detail, headers=headers
         )
@@ -0,0 +1,5 @@
+"""Benchmarks for the performance sensitive parts of the application.
+
+Every benchmark is a module that can be run from the backend directory,
+for example: `python -m benchmarks.ingest`
+"""
@@ -0,0 +1,602 @@
+"""Micro-benchmarks of the planning engine.
+
+Times the functions /plan spends its time in on synthetic twinworlds of
+`--households` households, drawn with the distributions of the seeder. The
+twinworlds are built in memory without a database, and plan the week of
+energyflows from energyflow.csv that starts at `--day`:
+
+    - loop_helpers: the helpers of every day of the week
+    - plan_greedy: the greedy planning of every appliance on every day
+    - create_results: the helpers of the results of every day
+    - _energy_efficiency_day: the results of the greedy planning of every day
+    - check_appliance_time: every hour of the first day for every appliance
+    - plan_simulated_annealing: improving the greedy planning of the first day
+      with `--max-temperature` trials
+
+Every function is run `--rounds` times after a warmup round, with the same
+seeds and inputs in every round. The median of every function is compared to
+its budget in BUDGETS, and the benchmark fails when a budget is exceeded. The
+budgets can be changed with `--budget`.
+
+After the timed rounds, one more round is run while tracemalloc is tracing,
+for the peak and the net allocations of the function. Tracing slows the
+function down, so it is not part of the timed rounds, and it can be skipped
+with `--no-memory`.
+
+The results can be stored as JSON with `--output`, and compared to an earlier
+run with `--compare`, which fails the benchmark when a median is more than
+`--max-regression` slower than in the earlier run, or when a peak is more
+than `--max-regression` larger and grew by more than MEMORY_TOLERANCE.
+
+example: `python -m benchmarks.engine --households 25 75 1000 10000
+--output engine.json`
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+# loop_helpers prints every day in development mode
+os.environ["DEVELOPMENT"] = "false"
+
+import numpy  # noqa: E402
+
+from app.timing import MEBIBYTE, StageTimer  # noqa: E402
+from app.utils import SECONDS_IN_DAY  # noqa: E402
+from app.plan_defaults import (  # noqa: E402
+    plan_greedy,
+    plan_simulated_annealing,
+)
+from app.plan_helpers import (  # noqa: E402
+    _energy_efficiency_day,
+    check_appliance_time,
+    create_results,
+    loop_helpers,
+)
+from app.core.routers.seeder_router import (  # noqa: E402
+    create_energyflow,
+    create_household_appliances,
+    create_households,
+    create_rng,
+    create_timewindows,
+)
+from app.core.models.algorithm_model import AlgorithmRead  # noqa: E402
+from app.core.models.appliance_model import (  # noqa: E402
+    ApplianceDays,
+    ApplianceRead,
+    ApplianceTimeDaily,
+    ApplianceTimeWindowRead,
+)
+from app.core.models.costmodel_model import CostModelRead  # noqa: E402
+from app.core.models.energyflow_model import (  # noqa: E402
+    EnergyFlowRead,
+    EnergyFlowUploadRead,
+)
+from app.core.models.household_model import HouseholdRead  # noqa: E402
+from app.core.models.twinworld_model import TwinWorldRead  # noqa: E402
+
+DAYS_IN_CHUNK = 7
+SOLAR_PANEL_CAPACITY = 340
+# Growth of a peak in bytes that is not a regression, as small peaks change
+# with the objects that are cached by Python
+MEMORY_TOLERANCE = MEBIBYTE
+
+# The maximum median of every function in seconds for 1000 households. The
+# budgets grow with larger twinworlds, but not shrink with smaller ones, as
+# those are dominated by fixed costs. The simulated annealing does a fixed
+# amount of trials, so its budget is for 10000 trials instead.
+BUDGETS = {
+    "loop_helpers": 0.5,
+    "plan_greedy": 2.0,
+    "create_results": 0.5,
+    "_energy_efficiency_day": 0.5,
+    "check_appliance_time": 2.0,
+    "plan_simulated_annealing": 0.5,
+}
+
+
+class Twinworld:
+    "The inputs of planning a week of a synthetic twinworld"
+
+    def __init__(self, households: int, seed: float, day: int):
+        rng = create_rng(seed)
+
+        columns = create_households(rng, households, SOLAR_PANEL_CAPACITY)
+        appliances = create_household_appliances(
+            rng, columns["size"], columns["inv_norm"]
+        )
+        available = numpy.stack(
+            [column["available"] for _, column in appliances], axis=1
+        )
+        days = list(ApplianceDays)
+        bitmaps = iter(
+            create_timewindows(rng, int(available.sum()) * len(days)).tolist()
+        )
+
+        # Appliances are ordered by household and have consecutive ids, like
+        # the seeder creates them
+        self.households: list[HouseholdRead] = []
+        appliance_id = 1
+        for index in range(households):
+            household_appliances = []
+            for (appliance, column), has_appliance in zip(
+                appliances, available[index]
+            ):
+                if not has_appliance:
+                    continue
+
+                household_appliances.append(
+                    ApplianceRead(
+                        id=appliance_id,
+                        name=appliance["name"],
+                        power=float(column["power"][index]),
+                        duration=int(column["duration"][index]),
+                        daily_usage=float(column["daily_usage"][index]),
+                        appliance_windows=[
+                            ApplianceTimeWindowRead(
+                                id=(appliance_id - 1) * len(days) + number,
+                                day=day,
+                                bitmap_window=next(bitmaps),
+                            )
+                            for number, day in enumerate(days, 1)
+                        ],
+                    )
+                )
+                appliance_id += 1
+
+            self.households.append(
+                HouseholdRead(
+                    id=index + 1,
+                    name=f"Household {index + 1}",
+                    size=int(columns["size"][index]),
+                    energy_usage=int(columns["energy_usage"][index]),
+                    solar_panels=int(columns["solar_panels"][index]),
+                    solar_yield_yearly=int(
+                        columns["solar_yield_yearly"][index]
+                    ),
+                    twinworld_id=1,
+                    appliances=household_appliances,
+                )
+            )
+
+        # The households of a twinworld are planned from the most solar
+        # panels to the least
+        self.households.sort(
+            key=lambda household: household.solar_panels, reverse=True
+        )
+        self.appliances = appliance_id - 1
+
+        # The chunk is the whole planning, so the days are 1 to 7
+        self.appliance_time = {
+            (appliance, day): ApplianceTimeDaily(
+                id=(appliance - 1) * DAYS_IN_CHUNK + day,
+                day=day,
+                bitmap_plan_energy=0,
+                bitmap_plan_no_energy=0,
+                appliance_id=appliance,
+            )
+            for appliance in range(1, self.appliances + 1)
+            for day in range(1, DAYS_IN_CHUNK + 1)
+        }
+
+        start = day * 24
+        end = start + DAYS_IN_CHUNK * 24
+        self.energyflow_data_sim = [
+            EnergyFlowRead(id=index + 1, **energyflow)
+            for index, energyflow in enumerate(create_energyflow()[start:end])
+        ]
+        self.energyflow_data = sorted(
+            (el for el in self.energyflow_data_sim if el.solar_produced > 0),
+            key=lambda el: el.solar_produced,
+            reverse=True,
+        )
+        self.start_date = self.energyflow_data_sim[0].timestamp
+        self.total_start_date = self.start_date
+
+        self.energyflow = EnergyFlowUploadRead(
+            id=1,
+            name="Energyflow Zoetermeer",
+            description="Energyflow of the benchmark",
+            solar_panels_factor=8500,
+            energy_usage_factor=7000,
+        )
+        self.twinworld = TwinWorldRead(
+            id=1,
+            name="Benchmark",
+            description="Synthetic twinworld of the benchmark",
+            solar_panel_capacity=SOLAR_PANEL_CAPACITY,
+        )
+        self.costmodel = CostModelRead(
+            id=1,
+            name="Fixed Price",
+            description="Fixed price of the benchmark",
+            price_network_buy_consumer=0.4,
+            price_network_sell_consumer=0.1,
+            fixed_price_ratio=0.5,
+            algorithm="cost_default()",
+        )
+
+    def loop_helpers(self, day_iterator: int) -> tuple:
+        return loop_helpers(
+            start_date=self.start_date,
+            total_start_date=self.total_start_date,
+            day_iterator=day_iterator,
+            length_planning=len(self.households),
+            household_planning=self.households,
+            energyflow_data=self.energyflow_data,
+            energyflow=self.energyflow,
+            twinworld=self.twinworld,
+        )
+
+    def create_results(self, day_number_in_planning: int) -> tuple:
+        return create_results(
+            total_start_date=self.total_start_date,
+            day_number_in_planning=day_number_in_planning,
+            energyflow_data_sim=self.energyflow_data_sim,
+            household_planning=self.households,
+            energyflow=self.energyflow,
+        )
+
+
+def plan_week_greedy(
+    twinworld: Twinworld,
+    appliance_time: dict[tuple[int, int], ApplianceTimeDaily],
+    helpers: list[tuple],
+) -> None:
+    "Plans every appliance on every day of the week like /plan does"
+
+    for (
+        _,
+        energyflow_day,
+        household_energy,
+        total_available_energy,
+        day_number_in_planning,
+    ) in helpers:
+        for household_idx, household in enumerate(twinworld.households):
+            for appliance in household.appliances:
+                (
+                    appliance_time,
+                    total_available_energy,
+                    household_energy,
+                ) = plan_greedy(
+                    household_idx=household_idx,
+                    day_number_in_planning=day_number_in_planning,
+                    total_available_energy=total_available_energy,
+                    household_energy=household_energy,
+                    appliance=appliance,
+                    appliance_time=appliance_time,
+                    energyflow_day=energyflow_day,
+                    total_start_date=twinworld.total_start_date,
+                )
+
+
+def create_cases(
+    twinworld: Twinworld, seed: float, max_temperature: int
+) -> dict[str, tuple[Callable[[], Any], Callable[[], None]]]:
+    """Returns the setup and the function of every benchmark.
+
+    The setup is run before every round and is not timed, it resets the
+    seed of random and the inputs that the function changes. The daily plans
+    of the twinworld are shared, and hold the greedy planning of the week
+    outside of the plan_greedy rounds.
+    """
+
+    days = range(1, DAYS_IN_CHUNK + 1)
+    helpers = [twinworld.loop_helpers(day) for day in days]
+    results = [twinworld.create_results(day) for day in days]
+    appliance_time = twinworld.appliance_time
+
+    def copy_helpers() -> list[tuple]:
+        "The greedy planning changes the energy of the households"
+
+        return [
+            (date, flows, [row[:] for row in energy], available, day)
+            for date, flows, energy, available, day in helpers
+        ]
+
+    def set_bitmaps(bitmaps: list[tuple[int, int]]) -> None:
+        for el, (bitmap_energy, bitmap_no_energy) in zip(
+            appliance_time.values(), bitmaps
+        ):
+            el.bitmap_plan_energy = bitmap_energy
+            el.bitmap_plan_no_energy = bitmap_no_energy
+
+    # The greedy planning of the week is the input of the results and of the
+    # simulated annealing
+    empty = [(0, 0)] * len(appliance_time)
+    random.seed(seed)
+    plan_week_greedy(twinworld, appliance_time, copy_helpers())
+    planned = [
+        (el.bitmap_plan_energy, el.bitmap_plan_no_energy)
+        for el in appliance_time.values()
+    ]
+    appliances = [
+        appliance
+        for household in twinworld.households
+        for appliance in household.appliances
+    ]
+    first_day = helpers[0][0] - SECONDS_IN_DAY
+    first_day_bitmaps = [
+        appliance_time[(appliance.id, 1)].bitmap_plan_energy
+        for appliance in appliances
+    ]
+
+    state: dict[str, Any] = {}
+
+    def seed_only() -> None:
+        random.seed(seed)
+
+    def setup_greedy() -> None:
+        random.seed(seed)
+        set_bitmaps(empty)
+        state["helpers"] = copy_helpers()
+
+    def setup_planned() -> None:
+        random.seed(seed)
+        set_bitmaps(planned)
+
+    def run_loop_helpers() -> None:
+        for day in days:
+            twinworld.loop_helpers(day)
+
+    def run_plan_greedy() -> None:
+        plan_week_greedy(twinworld, appliance_time, state["helpers"])
+
+    def run_create_results() -> None:
+        for day in days:
+            twinworld.create_results(day)
+
+    def run_energy_efficiency_day() -> None:
+        for (date, *_, day_number), (*_, energyflow_day_sim) in zip(
+            helpers, results
+        ):
+            _energy_efficiency_day(
+                day=day_number,
+                date=date,
+                solar_panels_factor=twinworld.energyflow.solar_panels_factor,
+                solar_produced_day=sum(
+                    el.solar_produced for el in energyflow_day_sim
+                ),
+                energy_flow=energyflow_day_sim,
+                planning=twinworld.households,
+                appliance_bitmap_plan=appliance_time,
+                costmodel=twinworld.costmodel,
+            )
+
+    def run_check_appliance_time() -> None:
+        for appliance, bitmap in zip(appliances, first_day_bitmaps):
+            for hour in range(24):
+                check_appliance_time(
+                    appliance=appliance,
+                    unix=first_day + hour * 3600,
+                    appliance_bitmap_plan=bitmap,
+                )
+
+    def run_plan_simulated_annealing() -> None:
+        date, *_, day_number_in_planning = helpers[0]
+        solar_produced, current_used, current_available, _ = results[0]
+        plan_simulated_annealing(
+            date=date,
+            day_number_in_planning=day_number_in_planning,
+            length_planning=len(twinworld.households),
+            current_available=current_available,
+            solar_produced=solar_produced,
+            current_used=current_used,
+            algorithm=AlgorithmRead(
+                id=2,
+                name="Simulated Annealing",
+                description="Simulated annealing of the benchmark",
+                max_temperature=max_temperature,
+                algorithm=" ",
+            ),
+            household_planning=twinworld.households,
+            appliance_time=appliance_time,
+        )
+
+    return {
+        "loop_helpers": (seed_only, run_loop_helpers),
+        "plan_greedy": (setup_greedy, run_plan_greedy),
+        "create_results": (seed_only, run_create_results),
+        "_energy_efficiency_day": (seed_only, run_energy_efficiency_day),
+        "check_appliance_time": (seed_only, run_check_appliance_time),
+        "plan_simulated_annealing": (
+            setup_planned,
+            run_plan_simulated_annealing,
+        ),
+    }
+
+
+def bench(
+    setup: Callable[[], None], function: Callable[[], Any], rounds: int
+) -> dict[str, float]:
+    "Times the rounds of a function after a warmup round"
+
+    timings = []
+    for _ in range(rounds + 1):
+        setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    timings = timings[1:]
+
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "stddev": statistics.stdev(timings) if rounds > 1 else 0.0,
+        "rounds": rounds,
+    }
+
+
+def measure_memory(
+    name: str, setup: Callable[[], None], function: Callable[[], Any]
+) -> dict[str, int]:
+    "Measures the allocations of a round of a function with tracemalloc"
+
+    timer = StageTimer()
+    tracemalloc.start()
+    try:
+        setup()
+        with timer.stage(name):
+            function()
+    finally:
+        tracemalloc.stop()
+
+    return {"peak_memory": timer.peaks[name], "net_memory": timer.net[name]}
+
+
+def scaled_budget(
+    budget: float, name: str, households: int, max_temperature: int
+) -> float:
+    "Returns the budget of a benchmark for the size of the twinworld"
+
+    if name == "plan_simulated_annealing":
+        return budget * max_temperature / 10000
+
+    return budget * max(households, 1000) / 1000
+
+
+def parse_budgets(values: list[str]) -> dict[str, float]:
+    "Returns BUDGETS with the budgets of `--budget name=seconds` changed"
+
+    budgets = dict(BUDGETS)
+    for value in values:
+        name, _, seconds = value.partition("=")
+        if name not in budgets:
+            sys.exit(f"Unknown benchmark {name}, choose from {list(BUDGETS)}")
+        budgets[name] = float(seconds)
+
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--households", type=int, nargs="+", default=[25, 75, 1000]
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=float, default=0.5)
+    parser.add_argument(
+        "--day",
+        type=int,
+        default=150,
+        help="first day of the planned week in energyflow.csv",
+    )
+    parser.add_argument("--max-temperature", type=int, default=10000)
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        help="budget of a benchmark as name=seconds, see BUDGETS",
+    )
+    parser.add_argument("--output", help="file to store the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="allowed slowdown of a median compared to --compare",
+    )
+    parser.add_argument(
+        "--memory",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="measure the allocations of every function with tracemalloc",
+    )
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    previous = {}
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)["results"]
+
+    results: dict[str, dict[str, Any]] = {}
+    failures = []
+
+    print(
+        f"{'benchmark':<40}{'min':>10}{'median':>10}{'stddev':>10}"
+        f"{'budget':>10}{'change':>9}{'peak':>11}{'net':>11}"
+    )
+
+    for households in args.households:
+        twinworld = Twinworld(households, args.seed, args.day)
+        print(f"\n{households} households, {twinworld.appliances} appliances")
+
+        cases = create_cases(twinworld, args.seed, args.max_temperature)
+        for name, (setup, function) in cases.items():
+            key = f"{name}[{households}]"
+            result: dict[str, Any] = bench(setup, function, args.rounds)
+            if args.memory:
+                result.update(measure_memory(name, setup, function))
+            results[key] = result
+
+            budget = scaled_budget(
+                budgets[name], name, households, args.max_temperature
+            )
+            if result["median"] > budget:
+                failures.append(f"{key} exceeds its budget")
+
+            change = ""
+            if key in previous:
+                ratio = result["median"] / previous[key]["median"] - 1
+                change = f"{ratio:+.0%}"
+                if ratio > args.max_regression:
+                    failures.append(f"{key} is {change} slower")
+
+            memory = ""
+            if args.memory:
+                peak = result["peak_memory"]
+                memory = (
+                    f"{peak / 1024:>8.0f}KiB"
+                    f"{result['net_memory'] / 1024:>+8.0f}KiB"
+                )
+
+                before = previous.get(key, {}).get("peak_memory")
+                if (
+                    before is not None
+                    and peak > before * (1 + args.max_regression)
+                    and peak - before > MEMORY_TOLERANCE
+                ):
+                    failures.append(
+                        f"{key} peaks at {peak / before - 1:+.0%} memory"
+                    )
+
+            print(
+                f"{key:<40}{result['min'] * 1000:>8.2f}ms"
+                f"{result['median'] * 1000:>8.2f}ms"
+                f"{result['stddev'] * 1000:>8.2f}ms"
+                f"{budget * 1000:>8.1f}ms{change:>9}{memory}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "created": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                    "seed": args.seed,
+                    "day": args.day,
+                    "max_temperature": args.max_temperature,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+    if failures:
+        sys.exit("\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
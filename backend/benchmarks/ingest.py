@@ -0,0 +1,168 @@
+"""Benchmark for the ingest of uploaded energyflow files.
+
+Compares the streaming bulk ingest of an ingest job with inserting every row
+through energyflow_crud.create, which commits once per row. Both run against a
+temporary SQLite database. The parsing and the bulk ingest are also measured
+for the CSV, Parquet and Arrow IPC formats.
+
+example: `python -m benchmarks.ingest --rows 8760`
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from sqlmodel import SQLModel, Session, create_engine
+
+import pyarrow
+import pyarrow.ipc
+import pyarrow.parquet
+
+from app.ingest import (
+    create_ingest_job,
+    iter_csv_batches,
+    iter_energyflow_batches,
+    run_ingest_job,
+)
+from app.core.crud.energyflow_crud import energyflow_crud
+from app.core.models.energyflow_model import (
+    EnergyFlowCreate,
+    EnergyFlowUploadCreate,
+)
+
+
+def create_csv(rows: int) -> bytes:
+    "Creates an hourly energyflow CSV file in the format of the upload"
+
+    lines = ["\ufefftimestamp;energy_used;solar_produced"]
+    for hour in range(rows):
+        timestamp = 1577833200 + hour * 3600
+        energy_used = f"{hour % 7 / 10:.3f}".replace(".", ",")
+        solar = f"{max(0, 12 - abs(hour % 24 - 12)) / 10:.3f}".replace(
+            ".", ","
+        )
+        lines.append(f"{timestamp};{energy_used};{solar}")
+
+    return "\n".join(lines).encode("utf-8")
+
+
+def create_binary(csv: bytes, format: str) -> bytes:
+    "Converts an energyflow CSV file to the Parquet or Arrow IPC format"
+
+    batches = list(iter_csv_batches(BytesIO(csv), energyflow_upload_id=1))
+    table = pyarrow.table(
+        {
+            column: [value for batch in batches for value in batch[column]]
+            for column in ("timestamp", "energy_used", "solar_produced")
+        }
+    )
+
+    file = BytesIO()
+
+    if format == "parquet":
+        pyarrow.parquet.write_table(table, file)
+    else:
+        with pyarrow.ipc.new_file(file, table.schema) as writer:
+            writer.write_table(table)
+
+    return file.getvalue()
+
+
+def bench_parse(contents: bytes) -> float:
+    "Returns the throughput of only parsing a file in rows per second"
+
+    start = time.perf_counter()
+    rows = sum(
+        len(batch["timestamp"])
+        for batch in iter_energyflow_batches(
+            BytesIO(contents), energyflow_upload_id=1
+        )
+    )
+    return rows / (time.perf_counter() - start)
+
+
+def upload(name: str) -> EnergyFlowUploadCreate:
+    return EnergyFlowUploadCreate(
+        name=name,
+        description="Benchmark upload",
+        solar_panels_factor=8500,
+        energy_usage_factor=7000,
+    )
+
+
+def bench_bulk(engine, contents: bytes, name: str) -> float:
+    "Returns the throughput of the streaming bulk ingest in rows per second"
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        job, path = create_ingest_job(
+            session=session, file=BytesIO(contents), upload_in=upload(name)
+        )
+        job = run_ingest_job(session=session, job_id=job.id, path=path)
+        return job.rows_processed / (time.perf_counter() - start)
+
+
+def bench_per_row(engine, contents: bytes, rows: int) -> float:
+    "Returns the throughput of inserting and committing one row at a time"
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        count = 0
+        for batch in iter_csv_batches(
+            BytesIO(contents), energyflow_upload_id=2
+        ):
+            for values in list(zip(*batch.values()))[: rows - count]:
+                energyflow_crud.create(
+                    session=session,
+                    obj_in=EnergyFlowCreate(**dict(zip(batch, values))),
+                )
+            count += len(batch["timestamp"])
+            if count >= rows:
+                break
+        return min(count, rows) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=8760)
+    parser.add_argument(
+        "--per-row-rows",
+        type=int,
+        default=500,
+        help="rows inserted with the per row path, as it is very slow",
+    )
+    args = parser.parse_args()
+
+    csv = create_csv(args.rows)
+    files = {
+        "csv": csv,
+        "parquet": create_binary(csv, "parquet"),
+        "arrow": create_binary(csv, "arrow"),
+    }
+
+    print(f"rows in file:       {args.rows}\n")
+    print(f"{'format':<10}{'size':>12}{'parse':>16}{'ingest':>16}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_engine(f"sqlite:///{os.path.join(folder, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+
+        bulk = {}
+        for format, contents in files.items():
+            parse = bench_parse(contents)
+            bulk[format] = bench_bulk(engine, contents, format)
+            print(
+                f"{format:<10}{len(contents):>10} B"
+                f"{parse:>10.0f} rows/s{bulk[format]:>10.0f} rows/s"
+            )
+
+        per_row = bench_per_row(engine, csv, args.per_row_rows)
+
+    print(f"\nper row commit:     {per_row:12.0f} rows/s")
+    print(f"csv speedup:        {bulk['csv'] / per_row:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
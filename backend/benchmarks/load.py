@@ -0,0 +1,268 @@
+"""Load test of the simulate flow over HTTP.
+
+Seeds a temporary SQLite database and starts the server on it with run.py,
+with `--workers` workers and development mode off. Then `--users` virtual
+users replay the flow of the frontend at the same time: /load-data, /start,
+and /plan for `--chunks` chunks of a week. Like the frontend, a user stops
+planning when /plan does not return a chunk anymore.
+
+The latency percentiles of every endpoint are shown together with the
+throughput, so the amount of workers and the settings of the server can be
+tuned for the amount of researchers that use one deployment. With `--url` an
+already running server is tested instead, which should be seeded already.
+
+The server runs in a temporary folder, so the plan store and the logs of the
+load test don't end up in the data folder of the backend.
+
+example: `python -m benchmarks.load --users 8 --workers 2 --chunks 52`
+"""
+
+import argparse
+import atexit
+import gzip
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+
+from sqlmodel import Session  # noqa: E402
+
+from app.config import engine  # noqa: E402
+from app.core.routers.seeder_router import (  # noqa: E402
+    generate_twinworld,
+    seed,
+)
+
+BACKEND_FOLDER = Path(__file__).resolve().parent.parent
+API_PREFIX = "/api/simulate"
+SERVER_TIMEOUT = 60  # in seconds
+
+
+class VirtualUser(threading.Thread):
+    "Replays the simulate flow of the frontend on its own connection"
+
+    def __init__(self, url: str, args: argparse.Namespace):
+        super().__init__()
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=600
+        )
+        self.args = args
+        self.samples: list[tuple[str, int, float]] = []
+
+    def request(self, method: str, endpoint: str, body=None):
+        "Sends a request, and records its status and latency"
+
+        headers = {"Accept-Encoding": "gzip"}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        start = time.perf_counter()
+        self.connection.request(
+            method, API_PREFIX + endpoint, body=body, headers=headers
+        )
+        response = self.connection.getresponse()
+        content = response.read()
+        self.samples.append(
+            (endpoint, response.status, time.perf_counter() - start)
+        )
+
+        if response.getheader("Content-Encoding") == "gzip":
+            content = gzip.decompress(content)
+
+        return response.status, content
+
+    def run(self):
+        status, _ = self.request("GET", "/load-data")
+        if status != 200:
+            return
+
+        status, content = self.request(
+            "POST",
+            "/start",
+            {
+                "algorithm_id": self.args.algorithm_id,
+                "twinworld_id": self.args.twinworld_id,
+                "costmodel_id": self.args.costmodel_id,
+                "energyflow_id": 1,
+            },
+        )
+        if status != 200:
+            return
+
+        selected = json.loads(content)
+        for chunk in range(self.args.chunks):
+            status, _ = self.request(
+                "POST", "/plan", {"chunkoffset": chunk * 7, **selected}
+            )
+            if status != 200:
+                break
+
+        self.connection.close()
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    "Starts the server with run.py on the seeded database"
+
+    env = dict(
+        os.environ,
+        DEVELOPMENT="false",
+        PORT=str(port),
+        WORKERS=str(workers),
+        SERVER_HOST="127.0.0.1",
+        UVCORN_COLORS="false",
+    )
+
+    return subprocess.Popen(
+        [sys.executable, str(BACKEND_FOLDER / "run.py")],
+        cwd=folder,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_for_server(url: str, server: subprocess.Popen) -> None:
+    "Waits until the server answers requests"
+
+    parts = urlsplit(url)
+    deadline = time.monotonic() + SERVER_TIMEOUT
+
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit("The server stopped while starting")
+
+        try:
+            connection = http.client.HTTPConnection(
+                parts.hostname, parts.port, timeout=1
+            )
+            connection.request("GET", "/metrics")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+
+    sys.exit(f"The server did not start in {SERVER_TIMEOUT} seconds")
+
+
+def percentile(latencies: list[float], percent: int) -> float:
+    "Returns the percentile of sorted latencies with the nearest rank"
+
+    rank = max(round(percent / 100 * len(latencies)), 1)
+    return latencies[rank - 1]
+
+
+def report(samples: list[tuple[str, int, float]], seconds: float) -> None:
+    print(
+        f"{'endpoint':<12}{'requests':>9}{'errors':>8}{'p50':>10}{'p95':>10}"
+        f"{'p99':>10}{'max':>10}"
+    )
+
+    for endpoint in ("/load-data", "/start", "/plan"):
+        latencies = sorted(
+            latency for name, _, latency in samples if name == endpoint
+        )
+        errors = sum(
+            1
+            for name, status, _ in samples
+            if name == endpoint and status >= 400
+        )
+        if not latencies:
+            continue
+
+        print(
+            f"{endpoint:<12}{len(latencies):>9}{errors:>8}"
+            + "".join(
+                f"{percentile(latencies, percent) * 1000:>8.0f}ms"
+                for percent in (50, 95, 99)
+            )
+            + f"{latencies[-1] * 1000:>8.0f}ms"
+        )
+
+    chunks = sum(
+        1 for name, status, _ in samples if name == "/plan" and status == 200
+    )
+    print(
+        f"\n{len(samples)} requests in {seconds:.1f} s: "
+        f"{len(samples) / seconds:.2f} requests/s, "
+        f"{chunks / seconds:.2f} chunks/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=52)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=float, default=0.5)
+    parser.add_argument(
+        "--households",
+        type=int,
+        default=0,
+        help="households of a generated twinworld to simulate, when not 0",
+    )
+    parser.add_argument("--twinworld-id", type=int, default=1)
+    parser.add_argument("--algorithm-id", type=int, default=1)
+    parser.add_argument("--costmodel-id", type=int, default=1)
+    parser.add_argument("--url", help="url of an already running server")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        with Session(engine) as session:
+            seed(seed=args.seed, session=session)
+
+        if args.households:
+            with Session(engine) as session:
+                twinworld = generate_twinworld(
+                    session,
+                    name="Load test",
+                    households=args.households,
+                    seed=args.seed,
+                )
+                session.commit()
+                args.twinworld_id = twinworld.id
+        engine.dispose()
+
+        url = f"http://localhost:{args.port}"
+        server = start_server(args.port, args.workers)
+
+    try:
+        if server is not None:
+            wait_for_server(url, server)
+
+        print(
+            f"users: {args.users}, chunks: {args.chunks}, "
+            f"workers: {args.workers if server else 'unknown'}\n"
+        )
+
+        users = [VirtualUser(url, args) for _ in range(args.users)]
+        start = time.perf_counter()
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        seconds = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report([sample for user in users for sample in user.samples], seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark for encoding the output of /plan.
+
+Compares the JSON output, validated through SelectedModelsOutput like the
+response model of /plan does, with the compact binary format of
+app.plan_format. Both encode a week for a synthetic twinworld with
+`--appliances` appliances, and the sizes are shown with and without gzip.
+
+example: `python -m benchmarks.plan_format --appliances 3300`
+"""
+
+import argparse
+import gzip
+import random
+import time
+
+from app.plan_format import RESULT_COLUMNS, encode_plan
+from app.plan_helpers import SelectedModelsOutput
+from app.core.models.appliance_model import ApplianceTimeDaily
+
+DAYS_IN_CHUNK = 7
+DAYS_IN_PLANNING = 366
+
+
+def create_output(appliances: int) -> dict:
+    "Creates the output of /plan for a week with random bitmaps"
+
+    time_daily = [
+        ApplianceTimeDaily(
+            id=(appliance_id - 1) * DAYS_IN_PLANNING + day,
+            appliance_id=appliance_id,
+            day=day,
+            bitmap_plan_energy=random.getrandbits(24),
+            bitmap_plan_no_energy=random.getrandbits(24),
+        )
+        for appliance_id in range(1, appliances + 1)
+        for day in range(1, DAYS_IN_CHUNK + 1)
+    ]
+    results = [
+        [random.random() for _ in range(RESULT_COLUMNS)]
+        for _ in range(DAYS_IN_CHUNK)
+    ]
+
+    return {
+        "time_daily": time_daily,
+        "results": results,
+    }
+
+
+def encode_json(output: dict) -> bytes:
+    return (
+        SelectedModelsOutput.model_validate(
+            {
+                "timedaily": output["time_daily"],
+                "results": output["results"],
+                "days_in_planning": DAYS_IN_PLANNING,
+                "start_date": 1577836800,
+                "end_date": 1578355200,
+            },
+            from_attributes=True,
+        )
+        .model_dump_json()
+        .encode()
+    )
+
+
+def encode_binary(output: dict) -> bytes:
+    return encode_plan(
+        time_daily=output["time_daily"],
+        results=output["results"],
+        days_in_planning=DAYS_IN_PLANNING,
+        start_day=1,
+        start_date=1577836800,
+        end_date=1578355200,
+    )
+
+
+def best_of(repeat: int, function, output: dict) -> tuple[float, bytes]:
+    "Returns the best time of encoding the output, with the encoded output"
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        contents = function(output)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), contents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--appliances", type=int, default=3300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    output = create_output(args.appliances)
+
+    print(f"appliances: {args.appliances}, days: {DAYS_IN_CHUNK}\n")
+    print(f"{'format':<10}{'encode':>12}{'size':>14}{'gzipped':>14}")
+
+    for name, function in (("json", encode_json), ("binary", encode_binary)):
+        seconds, contents = best_of(args.repeat, function, output)
+        print(
+            f"{name:<10}{seconds * 1000:>9.1f} ms{len(contents):>12} B"
+            f"{len(gzip.compress(contents)):>12} B"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Benchmark for the amount of database queries of the household routes.
+
+Seeds a temporary SQLite database, generates a twinworld of `--households`
+households and counts the queries that /start and the household routes need,
+including the serialisation of the households with their appliances and time
+windows. The first chunk of the twinworld is planned with /plan as well,
+which only loads the daily plans of its own days and appliances. The amount
+of queries should not grow with every household, so
+every route has a budget that fails the benchmark when it is exceeded. As
+selectinload loads 500 objects per query, the budget grows by a
+query per 100 households, which have about 330 appliances.
+
+example: `python -m benchmarks.queries --households 1000`
+"""
+
+import argparse
+import asyncio
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+
+from fastapi import Response  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.config import engine  # noqa: E402
+from app.core.routers.seeder_router import (  # noqa: E402
+    generate_twinworld,
+    seed,
+)
+from app.plan_helpers import SelectedModelsInput  # noqa: E402
+from app.core.routers.simulation_router import plan, start  # noqa: E402
+from app.core.routers.household_router import (  # noqa: E402
+    get_household,
+    get_households,
+    get_households_by_twinworld,
+)
+from app.core.models.household_model import HouseholdRead  # noqa: E402
+
+# The maximum amount of queries of every route, on top of a query per 100
+# households
+QUERY_BUDGETS = {
+    "/simulate/start": 10,
+    "/simulate/plan": 10,
+    "/household/": 5,
+    "/household/{id}": 5,
+    "/household/twinworld/{id}": 8,
+}
+
+
+class QueryCounter:
+    "Counts the queries executed by the engine"
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.increment)
+
+    def increment(self, *args):
+        self.count += 1
+
+    def measure(self, function) -> tuple[int, float]:
+        "Returns the amount of queries and the time of calling a function"
+
+        self.count = 0
+        start = time.perf_counter()
+        function()
+        return self.count, time.perf_counter() - start
+
+
+def serialise(households) -> None:
+    "Serialises households like the response model of the routes does"
+
+    for household in households:
+        HouseholdRead.model_validate(household)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--households", type=int, default=1000)
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        seed(seed=0.5, session=session)
+
+    with Session(engine) as session:
+        twinworld = generate_twinworld(
+            session, name="Benchmark", households=args.households, seed=0.5
+        )
+        session.commit()
+        twinworld_id = twinworld.id
+
+    with Session(engine) as session:
+        options = asyncio.run(
+            start(
+                algorithm_id=1,
+                twinworld_id=twinworld_id,
+                costmodel_id=1,
+                energyflow_id=1,
+                session=session,
+            )
+        )
+    planning = SelectedModelsInput(
+        chunkoffset=0,
+        households=options.households,
+        costmodel=options.costmodel,
+        algorithm=options.algorithm,
+        twinworld=options.twinworld,
+        energyflow=options.energyflow,
+    )
+
+    counter = QueryCounter()
+    routes = {
+        "/simulate/start": lambda session: asyncio.run(
+            start(
+                algorithm_id=1,
+                twinworld_id=twinworld_id,
+                costmodel_id=1,
+                energyflow_id=1,
+                session=session,
+            )
+        ),
+        "/simulate/plan": lambda session: asyncio.run(
+            plan(
+                planning=planning,
+                response=Response(),
+                accept=None,
+                session=session,
+                profile=None,
+            )
+        ),
+        "/household/": lambda session: serialise(
+            asyncio.run(
+                get_households(after=None, limit=1000, session=session)
+            )
+        ),
+        "/household/{id}": lambda session: serialise(
+            [asyncio.run(get_household(id=1, session=session))]
+        ),
+        "/household/twinworld/{id}": lambda session: serialise(
+            asyncio.run(
+                get_households_by_twinworld(
+                    twinworld_id=twinworld_id, session=session
+                )
+            )
+        ),
+    }
+
+    print(f"households in twinworld: {args.households}\n")
+    print(f"{'route':<28}{'queries':>8}{'budget':>8}{'time':>12}")
+
+    exceeded = False
+    for route, function in routes.items():
+        # A new session for every route, so nothing is loaded already
+        with Session(engine) as session:
+            queries, seconds = counter.measure(lambda: function(session))
+
+        budget = QUERY_BUDGETS[route] + args.households // 100
+        exceeded |= queries > budget
+        print(f"{route:<28}{queries:>8}{budget:>8}{seconds:>10.3f} s")
+
+    if exceeded:
+        sys.exit("\nThe query budget of a route is exceeded")
+
+
+if __name__ == "__main__":
+    main()
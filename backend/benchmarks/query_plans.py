@@ -0,0 +1,151 @@
+"""Check of the query plans of loading a chunk of the planning.
+
+Seeds a temporary SQLite database, runs the queries that /start and /plan
+need to load a chunk, and shows the `EXPLAIN QUERY PLAN` of every query. The
+queries should search the indexes of the models, so the check fails when a
+query scans a table or needs a temporary sort.
+
+The households of a twinworld are planned in the order of the query, so the
+check also fails when households with the same amount of solar panels don't
+come back in the order of their id.
+
+example: `python -m benchmarks.query_plans`
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.config import engine  # noqa: E402
+from app.core.routers.seeder_router import seed  # noqa: E402
+from app.core.crud.appliance_crud import (  # noqa: E402
+    appliance_time_daily_crud,
+)
+from app.core.crud.energyflow_crud import (  # noqa: E402
+    energyflow_crud,
+    energyflow_summary_crud,
+)
+from app.core.crud.household_crud import household_crud  # noqa: E402
+
+HOURS_IN_WEEK = 168
+
+
+class StatementRecorder:
+    "Records the statements executed by the engine"
+
+    def __init__(self):
+        self.statements: list[tuple[str, tuple]] = []
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, *args):
+        self.statements.append((statement, parameters))
+
+    def measure(self, function) -> list[tuple[str, tuple]]:
+        "Returns the statements executed by calling a function"
+
+        self.statements = []
+        function()
+        statements, self.statements = self.statements, []
+        return statements
+
+
+def query_plan(statement: str, parameters: tuple) -> list[str]:
+    "Returns the details of the query plan of a statement"
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).all()
+
+    return [row[3] for row in rows]
+
+
+def is_slow(detail: str) -> bool:
+    "Whether a step of a query plan scans a table or sorts"
+
+    return detail.startswith("SCAN ") or "TEMP B-TREE" in detail
+
+
+def households_in_order(session: Session) -> bool:
+    """Whether the households of a twinworld come back from the most solar
+    panels down, and by id for the same amount of panels"""
+
+    households = household_crud.get_by_twinworld_sorted_solar_panels(
+        session=session, id=1
+    )
+    keys = [
+        (-household.solar_panels, household.id) for household in households
+    ]
+
+    return keys == sorted(keys)
+
+
+def main():
+    with Session(engine) as session:
+        seed(seed=0.5, session=session)
+
+    recorder = StatementRecorder()
+    offset = 7 * 24
+    queries = {
+        "households of twinworld": lambda session: (
+            household_crud.get_by_twinworld_sorted_solar_panels(
+                session=session, id=1
+            )
+        ),
+        "energyflows by timestamp": lambda session: (
+            energyflow_crud.get_all_sorted_by_timestamp(
+                session=session, id=1, limit=HOURS_IN_WEEK, offset=offset
+            )
+        ),
+        "summary of the upload": lambda session: (
+            energyflow_summary_crud.get_or_summarize(session=session, id=1)
+        ),
+        "solar produced per day": lambda session: (
+            energyflow_summary_crud.get_day_totals(
+                session=session, id=1, start_day=8, days=7
+            )
+        ),
+        "daily plans of the chunk": lambda session: (
+            appliance_time_daily_crud.get_chunk(
+                session=session, twinworld_id=1, start_day=8, days=7
+            )
+        ),
+        "days in planning": lambda session: (
+            appliance_time_daily_crud.get_max_appliance_day(session=session)
+        ),
+    }
+
+    slow = False
+    for name, function in queries.items():
+        with Session(engine) as session:
+            statements = recorder.measure(lambda: function(session))
+
+        print(name)
+        for statement, parameters in statements:
+            for detail in query_plan(statement, parameters):
+                slow |= is_slow(detail)
+                marker = "!" if is_slow(detail) else " "
+                print(f"  {marker} {detail}")
+        print()
+
+    with Session(engine) as session:
+        in_order = households_in_order(session)
+
+    if slow:
+        sys.exit("A query of the chunk scans a table or sorts")
+
+    if not in_order:
+        sys.exit("The households of the twinworld are not sorted by id")
+
+
+if __name__ == "__main__":
+    main()
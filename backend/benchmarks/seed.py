@@ -0,0 +1,169 @@
+"""Benchmark for seeding the database.
+
+Runs the seeder a few times against a temporary SQLite database and prints
+the time it takes, together with the amount of rows that were created. With
+`--households` a generated twinworld of that size is timed as well.
+
+With `--row-by-row` the rows of the seeded energyflows, households,
+appliances, time windows and daily plans are inserted again, once with the
+executemany statements of the seeder and once an ORM object at a time,
+flushing every household, appliance and daily plan like the seeder did
+before it inserted in bulk. Inserting row by row takes tens of seconds.
+
+example: `python -m benchmarks.seed --repeat 3 --households 1000 --row-by-row`
+"""
+
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+import time
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+
+from sqlalchemy import delete, func  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.config import engine  # noqa: E402
+from app.core.routers.seeder_router import (  # noqa: E402
+    generate_twinworld,
+    seed,
+)
+from app.core.crud.appliance_crud import (  # noqa: E402
+    appliance_crud,
+    appliance_time_daily_crud,
+    appliance_time_window_crud,
+)
+from app.core.crud.energyflow_crud import energyflow_crud  # noqa: E402
+from app.core.crud.household_crud import household_crud  # noqa: E402
+from app.core.models.appliance_model import (  # noqa: E402
+    Appliance,
+    ApplianceTimeDaily,
+    ApplianceTimeWindow,
+)
+from app.core.models.energyflow_model import EnergyFlow  # noqa: E402
+from app.core.models.household_model import Household  # noqa: E402
+
+# The seeded models with the crud that inserts them, in the order of their
+# foreign keys
+SEEDED_MODELS = {
+    EnergyFlow: energyflow_crud,
+    Household: household_crud,
+    Appliance: appliance_crud,
+    ApplianceTimeWindow: appliance_time_window_crud,
+    ApplianceTimeDaily: appliance_time_daily_crud,
+}
+
+# The models that the seeder flushed after every row, to get its id
+FLUSHED_MODELS = (Household, Appliance, ApplianceTimeDaily)
+
+
+def read_rows(session: Session) -> dict[type, list[dict]]:
+    "Reads the rows of the seeded models"
+
+    return {
+        model: [
+            row._asdict()
+            for row in session.execute(select(model.__table__)).all()
+        ]
+        for model in SEEDED_MODELS
+    }
+
+
+def insert_bulk(session: Session, rows: dict[type, list[dict]]) -> None:
+    for model, crud in SEEDED_MODELS.items():
+        crud.create_multi(session=session, objs_in=rows[model])
+
+
+def insert_row_by_row(session: Session, rows: dict[type, list[dict]]) -> None:
+    for model in SEEDED_MODELS:
+        for row in rows[model]:
+            session.add(model(**row))
+            if model in FLUSHED_MODELS:
+                session.flush()
+
+
+def bench_insert(name: str, function, rows: dict[type, list[dict]]) -> None:
+    "Inserts the rows again after deleting them, showing the time"
+
+    with Session(engine) as session:
+        for model in reversed(SEEDED_MODELS):
+            session.execute(delete(model))
+        session.commit()
+
+        start = time.perf_counter()
+        function(session, rows)
+        session.commit()
+        seconds = time.perf_counter() - start
+
+    print(f"{name + ':':<22}{seconds:10.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=float, default=0.5)
+    parser.add_argument(
+        "--households",
+        type=int,
+        default=0,
+        help="households of a generated twinworld, skipped when 0",
+    )
+    parser.add_argument(
+        "--row-by-row",
+        action="store_true",
+        help="compare the bulk insert of the seeded rows to row by row",
+    )
+    args = parser.parse_args()
+
+    timings = []
+
+    for _ in range(args.repeat):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            seed(seed=args.seed, session=session)
+            timings.append(time.perf_counter() - start)
+
+    generate = None
+    if args.households:
+        with Session(engine) as session:
+            start = time.perf_counter()
+            generate_twinworld(
+                session,
+                name="Benchmark",
+                households=args.households,
+                seed=args.seed,
+            )
+            session.commit()
+            generate = time.perf_counter() - start
+
+    with Session(engine) as session:
+        for model in (
+            EnergyFlow,
+            Household,
+            Appliance,
+            ApplianceTimeWindow,
+            ApplianceTimeDaily,
+        ):
+            count = session.exec(select(func.count()).select_from(model)).one()
+            print(f"{model.__name__ + ':':<22}{count:>10} rows")
+
+    print(f"\nbest of {args.repeat}:            {min(timings):10.3f} s")
+    if generate is not None:
+        households = f"{args.households} households:"
+        print(f"{households:<22}{generate:10.3f} s")
+
+    if args.row_by_row:
+        with Session(engine) as session:
+            rows = read_rows(session)
+
+        print(f"\ninsert of {sum(map(len, rows.values()))} seeded rows")
+        bench_insert("bulk", insert_bulk, rows)
+        bench_insert("row by row", insert_row_by_row, rows)
+
+
+if __name__ == "__main__":
+    main()
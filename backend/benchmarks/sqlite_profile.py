@@ -0,0 +1,140 @@
+"""Benchmark for the SQLite performance profile of the settings.
+
+Ingests an energyflow upload into a temporary SQLite database with and
+without the profile, while another thread keeps reading a week of
+energyflows like /plan does. The throughput of the ingest is shown together
+with the latency of the reads during the ingest, and of the same reads
+afterwards.
+
+example: `python -m benchmarks.sqlite_profile --rows 100000`
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session
+
+from app.config import Settings, create_db_engine
+from app.ingest import create_ingest_job, run_ingest_job
+from app.core.crud.energyflow_crud import energyflow_crud
+
+from benchmarks.ingest import create_csv, upload
+
+
+def read_week(engine) -> float:
+    "Returns the time of reading a week of energyflows in seconds"
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        energyflow_crud.get_all_sorted_by_timestamp(
+            session=session, id=1, limit=168, offset=24
+        )
+    return time.perf_counter() - start
+
+
+def read_continuously(engine, stop: threading.Event, latencies, errors):
+    "Reads weeks of energyflows until the stop event is set"
+
+    while not stop.is_set():
+        try:
+            latencies.append(read_week(engine))
+        except OperationalError:
+            errors.append(1)
+
+
+def summary(latencies: list[float]) -> str:
+    if len(latencies) < 2:
+        return f"{'-':>10}{'-':>10}{'-':>10}"
+
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    return (
+        f"{statistics.median(latencies) * 1000:>8.2f}ms"
+        f"{p95 * 1000:>8.2f}ms{max(latencies) * 1000:>8.1f}ms"
+    )
+
+
+def bench(profile: bool, csv: bytes, batch_size: int) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        settings = Settings(  # type: ignore
+            database_url=f"sqlite:///{os.path.join(folder, 'bench.db')}",
+            sqlite_profile=profile,
+        )
+        engine = create_db_engine(settings)
+        SQLModel.metadata.create_all(engine)
+
+        # A first upload that is read during the ingest of the second
+        with Session(engine) as session:
+            job, path = create_ingest_job(
+                session=session,
+                file=BytesIO(create_csv(8760)),
+                upload_in=upload("read"),
+            )
+            run_ingest_job(session=session, job_id=job.id, path=path)
+
+        latencies: list[float] = []
+        errors: list[int] = []
+        stop = threading.Event()
+        reader = threading.Thread(
+            target=read_continuously, args=(engine, stop, latencies, errors)
+        )
+
+        with Session(engine) as session:
+            job, path = create_ingest_job(
+                session=session, file=BytesIO(csv), upload_in=upload("write")
+            )
+            reader.start()
+            start = time.perf_counter()
+            job = run_ingest_job(
+                session=session,
+                job_id=job.id,
+                path=path,
+                batch_size=batch_size,
+            )
+            seconds = time.perf_counter() - start
+            stop.set()
+            reader.join()
+
+        idle = [read_week(engine) for _ in range(200)]
+        engine.dispose()
+
+    name = "profile" if profile else "default"
+    print(
+        f"{name:<9}{job.rows_processed / seconds:>10.0f}"
+        f"{len(latencies):>7}{len(errors):>7}{summary(latencies)}"
+        f"{summary(idle)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="rows per commit of the ingest",
+    )
+    args = parser.parse_args()
+
+    csv = create_csv(args.rows)
+
+    print(f"rows: {args.rows}, rows per commit: {args.batch_size}\n")
+    print(
+        f"{'':<9}{'ingest':>10}{'reads':>7}{'errors':>7}"
+        f"{'read during ingest':>30}{'read after ingest':>30}"
+    )
+    columns = "p50  p95  max"
+    print(f"{'':<9}{'rows/s':>10}{'':>14}{columns:>30}{columns:>30}")
+
+    for profile in (False, True):
+        bench(profile, csv, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
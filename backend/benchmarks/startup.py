@@ -0,0 +1,169 @@
+"""Benchmark of the cold start of a worker.
+
+Times importing the application and calling create_app() in `--rounds` fresh
+interpreters, like a worker of run.py that starts or reloads. The median is
+compared to BUDGET, and the benchmark fails when the budget is exceeded, or
+when a library of FORBIDDEN is imported at startup. Those libraries are only
+imported when an algorithm of a researcher runs, or by the seeder.
+
+With `--development` the application is started in development mode, where
+the seeder is mounted. With `--top` the slowest packages to import are shown,
+from `python -X importtime`.
+
+The interpreters run in a temporary folder, so the logs of create_app() don't
+end up in the data folder of the backend.
+
+example: `python -m benchmarks.startup --rounds 10 --top 10`
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_FOLDER = Path(__file__).resolve().parent.parent
+
+# The maximum median in seconds of importing the application and create_app()
+BUDGET = 1.0
+
+# Libraries that are too slow to import for every worker
+FORBIDDEN = ("pandas", "scipy")
+
+STARTUP = f"""
+import json, sys, time
+
+start = time.perf_counter()
+from app.app import create_app
+imported = time.perf_counter()
+create_app()
+created = time.perf_counter()
+
+print(json.dumps({{
+    "import": imported - start,
+    "create_app": created - imported,
+    "forbidden": [name for name in {FORBIDDEN!r} if name in sys.modules],
+}}))
+"""
+
+
+def run(
+    code: str, folder: str, development: bool, *options: str
+) -> subprocess.CompletedProcess:
+    "Runs code in a fresh interpreter that can import the application"
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(BACKEND_FOLDER),
+        DEVELOPMENT=str(development).lower(),
+        DATABASE_URL=f"sqlite:///{os.path.join(folder, 'bench.db')}",
+    )
+
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=folder,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def slowest_imports(folder: str, development: bool, top: int) -> list:
+    "Returns the top-level packages that take the longest to import"
+
+    stderr = run(STARTUP, folder, development, "-X", "importtime").stderr
+
+    packages = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if "." not in name:
+            packages.append((int(cumulative) / 1_000_000, name))
+
+    return sorted(packages, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--development", action="store_true")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=BUDGET,
+        help="maximum median of the startup in seconds",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        help="amount of the slowest packages to import to show",
+    )
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        # The first round warms up the caches of the file system and the
+        # bytecode of the application
+        rounds = [
+            json.loads(run(STARTUP, folder, args.development).stdout)
+            for _ in range(args.rounds + 1)
+        ][1:]
+
+        packages = (
+            slowest_imports(folder, args.development, args.top)
+            if args.top
+            else []
+        )
+    finally:
+        shutil.rmtree(folder)
+
+    mode = "development" if args.development else "production"
+    print(f"{args.rounds} rounds in {mode} mode\n")
+    print(f"{'stage':<12}{'min':>10}{'median':>10}{'max':>10}")
+
+    totals = [result["import"] + result["create_app"] for result in rounds]
+    for stage, timings in (
+        ("import", [result["import"] for result in rounds]),
+        ("create_app", [result["create_app"] for result in rounds]),
+        ("total", totals),
+    ):
+        print(
+            f"{stage:<12}{min(timings) * 1000:>8.0f}ms"
+            f"{statistics.median(timings) * 1000:>8.0f}ms"
+            f"{max(timings) * 1000:>8.0f}ms"
+        )
+
+    if packages:
+        print("\nslowest packages to import:")
+        for seconds, name in packages:
+            print(f"{name:<30}{seconds * 1000:>8.0f}ms")
+
+    failures = []
+    median = statistics.median(totals)
+    if median > args.budget:
+        failures.append(
+            f"startup takes {median * 1000:.0f}ms, "
+            f"over its budget of {args.budget * 1000:.0f}ms"
+        )
+
+    forbidden = sorted(
+        {name for result in rounds for name in result["forbidden"]}
+    )
+    if forbidden:
+        failures.append(f"{', '.join(forbidden)} imported at startup")
+
+    if failures:
+        sys.exit("\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
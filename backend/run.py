@@ -5,16 +5,21 @@ This is the file that needs to be run to start the application.
 This file does the following:
     - Create the app factory
     - Print all available API routes
-    - Run the app through Uvicorn
+    - Fail the ingest jobs that the last server left unfinished
+    - Run the app through Uvicorn, with workers forked from this process in
+      production, see app.prefork
 
 example: `python run.py`
 """
 
-from os import system
+import os
 
 from uvicorn import run
 
 from app.app import create_app
+from app.ingest import recover_ingest_jobs
+from app.prefork import serve
+from app.utils import create_db_and_tables
 import app.config as config  # `as` is needed for printing the docstring
 
 # App factory
@@ -22,7 +27,7 @@ app = create_app()
 
 # Make ANSI get processed everywhere properly
 # to get pretty colors in the terminal
-system("")
+os.system("")
 
 
 if __name__ == "__main__":
@@ -50,11 +55,26 @@ if __name__ == "__main__":
         + "========================"
     )
 
-    run(
-        "run:app",
-        reload=reload,
-        host=config.settings.server_host,
-        port=config.settings.port,
-        use_colors=config.settings.uvcorn_colors,
-        workers=config.settings.workers,
-    )
+    # Forking is not available on Windows
+    if not reload and config.settings.prefork and hasattr(os, "fork"):
+        serve(
+            app,
+            host=config.settings.server_host,
+            port=config.settings.port,
+            workers=config.settings.workers,
+            use_colors=config.settings.uvcorn_colors,
+        )
+    else:
+        # Every worker of uvicorn runs the startup of the application, so the
+        # unfinished ingest jobs are failed once here instead
+        create_db_and_tables()
+        recover_ingest_jobs()
+
+        run(
+            "run:app",
+            reload=reload,
+            host=config.settings.server_host,
+            port=config.settings.port,
+            use_colors=config.settings.uvcorn_colors,
+            workers=config.settings.workers,
+        )
@@ -0,0 +1,74 @@
+"""Fixtures of the tests.
+
+The tests run against a temporary SQLite database, which is seeded once with
+the seeder and a generated twinworld of GENERATED_HOUSEHOLDS households. The
+database url is set before the application is imported, so the data of the
+backend is never touched.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(folder, 'tests.db')}"
+
+from typing import Callable, Iterator  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app import plan_store  # noqa: E402
+from app.config import engine  # noqa: E402
+from app.core.routers.seeder_router import (  # noqa: E402
+    generate_twinworld,
+    seed,
+)
+
+GENERATED_HOUSEHOLDS = 300
+
+
+@pytest.fixture(scope="session")
+def twinworld_id() -> int:
+    "Seeds the database, and returns the id of the generated twinworld"
+
+    with Session(engine) as session:
+        seed(seed=0.5, session=session)
+
+    with Session(engine) as session:
+        twinworld = generate_twinworld(
+            session, name="Tests", households=GENERATED_HOUSEHOLDS, seed=0.5
+        )
+        session.commit()
+
+        return twinworld.id
+
+
+@pytest.fixture(autouse=True)
+def plan_folder(tmp_path, monkeypatch) -> None:
+    "Keeps the plans of the simulations of a test in a temporary folder"
+
+    monkeypatch.setattr(plan_store, "PLAN_FOLDER", str(tmp_path / "plans"))
+
+
+@pytest.fixture
+def statements() -> Iterator[Callable[[Callable[[], object]], list]]:
+    """Returns a function that calls a function, and returns the statements
+    with their parameters that it executed"""
+
+    recorded: list[tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, *args) -> None:
+        recorded.append((statement, parameters))
+
+    def measure(function: Callable[[], object]) -> list:
+        recorded.clear()
+        function()
+        return list(recorded)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield measure
+    event.remove(engine, "before_cursor_execute", record)
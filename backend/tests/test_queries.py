@@ -0,0 +1,55 @@
+"""The amount of database queries of /start and the household routes.
+
+Like benchmarks/queries.py, but with the budgets checked by the test suite.
+The households are loaded with selectinload, which loads 500 objects per
+query, so the budget grows by a query per 100 households.
+"""
+
+import asyncio
+
+from sqlmodel import Session
+
+from app.config import engine
+from app.core.models.household_model import HouseholdRead
+from app.core.routers.household_router import get_households_by_twinworld
+from app.core.routers.simulation_router import start
+
+from tests.conftest import GENERATED_HOUSEHOLDS
+
+QUERY_BUDGET_START = 10
+QUERY_BUDGET_HOUSEHOLDS = 8
+
+
+def test_start_query_budget(twinworld_id, statements):
+    with Session(engine) as session:
+        executed = statements(
+            lambda: asyncio.run(
+                start(
+                    algorithm_id=1,
+                    twinworld_id=twinworld_id,
+                    costmodel_id=1,
+                    energyflow_id=1,
+                    session=session,
+                )
+            )
+        )
+
+    assert len(executed) <= QUERY_BUDGET_START + GENERATED_HOUSEHOLDS // 100
+
+
+def test_households_of_twinworld_query_budget(twinworld_id, statements):
+    def serialise() -> None:
+        households = asyncio.run(
+            get_households_by_twinworld(
+                twinworld_id=twinworld_id, session=session
+            )
+        )
+        for household in households:
+            HouseholdRead.model_validate(household)
+
+    with Session(engine) as session:
+        executed = statements(serialise)
+
+    assert (
+        len(executed) <= QUERY_BUDGET_HOUSEHOLDS + GENERATED_HOUSEHOLDS // 100
+    )
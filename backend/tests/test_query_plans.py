@@ -0,0 +1,89 @@
+"""The query plans of loading a chunk of the planning.
+
+Like benchmarks/query_plans.py, every query that /start and /plan need to
+load a chunk should search the indexes of the models, so a test fails when
+the `EXPLAIN QUERY PLAN` of a query scans a table or needs a temporary sort.
+"""
+
+from typing import Callable
+
+import pytest
+from sqlmodel import Session
+
+from app.config import engine
+from app.utils import HOURS_IN_WEEK
+from app.core.crud.appliance_crud import appliance_time_daily_crud
+from app.core.crud.energyflow_crud import (
+    energyflow_crud,
+    energyflow_summary_crud,
+)
+from app.core.crud.household_crud import household_crud
+
+CHUNK_QUERIES: dict[str, Callable[[Session, int], object]] = {
+    "households of twinworld": lambda session, twinworld_id: (
+        household_crud.get_by_twinworld_sorted_solar_panels(
+            session=session, id=twinworld_id
+        )
+    ),
+    "energyflows by timestamp": lambda session, twinworld_id: (
+        energyflow_crud.get_all_sorted_by_timestamp(
+            session=session, id=1, limit=HOURS_IN_WEEK, offset=HOURS_IN_WEEK
+        )
+    ),
+    "summary of the upload": lambda session, twinworld_id: (
+        energyflow_summary_crud.get_or_summarize(session=session, id=1)
+    ),
+    "solar produced per day": lambda session, twinworld_id: (
+        energyflow_summary_crud.get_day_totals(
+            session=session, id=1, start_day=8, days=7
+        )
+    ),
+    "daily plans of the chunk": lambda session, twinworld_id: (
+        appliance_time_daily_crud.get_chunk(
+            session=session, twinworld_id=twinworld_id, start_day=8, days=7
+        )
+    ),
+    "days in planning": lambda session, twinworld_id: (
+        appliance_time_daily_crud.get_max_appliance_day(session=session)
+    ),
+}
+
+
+def query_plan(statement: str, parameters: tuple) -> list[str]:
+    "Returns the details of the query plan of a statement"
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).all()
+
+    return [row[3] for row in rows]
+
+
+@pytest.mark.parametrize("name", CHUNK_QUERIES)
+def test_chunk_query_uses_indexes(name, twinworld_id, statements):
+    with Session(engine) as session:
+        executed = statements(
+            lambda: CHUNK_QUERIES[name](session, twinworld_id)
+        )
+
+    assert executed
+    for statement, parameters in executed:
+        for detail in query_plan(statement, parameters):
+            assert not detail.startswith("SCAN "), detail
+            assert "TEMP B-TREE" not in detail, detail
+
+
+def test_households_sorted_by_solar_panels_then_id(twinworld_id):
+    with Session(engine) as session:
+        households = household_crud.get_by_twinworld_sorted_solar_panels(
+            session=session, id=twinworld_id
+        )
+
+    keys = [
+        (-household.solar_panels, household.id) for household in households
+    ]
+
+    # Households with the same amount of panels are compared by their id
+    assert len({solar_panels for solar_panels, _ in keys}) < len(keys)
+    assert keys == sorted(keys)
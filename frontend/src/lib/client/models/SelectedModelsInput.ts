@@ -14,4 +14,7 @@ export type SelectedModelsInput = {
   algorithm: AlgorithmRead;
   twinworld: TwinWorldRead;
   energyflow: EnergyFlowUploadRead;
+  simulation_id?: string | null;
+  delta?: boolean;
+  version?: number | null;
 };
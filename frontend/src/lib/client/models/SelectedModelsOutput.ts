@@ -9,4 +9,5 @@ export type SelectedModelsOutput = {
   days_in_planning: number;
   start_date: number;
   end_date: number;
+  version?: number | null;
 };
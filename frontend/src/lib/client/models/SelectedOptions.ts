@@ -13,4 +13,5 @@ export type SelectedOptions = {
   algorithm: AlgorithmRead;
   energyflow: EnergyFlowUploadRead;
   households: Array<HouseholdRead_Output>;
+  simulation_id: string;
 };